@@ -8,23 +8,34 @@ from dash import dcc, Input, Output, html, State
 from flask_login import LoginManager, current_user, login_required
 from dotenv import load_dotenv
 from core.auth import User
-from core.db import init_db_pool
+from core.db import get_db_pool, pool_status
 from core import google_auth
-import traceback # Importar traceback
+from core.exportacion import ExportacionService, FORMATOS as FORMATOS_EXPORTACION
+from core.tracing import instrumentar_flask
+from core import perfilador
+from core import tiempo_real
+from core.calendario import CalendarioService
+from core.importacion import MAX_BYTES_SUBIDA
+import logging
+from core.logs import configurar_logging
 
 google_fonts = "https://fonts.googleapis.com/css2?family=Lato:wght@400;700&display=swap"
 
 load_dotenv()
+configurar_logging()
+logger = logging.getLogger(__name__)
 
 server = flask.Flask(__name__)
 server.config.update(
     SECRET_KEY=os.getenv("FLASK_SECRET_KEY", "un-valor-secreto-por-defecto-cambiar"), # Cambiar default si es necesario
-    DB_POOL=init_db_pool()
+    # Un request más grande que la importación máxima (base64 = 4/3 del archivo, más el JSON del callback) recibe 413 sin leerse
+    MAX_CONTENT_LENGTH=MAX_BYTES_SUBIDA * 4 // 3 + 1024 * 1024,
 )
-
-# --- DEBUG: Imprimir la SECRET_KEY cargada ---
-print(f"DEBUG: Flask SECRET_KEY cargada: {server.config.get('SECRET_KEY')}")
-# ----------------------------------------------
+# El pool de DB se crea en el primer uso (core.db.get_db_pool), no al importar la app
+instrumentar_flask(server) # Span raíz por request/callback; no-op si TRACE_SAMPLE_RATE no está definido
+perfilador.instalar_perfilador(server) # Inactivo hasta que un gerente abre una sesión en /perfilador
+if not os.getenv("FLASK_SECRET_KEY"):
+    logger.warning("FLASK_SECRET_KEY no definida: se usa el valor por defecto (no apto para producción).")
 
 login_manager = LoginManager()
 login_manager.init_app(server)
@@ -32,14 +43,9 @@ login_manager.login_view = "/login"
 login_manager.session_protection = "strong"
 @login_manager.user_loader
 def load_user(user_id):
-    # --- DEBUG: Ver quién se está cargando ---
-    print(f"DEBUG: user_loader llamado para user_id: {user_id}")
-    # -----------------------------------------
-    pool = server.config["DB_POOL"]
+    pool = get_db_pool()
     user = User.get(user_id, pool)
-    # --- DEBUG: Ver resultado de User.get ---
-    print(f"DEBUG: User.get devolvió: {'Usuario encontrado' if user else 'None'}")
-    # ---------------------------------------
+    logger.debug("user_loader(%s): %s", user_id, 'encontrado' if user else 'None')
     return user
 
 app = dash.Dash(
@@ -62,59 +68,146 @@ app.layout = html.Div([
     )
 ])
 
-# --- RUTA FLASK: Callback de OAuth (con más prints) ---
+# --- RUTA FLASK: Callback de OAuth ---
 @server.route('/oauth2callback')
 @login_required # Este decorador podría ser la causa del logout si la sesión se pierde ANTES
 def oauth2callback():
-    print(f"DEBUG: Entrando a /oauth2callback. Usuario actual: {current_user.id if current_user.is_authenticated else 'Anónimo'}")
     state = session.get('google_oauth_state')
-    print(f"DEBUG: State en sesión: {state}")
-    print(f"DEBUG: State recibido: {request.args.get('state')}")
+    logger.debug("/oauth2callback usuario=%s state_sesion=%s state_recibido=%s", current_user.id if current_user.is_authenticated else 'Anónimo', state, request.args.get('state'))
 
     if not state or state != request.args.get('state'):
-        print("ERROR: State de OAuth no coincide o falta. Redirigiendo a home.")
+        logger.error("State de OAuth no coincide o falta. Redirigiendo a home.")
         home_path = dash.page_registry.get('pages.home', {}).get('path', '/')
         return redirect(home_path)
 
     flow = google_auth.get_google_auth_flow()
     if not flow:
-         print("ERROR: No se pudo crear el flow de Google Auth. Redirigiendo a home.")
+         logger.error("No se pudo crear el flow de Google Auth. Redirigiendo a home.")
          home_path = dash.page_registry.get('pages.home', {}).get('path', '/')
          return redirect(home_path)
 
     try:
         auth_response = request.url
-        print(f"DEBUG: authorization_response URL: {auth_response}")
         # Considerar HTTPS en producción si es necesario
         # if not auth_response.startswith('https://') and 'localhost' not in auth_response:
         #      auth_response = auth_response.replace('http://', 'https://', 1)
 
         flow.fetch_token(authorization_response=auth_response)
         credentials = flow.credentials
-        print("DEBUG: Token obtenido de Google.")
+        logger.debug("Token obtenido de Google.")
 
         if not current_user or not hasattr(current_user, 'dni'):
-             print("ERROR: No se pudo obtener DNI del usuario actual para guardar credenciales. Redirigiendo a login.")
+             logger.error("No se pudo obtener DNI del usuario actual para guardar credenciales. Redirigiendo a login.")
              login_path = dash.page_registry.get('pages.login', {}).get('path', '/login')
              return redirect(login_path)
 
-        print(f"DEBUG: Intentando guardar credenciales para DNI: {current_user.dni}")
         save_success = google_auth.save_google_credentials(current_user.dni, credentials)
-        print(f"DEBUG: Resultado de guardar credenciales: {save_success}")
+        logger.debug("Guardado de credenciales para DNI %s: %s", current_user.dni, save_success)
 
         session.pop('google_oauth_state', None)
-        print("DEBUG: Autorización de Google completada exitosamente. Redirigiendo a nueva-interaccion.")
+        logger.info("Autorización de Google completada para DNI %s.", current_user.dni)
         interaction_path = dash.page_registry.get('pages.02_interaccion', {}).get('path', '/nueva-interaccion')
         return redirect(interaction_path)
 
     except Exception as e:
-        print(f"ERROR: Excepción durante el callback de OAuth: {e}")
-        traceback.print_exc() # Imprimir el traceback completo
+        logger.exception("Excepción durante el callback de OAuth: %s", e)
         home_path = dash.page_registry.get('pages.home', {}).get('path', '/')
         return redirect(home_path)
 # --- FIN RUTA ---
 
 
+# --- RUTA FLASK: Exportación de interacciones (stream) ---
+@server.route('/exportar-interacciones')
+@login_required
+def exportar_interacciones():
+    if getattr(current_user, 'rol', None) != 'gerente':
+        return flask.abort(403)
+    formato = request.args.get('formato', 'csv')
+    if formato not in FORMATOS_EXPORTACION:
+        return flask.abort(400)
+    if formato == 'parquet' and not ExportacionService.parquet_disponible():
+        return flask.abort(501) # pyarrow no instalado
+    # Mismos filtros que el dashboard de gerencia
+    filters = {
+        'vendedorDni': request.args.get('vendedorDni') or None,
+        'clienteCuit': request.args.get('clienteCuit') or None,
+        'zonaId': request.args.get('zonaId') or None,
+        'fechaDesde': request.args.get('fechaDesde') or None,
+        'fechaHasta': request.args.get('fechaHasta') or None,
+    }
+    stream = ExportacionService.stream_csv(filters) if formato == 'csv' else ExportacionService.stream_parquet(filters)
+    return flask.Response(
+        flask.stream_with_context(stream),
+        mimetype=FORMATOS_EXPORTACION[formato],
+        headers={'Content-Disposition': f'attachment; filename="{ExportacionService.nombre_archivo(filters, formato)}"'}
+    )
+# --- FIN RUTA ---
+
+
+# --- RUTA FLASK: Push de interacciones nuevas al dashboard de gerencia (Server-Sent Events) ---
+@server.route('/stream/interacciones')
+@login_required
+def stream_interacciones():
+    if getattr(current_user, 'rol', None) != 'gerente':
+        return flask.abort(403)
+    # Mismos filtros que el dashboard de gerencia (los aplicados, no los que están en pantalla)
+    filters = {
+        'vendedorDni': request.args.get('vendedorDni') or None,
+        'clienteCuit': request.args.get('clienteCuit') or None,
+        'zonaId': request.args.get('zonaId') or None,
+        'fechaDesde': request.args.get('fechaDesde') or None,
+        'fechaHasta': request.args.get('fechaHasta') or None,
+    }
+    cola = tiempo_real.suscribir(filters)
+    if cola is None:
+        return flask.abort(503) # Worker al límite de streams: el dashboard pasa a recargarse periódicamente (tiempo_real.js)
+    return flask.Response(
+        tiempo_real.stream_eventos(cola),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'} # Sin buffer en nginx
+    )
+# --- FIN RUTA ---
+
+
+# --- RUTA FLASK: Feed ICS de seguimientos del vendedor (suscripción desde apps de calendario) ---
+@server.route('/calendario/<token>.ics')
+def calendario_ics(token):
+    # Sin login: las apps de calendario no tienen sesión, el token de la URL es la credencial
+    from werkzeug.http import is_resource_modified
+    try: version = CalendarioService.version(token)
+    except Exception as e: logger.error("Error calculando el feed ICS: %s", e); return flask.abort(503)
+    if version is None: return flask.abort(404)
+    if is_resource_modified(request.environ, etag=version['etag'], last_modified=version['modificado']):
+        respuesta = flask.Response(CalendarioService.generar(version), mimetype='text/calendar')
+        respuesta.headers['Content-Disposition'] = 'inline; filename="seguimientos.ics"'
+    else:
+        respuesta = flask.Response(status=304) # Sin cambios: ni se leen ni se arman los eventos
+    respuesta.set_etag(version['etag']); respuesta.last_modified = version['modificado']
+    respuesta.headers['Cache-Control'] = 'private, max-age=300'
+    return respuesta
+# --- FIN RUTA ---
+
+
+# --- RUTA FLASK: Descarga de perfiles (.prof) del perfilador ---
+@server.route('/perfilador/descargar/<path:archivo>')
+@login_required
+def descargar_perfil(archivo):
+    if getattr(current_user, 'rol', None) != 'gerente':
+        return flask.abort(403)
+    if not archivo.endswith('.prof'):
+        return flask.abort(404)
+    return flask.send_from_directory(os.path.abspath(perfilador.PROFILE_DIR), archivo, as_attachment=True)
+# --- FIN RUTA ---
+
+
+# --- RUTA FLASK: Estado del pool (solo con POOL_STATUS_ENDPOINT=1, para bench/loadtest.py) ---
+if os.getenv("POOL_STATUS_ENDPOINT") == "1":
+    @server.route('/_pool-status')
+    def pool_status_endpoint():
+        return flask.jsonify({'pid': os.getpid(), **pool_status()})
+# --- FIN RUTA ---
+
+
 # --- Callback NAVBAR ---
 @app.callback(
     Output('navbar-container', 'children'),
@@ -122,22 +215,19 @@ def oauth2callback():
     Input('url', 'pathname')
 )
 def update_navbar_and_page_visibility(pathname):
-    # --- DEBUG: Ver estado de autenticación al inicio del callback ---
-    print(f"DEBUG Navbar Callback - Path: {pathname}, Autenticado: {current_user.is_authenticated}")
-    # -------------------------------------------------------------
+    logger.debug("Navbar - Path: %s, Autenticado: %s", pathname, current_user.is_authenticated)
 
     if pathname == '/login':
         return None, {'display': 'block'}
 
     # Si NO está autenticado (y no es login), NO mostrar navbar ni contenido
     if not current_user.is_authenticated and pathname != '/login':
-         print("DEBUG Navbar: Usuario no autenticado detectado fuera de /login.")
          return None, {'display': 'none'}
 
     # Si LLEGAMOS AQUÍ, el usuario DEBERÍA estar autenticado
     roles_paginas = {
-        'gerente': ['/dashboard-gerencia', '/sincronizar-clientes', '/nueva-interaccion', '/dashboard-vendedor'],
-        'vendedor': ['/dashboard-vendedor', '/nueva-interaccion']
+        'gerente': ['/dashboard-gerencia', '/sincronizar-clientes', '/nueva-interaccion', '/dashboard-vendedor', '/cliente', '/importar-interacciones', '/perfilador'],
+        'vendedor': ['/dashboard-vendedor', '/nueva-interaccion', '/cliente']
     }
     # Asegurarse de que current_user.rol existe si está autenticado
     user_rol = getattr(current_user, 'rol', None)
@@ -158,10 +248,7 @@ def update_navbar_and_page_visibility(pathname):
     try:
         auth_page_info = dash.page_registry.get('pages.authorize_google')
         if auth_page_info:
-            # --- DEBUG: Verificar DNI antes de cargar credenciales ---
             user_dni = getattr(current_user, 'dni', None)
-            print(f"DEBUG Navbar: Verificando creds para DNI: {user_dni}")
-            # ------------------------------------------------------
             if user_dni: # Solo intentar cargar si tenemos DNI
                 creds_json = google_auth.load_google_credentials(user_dni)
                 if not creds_json:
@@ -169,9 +256,9 @@ def update_navbar_and_page_visibility(pathname):
                 else:
                     links_principales.append(dbc.NavItem(html.Span("📅 Conectado", className="nav-link disabled")))
             else:
-                 print("WARN Navbar: No se pudo obtener DNI para verificar credenciales de Google.")
+                 logger.warning("Navbar: No se pudo obtener DNI para verificar credenciales de Google.")
     except Exception as e:
-         print(f"ERROR al verificar credenciales o página de autorización en Navbar: {e}")
+         logger.error("Error al verificar credenciales o página de autorización en Navbar: %s", e)
 
     links_principales.append(dbc.NavLink("Cerrar Sesión", href="/logout", className="nav-link-logout"))
 
@@ -0,0 +1,21 @@
+// assets/scroll_infinito.js
+// Scroll infinito para tablas paginadas desde el servidor (p.ej. historial de /cliente):
+// cuando un botón con clase 'scroll-infinito' visible entra en pantalla, se lo pulsa.
+// No se pulsa mientras el callback anterior sigue en curso (botón deshabilitado por 'running' del
+// callback, o marcado por Dash con data-dash-is-loading): con el mismo cursor se repetiría la página.
+// El segundo de espera entre pulsaciones cubre el lapso hasta que Dash marca el botón.
+(function () {
+    var ultimoClick = 0;
+    function revisar() {
+        if (Date.now() - ultimoClick < 1000) return;
+        var botones = document.querySelectorAll('.scroll-infinito');
+        for (var i = 0; i < botones.length; i++) {
+            var boton = botones[i];
+            if (boton.offsetParent === null) continue; // Oculto (no hay más páginas)
+            if (boton.disabled || boton.getAttribute('data-dash-is-loading')) continue; // Página en curso
+            if (boton.getBoundingClientRect().top < window.innerHeight + 200) { ultimoClick = Date.now(); boton.click(); return; }
+        }
+    }
+    window.addEventListener('scroll', revisar, {passive: true});
+    setInterval(revisar, 1500); // Página más corta que la ventana: no hay scroll que dispare la carga
+})();
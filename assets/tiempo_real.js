@@ -0,0 +1,38 @@
+// assets/tiempo_real.js
+// Cliente del push de interacciones del dashboard de gerencia (ver core/tiempo_real.py).
+// Abre un EventSource contra /stream/interacciones con los filtros aplicados y junta lo que llega
+// en lotes cortos: varios set_props seguidos sobre el mismo store pueden pisarse antes de que
+// corra el callback que los suma. Si el servidor no acepta el stream (503: worker al límite) o la
+// conexión se cierra, se activa intervalo-respaldo-gerencia y el dashboard se recarga periódicamente.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    tiempo_real: {
+        conectar: function (filtros) {
+            if (window._crmStream) { window._crmStream.close(); clearTimeout(window._crmStreamTimer); window._crmStream = null; }
+            if (!filtros || !window.EventSource || !window.dash_clientside.set_props) return '';
+            var params = new URLSearchParams();
+            Object.keys(filtros).forEach(function (k) { if (filtros[k]) params.append(k, filtros[k]); });
+            var fuente = new EventSource('/stream/interacciones?' + params.toString());
+            var pendientes = [];
+            fuente.addEventListener('interaccion', function (e) {
+                // La página ya no está (navegación dentro de la app): se corta el stream
+                if (!document.getElementById('dashboard-gerencia-en-vivo')) { fuente.close(); return; }
+                pendientes.push(JSON.parse(e.data));
+                clearTimeout(window._crmStreamTimer);
+                window._crmStreamTimer = setTimeout(function () {
+                    var lote = pendientes; pendientes = [];
+                    window.dash_clientside.set_props('dashboard-gerencia-eventos', {data: lote});
+                }, 500);
+            });
+            var respaldo = function (activo) {
+                if (!document.getElementById('intervalo-respaldo-gerencia')) return;
+                window.dash_clientside.set_props('intervalo-respaldo-gerencia', {disabled: !activo});
+                window.dash_clientside.set_props('dashboard-gerencia-en-vivo', {children: activo ? 'Actualización periódica' : 'En vivo'});
+            };
+            fuente.addEventListener('open', function () { respaldo(false); });
+            // EventSource reintenta solo tras cortes; con un error HTTP (503) queda CLOSED
+            fuente.addEventListener('error', function () { if (fuente.readyState === EventSource.CLOSED) respaldo(true); });
+            window._crmStream = fuente;
+            return 'En vivo';
+        }
+    }
+});
@@ -0,0 +1,12 @@
+# bench/__init__.py
+# Benchmarks de los caminos críticos. Se ejecutan contra la base configurada en .env
+# (idealmente una base local, nunca producción):
+#   python -m bench.seed --crear-esquema --interacciones 1000000   # datos sintéticos
+#   python -m bench.suite                                          # repositorio y servicios -> bench/results/*.json
+#   python -m bench.registrar_interaccion --vendedor-dni 30000000 --cuit 30700000000
+#   python -m bench.get_dashboard_pipeline                         # sin base de datos
+#   python -m bench.fetch_columnar                                 # memoria de la lectura columnar, sin base de datos
+#   python -m bench.startup                                        # tiempo de import
+#   python -m bench.simuladores                                    # ERP y Google Calendar locales (ver variables en el módulo)
+#   python -m bench.sync_erp                                       # sincronización de clientes contra el simulador
+#   python -m bench.verificar_replica                              # ruteo primaria/réplica (DB_REPLICA_*)
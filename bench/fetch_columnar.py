@@ -0,0 +1,85 @@
+# bench/fetch_columnar.py
+# Memoria pico y tiempo de armar el DataFrame del dashboard según cómo se acumulan las filas leídas
+# (sin base de datos: los bloques de fetchmany se generan con bench.get_dashboard_pipeline).
+#   filas   -> fetchall de tuplas + pd.DataFrame(filas)   (cota inferior del DictCursor anterior)
+#   listas  -> una lista por columna                     (lectura columnar sin tipar)
+#   arrays  -> _acumular_columnas: array.array tipado por columna + DataFrame sobre los buffers
+#   python -m bench.fetch_columnar --filas 100000 1000000
+import argparse
+import time
+import tracemalloc
+from collections import namedtuple
+import pandas as pd
+from core.repository import _columnas_vacias, _acumular_columnas
+from core.services import CrmService
+from bench.get_dashboard_pipeline import DASHBOARD_COLUMNS, datos_sinteticos
+
+Columna = namedtuple('Columna', 'name type_code')
+# OID de cada columna de _dashboard_query (int8, timestamp, text, bool)
+TIPOS = {'id': 20, 'fecha_interaccion': 1114, 'fecha_prox_seguimiento': 1114, 'fk_cliente_cuit': 20,
+         'llamada_concretada': 16, 'venta_cerrada': 16, 'ofrecio_otros_precios': 16, 'cliente_conoce_catalogo': 16,
+         'le_llego_bien_pedido': 16, 'cliente_informo_pago': 16, 'reviso_cta_cte': 16}
+DESCRIPTION = [Columna(c, TIPOS.get(c, 25)) for c in DASHBOARD_COLUMNS]
+
+
+def _nuevo(v):
+    """ Copia de v como objeto nuevo: el driver crea un int/str/datetime por valor (None y bool son únicos). """
+    if v is None or isinstance(v, bool): return v
+    if isinstance(v, int): return int.from_bytes(v.to_bytes(8, 'little'), 'little')
+    if isinstance(v, str): return (v + ' ')[:-1]
+    return v.replace()
+
+
+def bloques(columnar: dict, chunk_size: int):
+    """ Tuplas por bloque, como las devuelve fetchmany: se crean al iterar y solo sobrevive lo que se acumula. """
+    n = len(columnar['id'])
+    for inicio in range(0, n, chunk_size):
+        yield [tuple(_nuevo(v) for v in fila) for fila in zip(*(columnar[c][inicio:inicio + chunk_size] for c in DASHBOARD_COLUMNS))]
+
+
+def modo_filas(columnar, chunk_size):
+    filas = [fila for bloque in bloques(columnar, chunk_size) for fila in bloque]
+    return pd.DataFrame(filas, columns=DASHBOARD_COLUMNS)
+
+
+def modo_listas(columnar, chunk_size):
+    columnas = {c: [] for c in DASHBOARD_COLUMNS}; listas = list(columnas.values())
+    for bloque in bloques(columnar, chunk_size):
+        for lista, valores in zip(listas, zip(*bloque)): lista.extend(valores)
+    return pd.DataFrame(columnas, copy=False)
+
+
+def modo_arrays(columnar, chunk_size):
+    columnas = _columnas_vacias(DESCRIPTION)
+    for bloque in bloques(columnar, chunk_size): _acumular_columnas(columnas, bloque)
+    return pd.DataFrame(CrmService._columnas_numpy(columnas), copy=False)
+
+
+MODOS = {'filas': modo_filas, 'listas': modo_listas, 'arrays': modo_arrays}
+
+
+def medir(funcion, columnar, chunk_size):
+    """ (memoria pico en MB, segundos) de leer y armar el DataFrame; los segundos incluyen generar los bloques. """
+    tracemalloc.start(); t0 = time.perf_counter()
+    df = funcion(columnar, chunk_size)
+    segundos = time.perf_counter() - t0; _, pico = tracemalloc.get_traced_memory(); tracemalloc.stop()
+    del df
+    return pico / 2**20, segundos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memoria pico de la lectura columnar del dashboard.")
+    parser.add_argument('--filas', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--chunk', type=int, default=10_000, help="Filas por fetchmany")
+    args = parser.parse_args()
+
+    print(f"{'filas':>10} {'modo':>8} {'pico MB':>10} {'segundos':>10}")
+    for n in args.filas:
+        columnar = datos_sinteticos(n)
+        for nombre, funcion in MODOS.items():
+            pico, segundos = medir(funcion, columnar, args.chunk)
+            print(f"{n:>10} {nombre:>8} {pico:>10.1f} {segundos:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# bench/get_dashboard_pipeline.py
+# Micro-benchmark de la transformación de CrmService.get_dashboard (sin base de datos).
+# Genera datos columnares sintéticos con la forma de get_dashboard_data_columnar y mide
+# el pipeline anterior (apply por fila, formato sobre todas las filas) contra construir_dashboard.
+#   python -m bench.get_dashboard_pipeline --filas 10000 100000 1000000
+import argparse
+import random
+import time
+from datetime import datetime as dt, timedelta
+import pandas as pd
+from core.services import CrmService
+
+DASHBOARD_COLUMNS = ['id','fecha_interaccion','tipo_interaccion','llamada_concretada','respuesta_cliente','fecha_prox_seguimiento','venta_cerrada','motivo_no_venta','ofrecio_otros_precios','cliente_conoce_catalogo','le_llego_bien_pedido','comentarios_venta','cliente_informo_pago','reviso_cta_cte','comentarios_cobranza','fk_vendedor_dni','vendedor_nombre','vendedor_zona','fk_cliente_cuit','cliente_razon_social','cliente_zona']
+
+
+def datos_sinteticos(n: int, seed: int = 42) -> dict:
+    rnd = random.Random(seed)
+    ahora = dt(2025, 1, 1)
+    bools = lambda p: [rnd.random() < p for _ in range(n)]
+    return {
+        'id': list(range(n, 0, -1)),
+        'fecha_interaccion': [ahora - timedelta(minutes=7 * i) for i in range(n)],
+        'tipo_interaccion': [rnd.choice(['Llamada', 'Visita', 'WhatsApp', 'Email']) for _ in range(n)],
+        'llamada_concretada': bools(0.6), 'respuesta_cliente': [rnd.choice([None, 'Pide lista de precios', 'Volver a llamar']) for _ in range(n)],
+        'fecha_prox_seguimiento': [None] * n, 'venta_cerrada': bools(0.25),
+        'motivo_no_venta': [rnd.choice([None, 'Precio', 'Completo de mercadería', 'Otro']) for _ in range(n)],
+        'ofrecio_otros_precios': bools(0.2), 'cliente_conoce_catalogo': bools(0.5), 'le_llego_bien_pedido': bools(0.9),
+        'comentarios_venta': [rnd.choice([None, 'Entrega martes', '']) for _ in range(n)],
+        'cliente_informo_pago': bools(0.3), 'reviso_cta_cte': bools(0.3), 'comentarios_cobranza': [None] * n,
+        'fk_vendedor_dni': [str(20000000 + rnd.randrange(30)) for _ in range(n)], 'vendedor_nombre': [f"Vendedor {rnd.randrange(30)}" for _ in range(n)],
+        'vendedor_zona': ['Norte'] * n, 'fk_cliente_cuit': [30700000000 + rnd.randrange(5000) for _ in range(n)],
+        'cliente_razon_social': [f"Cliente {rnd.randrange(5000)}" for _ in range(n)], 'cliente_zona': ['Norte'] * n,
+    }
+
+
+def pipeline_anterior(raw_rows: list):
+    """ Transformación previa a la vectorización (DataFrame desde filas, apply y formato sobre todo). """
+    df = pd.DataFrame(raw_rows, columns=DASHBOARD_COLUMNS)
+    expected_cols = {'llamada_concretada': (bool, False),'venta_cerrada': (bool, False),'tipo_interaccion': (str, 'Desconocido'),'motivo_no_venta': (str, None),'vendedor_nombre': (str, 'Desconocido'),'cliente_razon_social': (str, 'Desconocido'),'fecha_interaccion': ('datetime', pd.NaT),'fecha_prox_seguimiento': ('datetime', pd.NaT),'respuesta_cliente': (str, ''),'comentarios_venta': (str, '')}
+    for col, (dtype, default) in expected_cols.items():
+        if dtype == bool: df[col] = df[col].apply(lambda x: bool(x) if pd.notna(x) else False)
+        elif dtype == str: df[col] = df[col].fillna(default if default is not None else '').astype(str)
+        elif dtype == 'datetime': df[col] = pd.to_datetime(df[col], errors='coerce')
+    kpis = (df['llamada_concretada'].mean(), df['venta_cerrada'].mean())
+    motivos_df = df[(df['venta_cerrada'] == False) & (df['motivo_no_venta'] != '')]
+    motivos_agg = motivos_df.groupby('motivo_no_venta').size()
+    df['fecha_interaccion_str'] = df['fecha_interaccion'].dt.strftime('%d-%m %H:%M').where(df['fecha_interaccion'].notna(), 'N/A')
+    df['comentarios_display'] = (df['respuesta_cliente'] + "\n" + df['comentarios_venta']).str.strip()
+    df['venta_cerrada_display'] = df['venta_cerrada'].apply(lambda x: 'Sí' if x else 'No')
+    return kpis, motivos_agg, df.head(50).to_dict('records')
+
+
+def medir(funcion, argumento, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter(); funcion(argumento); tiempos.append(time.perf_counter() - t0)
+    return min(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark del pipeline de get_dashboard.")
+    parser.add_argument('--filas', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'filas':>10} {'anterior':>12} {'actual':>12} {'µs/fila ant.':>13} {'µs/fila act.':>13} {'speedup':>8}")
+    for n in args.filas:
+        columnar = datos_sinteticos(n)
+        filas = list(zip(*(columnar[c] for c in DASHBOARD_COLUMNS)))
+        t_ant = medir(pipeline_anterior, filas, args.repeticiones)
+        t_act = medir(CrmService.construir_dashboard, columnar, args.repeticiones)
+        print(f"{n:>10} {t_ant:>11.3f}s {t_act:>11.3f}s {t_ant / n * 1e6:>13.2f} {t_act / n * 1e6:>13.2f} {t_ant / t_act:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+# bench/loadtest.py
+# Generador de carga HTTP contra la app real: inicia sesión con el callback de login y
+# reproduce los POST a /_dash-update-component que hace el navegador en las páginas de
+# gerencia, vendedor y nueva interacción, a una tasa objetivo (lazo abierto: la latencia
+# se mide desde el instante programado, así la cola también cuenta).
+#
+# Todo local: app + Postgres local cargado con bench.seed (usuarios *@bench.local).
+# Los usuarios sintéticos no tienen credenciales de Google, así que guardar no llama a Calendar,
+# y ninguna de estas páginas llama al ERP.
+#   POOL_STATUS_ENDPOINT=1 python index.py                      # en otra terminal
+#   python -m bench.loadtest --url http://localhost:3000 --rps 20 --duracion 60
+import argparse
+import json
+import random
+import statistics
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import requests
+from dotenv import load_dotenv
+from core.db import init_db_pool, get_db_connection, release_db_connection
+
+PASSWORD_BENCH = 'bench1234'
+MEZCLA_DEFAULT = {'gerencia': 2, 'vendedor': 5, 'interaccion': 3}
+
+
+class DashClient:
+    """ Sesión HTTP de un usuario que dispara callbacks de Dash como lo haría el navegador. """
+    dependencias = None # Compartidas entre clientes: /_dash-dependencies es igual para todos
+    _lock = threading.Lock()
+
+    def __init__(self, base_url: str, timeout: float):
+        self.base_url = base_url.rstrip('/'); self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({'Content-Type': 'application/json', 'Accept': 'application/json'})
+
+    def cargar_dependencias(self):
+        with DashClient._lock:
+            if DashClient.dependencias is None:
+                r = self.session.get(f"{self.base_url}/_dash-dependencies", timeout=self.timeout); r.raise_for_status()
+                DashClient.dependencias = r.json()
+
+    @staticmethod
+    def buscar_callback(output_key: str, disparador: str) -> dict:
+        """
+        Dependencia cuyo output incluye output_key ('id.prop') y que tiene a disparador entre sus inputs.
+        Con allow_duplicate varios callbacks escriben el mismo output: el input los distingue. output_key
+        puede traer el sufijo @hash de Dash para elegir uno exacto.
+        """
+        candidatas = []
+        for dep in DashClient.dependencias:
+            salidas = dep['output'].strip('.').split('...')
+            if '@' not in output_key: salidas = [o.split('@')[0] for o in salidas]
+            entradas = {f"{d['id']}.{d['property']}" for d in dep['inputs']}
+            if output_key in salidas and disparador in entradas: candidatas.append(dep)
+        if not candidatas: raise KeyError(f"No hay callback con output {output_key} disparado por {disparador}")
+        if len(candidatas) > 1: raise KeyError(f"Más de un callback con output {output_key} disparado por {disparador}: indique el @hash")
+        return candidatas[0]
+
+    @staticmethod
+    def _parse_outputs(output: str):
+        if not output.startswith('..'):
+            id_, prop = output.rsplit('.', 1); return {'id': id_, 'property': prop}
+        return [dict(zip(('id', 'property'), o.rsplit('.', 1))) for o in output.strip('.').split('...')]
+
+    def callback(self, output_key: str, valores: dict, disparador: str):
+        """ POST a /_dash-update-component. valores: {'id.prop': valor}; lo no indicado va como None. """
+        dep = DashClient.buscar_callback(output_key, disparador)
+        con_valor = lambda deps: [{**d, 'value': valores.get(f"{d['id']}.{d['property']}")} for d in deps]
+        payload = {
+            'output': dep['output'], 'outputs': self._parse_outputs(dep['output']),
+            'inputs': con_valor(dep['inputs']), 'state': con_valor(dep.get('state', [])),
+            'changedPropIds': [disparador],
+        }
+        return self.session.post(f"{self.base_url}/_dash-update-component", data=json.dumps(payload), timeout=self.timeout)
+
+    def login(self, email: str, password: str):
+        self.session.get(f"{self.base_url}/login", timeout=self.timeout) # Cookie de sesión inicial, como el navegador
+        return self.callback('url.refresh', {'login-button.n_clicks': 1, 'login-email.value': email, 'login-password.value': password}, 'login-button.n_clicks')
+
+
+# --- Escenarios: payloads equivalentes a los del navegador ---
+
+def escenario_gerencia(cliente: DashClient, datos: dict, rnd: random.Random):
+    hoy = date.today(); dias = rnd.choice([7, 30, 90, 365, None])
+    valores = {
+        'btn-aplicar-filtros-gerencia.n_clicks': rnd.randint(1, 50),
+        'filtro-vendedor-gerencia.value': rnd.choice(datos['vendedores'] + [None] * 3),
+        'filtro-cliente-gerencia.value': rnd.choice(datos['clientes'] + [None] * 20),
+        'filtro-fechas-gerencia.start_date': str(hoy - timedelta(days=dias)) if dias else None,
+        'filtro-fechas-gerencia.end_date': str(hoy) if dias else None,
+    }
+    return cliente.callback('dashboard-gerencia-data-store.data', valores, 'btn-aplicar-filtros-gerencia.n_clicks')
+
+
+def escenario_vendedor(cliente: DashClient, datos: dict, rnd: random.Random):
+    return cliente.callback('dashboard-vendedor-data-store.data', {'initial-load-trigger-vendedor.data': None}, 'initial-load-trigger-vendedor.data')
+
+
+def escenario_interaccion(cliente: DashClient, datos: dict, rnd: random.Random):
+    concretada = rnd.random() < 0.65; venta = concretada and rnd.random() < 0.3
+    valores = {
+        'interaccion-btn-guardar.n_clicks': 1,
+        'interaccion-cliente-cuit.value': rnd.choice(datos['clientes']), 'interaccion-cliente-razon-social-store.data': 'Cliente Loadtest',
+        'interaccion-tipo.value': 'Llamada', 'interaccion-concretada-store.data': concretada,
+        'interaccion-respuesta.value': 'loadtest', 'interaccion-hora-prox-seguimiento.value': 8, 'interaccion-minuto-prox-seguimiento.value': 0,
+        'interaccion-venta-cerrada-store.data': venta, 'interaccion-motivo-no-venta.value': None if venta else 'Precio',
+        'interaccion-llego-bien-pedido-store.data': True, 'interaccion-idempotency-key-store.data': str(uuid.uuid4()),
+    }
+    return cliente.callback('interaccion-feedback-alert.children', valores, 'interaccion-btn-guardar.n_clicks')
+
+
+ESCENARIOS = {'gerencia': ('gerente', escenario_gerencia), 'vendedor': ('vendedor', escenario_vendedor), 'interaccion': ('vendedor', escenario_interaccion)}
+
+
+def datos_muestra():
+    """ Usuarios sintéticos y CUITs reales de la base local para armar payloads válidos. """
+    load_dotenv(); init_db_pool()
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT dni, email, rol FROM users WHERE email LIKE %s", ('%@bench.local',))
+            usuarios = cur.fetchall()
+            cur.execute("SELECT cuit FROM cliente ORDER BY random() LIMIT 500")
+            clientes = [r[0] for r in cur.fetchall()]
+    finally:
+        conn.rollback(); release_db_connection(conn)
+    if not usuarios: raise SystemExit("No hay usuarios @bench.local. Cargar datos con: python -m bench.seed")
+    return {
+        'gerentes': [u[1] for u in usuarios if u[2] == 'gerente'], 'vendedores_email': [u[1] for u in usuarios if u[2] == 'vendedor'],
+        'vendedores': [u[0] for u in usuarios if u[2] == 'vendedor'], 'clientes': clientes,
+    }
+
+
+class Metricas:
+    def __init__(self):
+        self.lock = threading.Lock(); self.latencias = defaultdict(list); self.errores = defaultdict(int); self.detalle_errores = defaultdict(int)
+        self.pool = []
+
+    def registrar(self, escenario, latencia_ms, error=None):
+        with self.lock:
+            self.latencias[escenario].append(latencia_ms)
+            if error: self.errores[escenario] += 1; self.detalle_errores[error[:80]] += 1
+
+    def reporte(self, duracion):
+        print(f"\n{'escenario':<14} {'req':>7} {'req/s':>7} {'err%':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+        for escenario, lat in sorted(self.latencias.items()):
+            lat = sorted(lat); n = len(lat); q = lambda p: lat[min(n - 1, int(p * (n - 1)))]
+            print(f"{escenario:<14} {n:>7} {n / duracion:>7.1f} {self.errores[escenario] / n * 100:>5.1f}% {q(0.5):>8.0f}ms {q(0.95):>8.0f}ms {q(0.99):>8.0f}ms {lat[-1]:>8.0f}ms")
+        if self.detalle_errores:
+            print("\nErrores:"); [print(f"   {c:>6} x {e}") for e, c in sorted(self.detalle_errores.items(), key=lambda kv: -kv[1])]
+        if self.pool:
+            en_uso = [p['en_uso'] for p in self.pool]; maximo = self.pool[-1]['max'] or 1
+            saturado = sum(1 for p in self.pool if p['en_uso'] >= p['max']) / len(self.pool) * 100
+            print(f"\nPool (worker muestreado): en uso p50={statistics.median(en_uso):.0f} max={max(en_uso)} de {maximo}; saturado {saturado:.0f}% del tiempo")
+
+
+def muestrear_pool(base_url, metricas, detener):
+    while not detener.is_set():
+        try:
+            r = requests.get(f"{base_url}/_pool-status", timeout=2)
+            if r.status_code == 200:
+                with metricas.lock: metricas.pool.append(r.json())
+        except requests.RequestException: pass
+        detener.wait(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de callbacks Dash (todo local).")
+    parser.add_argument('--url', default='http://localhost:3000')
+    parser.add_argument('--rps', type=float, default=10, help="Requests por segundo objetivo")
+    parser.add_argument('--duracion', type=float, default=60, help="Segundos de carga sostenida")
+    parser.add_argument('--usuarios', type=int, default=20, help="Sesiones logueadas (vendedores + 1 gerente por cada 10)")
+    parser.add_argument('--concurrencia', type=int, default=50, help="Requests simultáneos máximos")
+    parser.add_argument('--mezcla', default=json.dumps(MEZCLA_DEFAULT), help="Pesos por escenario en JSON")
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed); mezcla = json.loads(args.mezcla)
+    datos = datos_muestra(); metricas = Metricas()
+
+    # --- Fase 1: logins simultáneos (inicio de turno) ---
+    n_gerentes = max(1, args.usuarios // 10)
+    cuentas = [('gerente', e) for e in (datos['gerentes'] * n_gerentes)[:n_gerentes]] + [('vendedor', e) for e in rnd.sample(datos['vendedores_email'], min(args.usuarios - n_gerentes, len(datos['vendedores_email'])))]
+    clientes = {'gerente': [], 'vendedor': []}
+    def login(cuenta):
+        rol, email = cuenta; cliente = DashClient(args.url, args.timeout); cliente.cargar_dependencias()
+        t0 = time.perf_counter()
+        try:
+            r = cliente.login(email, PASSWORD_BENCH)
+            ok = r.status_code == 200 and ('remember_token' in cliente.session.cookies or 'session' in cliente.session.cookies)
+            metricas.registrar('login', (time.perf_counter() - t0) * 1000, None if ok else f"login {r.status_code}")
+            if ok: clientes[rol].append(cliente)
+        except requests.RequestException as e:
+            metricas.registrar('login', (time.perf_counter() - t0) * 1000, type(e).__name__)
+    t_login = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrencia) as ex: list(ex.map(login, cuentas))
+    print(f"Logins: {len(clientes['gerente'])} gerentes y {len(clientes['vendedor'])} vendedores en {time.perf_counter() - t_login:.1f}s")
+    if not clientes['vendedor'] and not clientes['gerente']: raise SystemExit("Ningún login exitoso.")
+
+    # --- Fase 2: carga sostenida a tasa objetivo ---
+    escenarios = [e for e in mezcla if clientes[ESCENARIOS[e][0]]]
+    pesos = [mezcla[e] for e in escenarios]
+    detener = threading.Event()
+    threading.Thread(target=muestrear_pool, args=(args.url, metricas, detener), daemon=True).start()
+
+    def ejecutar(escenario, programado):
+        rol, funcion = ESCENARIOS[escenario]; cliente = random.choice(clientes[rol])
+        try:
+            r = funcion(cliente, datos, random.Random())
+            error = None if r.status_code in (200, 204) else f"{escenario} HTTP {r.status_code}"
+        except requests.RequestException as e:
+            error = f"{escenario} {type(e).__name__}"
+        metricas.registrar(escenario, (time.perf_counter() - programado) * 1000, error)
+
+    inicio = time.perf_counter(); intervalo = 1 / args.rps; n = 0
+    with ThreadPoolExecutor(max_workers=args.concurrencia) as ex:
+        while time.perf_counter() - inicio < args.duracion:
+            programado = inicio + n * intervalo
+            espera = programado - time.perf_counter()
+            if espera > 0: time.sleep(espera)
+            ex.submit(ejecutar, rnd.choices(escenarios, weights=pesos)[0], programado); n += 1
+    duracion = time.perf_counter() - inicio
+    detener.set()
+    metricas.reporte(duracion)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# bench/registrar_interaccion.py
+# Compara el camino de escritura anterior de registrar_interaccion (autocommit on/off,
+# cliente en sentencia aparte, RETURNING *) con el actual (CTE preparada, RETURNING id).
+# Las filas insertadas se marcan con tipo_interaccion = 'Benchmark' y se borran al final.
+import argparse
+import statistics
+import time
+import uuid
+from datetime import datetime as dt, timedelta
+from psycopg2.extras import DictCursor
+from dotenv import load_dotenv
+from core.db import init_db_pool, get_db_connection, release_db_connection
+from core import repository
+from core.repository import CrmRepository
+
+TIPO_BENCHMARK = 'Benchmark'
+
+
+class ContadorCursor(DictCursor):
+    """ DictCursor que cuenta las sentencias enviadas al servidor. """
+    sentencias = 0
+
+    def execute(self, query, vars=None):
+        ContadorCursor.sentencias += 1
+        return super().execute(query, vars)
+
+
+def _input_data(cuit, razon_social):
+    return {
+        'clienteCuit': cuit, 'clienteRazonSocial': razon_social, 'tipoInteraccion': TIPO_BENCHMARK,
+        'llamadaConcretada': True, 'respuestaCliente': 'bench', 'fechaProxSeguimiento': dt.now() + timedelta(days=1),
+        'ventaCerrada': False, 'motivoNoVenta': 'Precio', 'idempotencyKey': str(uuid.uuid4()),
+    }
+
+
+def guardar_anterior(conn, input_data, vendedor_dni):
+    """ Réplica del camino anterior: 2 sentencias + toggles de autocommit + RETURNING *. """
+    conn.autocommit = False
+    try:
+        with conn.cursor(cursor_factory=ContadorCursor) as cur:
+            cur.execute("SELECT cuit FROM cliente WHERE cuit = %s", (input_data['clienteCuit'],))
+            if not cur.fetchone():
+                cur.execute("INSERT INTO cliente (cuit, razon_social) VALUES (%s, %s)", (input_data['clienteCuit'], input_data['clienteRazonSocial']))
+        row = CrmRepository.create_interaccion(conn, input_data, vendedor_dni)
+        conn.commit()
+        return row
+    finally:
+        conn.autocommit = True
+
+
+def guardar_actual(conn, input_data, vendedor_dni):
+    row = CrmRepository.create_interaccion_con_cliente(conn, input_data, vendedor_dni)
+    conn.commit()
+    return row
+
+
+def medir(nombre, funcion, conn, args):
+    latencias = []
+    conn.autocommit = False # Estado con el que el pool entrega las conexiones
+    ContadorCursor.sentencias = 0
+    for _ in range(args.warmup + args.n):
+        t0 = time.perf_counter()
+        funcion(conn, _input_data(args.cuit, args.razon_social), args.vendedor_dni)
+        latencias.append((time.perf_counter() - t0) * 1000)
+    latencias = latencias[args.warmup:]
+    cuantiles = statistics.quantiles(latencias, n=100)
+    # +2 por guardado: BEGIN implícito de psycopg2 y COMMIT
+    sentencias = ContadorCursor.sentencias / (args.warmup + args.n) + 2
+    print(f"{nombre:<10} n={args.n}  p50={cuantiles[49]:.2f}ms  p95={cuantiles[94]:.2f}ms  "
+          f"media={statistics.mean(latencias):.2f}ms  round trips/guardado={sentencias:.1f}")
+
+
+def limpiar(conn):
+    conn.autocommit = False
+    with conn.cursor() as cur:
+        cur.execute("""
+            WITH borradas AS (DELETE FROM interacciones_comerciales WHERE tipo_interaccion = %s RETURNING idempotency_key)
+            DELETE FROM interacciones_idempotencia WHERE idempotency_key IN (SELECT idempotency_key FROM borradas)
+        """, (TIPO_BENCHMARK,))
+        print(f"Filas de benchmark eliminadas: {cur.rowcount}")
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del camino de escritura de registrar_interaccion.")
+    parser.add_argument('--vendedor-dni', required=True, help="DNI de un usuario existente")
+    parser.add_argument('--cuit', type=int, required=True, help="CUIT del cliente a usar")
+    parser.add_argument('--razon-social', default='Cliente Benchmark')
+    parser.add_argument('-n', type=int, default=500, help="Guardados medidos por variante")
+    parser.add_argument('--warmup', type=int, default=20)
+    args = parser.parse_args()
+
+    load_dotenv()
+    # El repositorio resuelve DictCursor en cada llamada: se reemplaza para contar sentencias
+    repository.DictCursor = ContadorCursor
+    init_db_pool()
+    conn = get_db_connection()
+    try:
+        medir('anterior', guardar_anterior, conn, args)
+        medir('actual', guardar_actual, conn, args)
+    finally:
+        limpiar(conn)
+        release_db_connection(conn)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+-- bench/schema.sql
+-- Esquema mínimo para una base local de benchmark (python -m bench.seed --crear-esquema).
+-- Refleja las columnas que usa la aplicación; en producción las tablas ya existen.
+
+-- Búsqueda de texto completo en español sin acentos (sql/004_busqueda_comentarios.sql)
+CREATE EXTENSION IF NOT EXISTS unaccent;
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'crm_es') THEN
+        CREATE TEXT SEARCH CONFIGURATION crm_es (COPY = spanish);
+        ALTER TEXT SEARCH CONFIGURATION crm_es ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+    END IF;
+END $$;
+
+-- Zonas (sql/005_zonas.sql): zona_id se completa por trigger a partir de zona (texto)
+CREATE TABLE IF NOT EXISTS zona (
+    id     smallserial PRIMARY KEY,
+    nombre text NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_zona_nombre ON zona (lower(nombre));
+
+CREATE TABLE IF NOT EXISTS users (
+    dni               varchar(20) PRIMARY KEY,
+    nombre            text NOT NULL,
+    email             text NOT NULL UNIQUE,
+    password_hash     text NOT NULL,
+    rol               text NOT NULL,
+    zona              text,
+    zona_id           smallint REFERENCES zona (id),
+    google_creds_json text,
+    ics_token         text
+);
+
+CREATE TABLE IF NOT EXISTS cliente (
+    cuit         bigint PRIMARY KEY,
+    razon_social text NOT NULL,
+    zona         text,
+    zona_id      smallint REFERENCES zona (id)
+);
+CREATE INDEX IF NOT EXISTS ix_users_zona ON users (zona_id);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_users_ics_token ON users (ics_token);
+CREATE INDEX IF NOT EXISTS ix_cliente_zona ON cliente (zona_id);
+
+CREATE OR REPLACE FUNCTION crm_zona_id(p_nombre text) RETURNS smallint LANGUAGE plpgsql AS $$
+DECLARE
+    v_nombre text := nullif(regexp_replace(btrim(p_nombre), '\s+', ' ', 'g'), '');
+    v_id smallint;
+BEGIN
+    IF v_nombre IS NULL THEN RETURN NULL; END IF;
+    SELECT id INTO v_id FROM zona WHERE lower(nombre) = lower(v_nombre);
+    IF v_id IS NULL THEN
+        INSERT INTO zona (nombre) VALUES (v_nombre) ON CONFLICT ((lower(nombre))) DO NOTHING RETURNING id INTO v_id;
+        IF v_id IS NULL THEN SELECT id INTO v_id FROM zona WHERE lower(nombre) = lower(v_nombre); END IF;
+    END IF;
+    RETURN v_id;
+END $$;
+
+CREATE OR REPLACE FUNCTION crm_asignar_zona() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.zona_id := crm_zona_id(NEW.zona);
+    RETURN NEW;
+END $$;
+
+DROP TRIGGER IF EXISTS tg_users_zona ON users;
+CREATE TRIGGER tg_users_zona BEFORE INSERT OR UPDATE OF zona ON users
+    FOR EACH ROW EXECUTE FUNCTION crm_asignar_zona();
+DROP TRIGGER IF EXISTS tg_cliente_zona ON cliente;
+CREATE TRIGGER tg_cliente_zona BEFORE INSERT OR UPDATE OF zona ON cliente
+    FOR EACH ROW EXECUTE FUNCTION crm_asignar_zona();
+
+CREATE TABLE IF NOT EXISTS interacciones_comerciales (
+    id                      bigserial PRIMARY KEY,
+    fecha_interaccion       timestamptz NOT NULL DEFAULT now(),
+    fk_vendedor_dni         varchar(20) NOT NULL REFERENCES users (dni),
+    fk_cliente_cuit         bigint NOT NULL REFERENCES cliente (cuit),
+    tipo_interaccion        text,
+    llamada_concretada      boolean DEFAULT false,
+    respuesta_cliente       text,
+    fecha_prox_seguimiento  timestamptz,
+    venta_cerrada           boolean DEFAULT false,
+    motivo_no_venta         text,
+    ofrecio_otros_precios   boolean DEFAULT false,
+    cliente_conoce_catalogo boolean DEFAULT false,
+    le_llego_bien_pedido    boolean DEFAULT false,
+    comentarios_venta       text,
+    cliente_informo_pago    boolean DEFAULT false,
+    reviso_cta_cte          boolean DEFAULT false,
+    comentarios_cobranza    text,
+    idempotency_key         uuid,
+    google_event_id         text,
+    google_event_error      text,
+    busqueda                tsvector GENERATED ALWAYS AS (to_tsvector('crm_es', coalesce(respuesta_cliente, '') || ' ' || coalesce(comentarios_venta, '') || ' ' || coalesce(comentarios_cobranza, ''))) STORED
+);
+
+-- Registro de claves de idempotencia (sql/002_registro_idempotencia.sql)
+CREATE TABLE IF NOT EXISTS interacciones_idempotencia (
+    idempotency_key   uuid PRIMARY KEY,
+    interaccion_id    bigint NOT NULL,
+    fecha_interaccion timestamptz NOT NULL
+);
+
+-- Índices de las columnas por las que filtran los dashboards
+CREATE INDEX IF NOT EXISTS ix_interacciones_fecha
+    ON interacciones_comerciales (fecha_interaccion DESC);
+CREATE INDEX IF NOT EXISTS ix_interacciones_vendedor_fecha
+    ON interacciones_comerciales (fk_vendedor_dni, fecha_interaccion DESC);
+-- Historial por cliente con paginación keyset (sql/003_indice_historial_cliente.sql)
+CREATE INDEX IF NOT EXISTS ix_interacciones_cliente_historial
+    ON interacciones_comerciales (fk_cliente_cuit, fecha_interaccion DESC, id DESC)
+    INCLUDE (fk_vendedor_dni, tipo_interaccion, llamada_concretada, venta_cerrada, motivo_no_venta, fecha_prox_seguimiento);
+-- Búsqueda en comentarios (sql/004_busqueda_comentarios.sql)
+CREATE INDEX IF NOT EXISTS ix_interacciones_busqueda
+    ON interacciones_comerciales USING gin (busqueda);
+-- Feed ICS y próximos seguimientos (sql/006_calendario_ics.sql)
+CREATE INDEX IF NOT EXISTS ix_interacciones_seguimientos
+    ON interacciones_comerciales (fk_vendedor_dni, fecha_prox_seguimiento)
+    INCLUDE (id, fecha_interaccion)
+    WHERE fecha_prox_seguimiento IS NOT NULL;
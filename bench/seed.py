@@ -0,0 +1,140 @@
+# bench/seed.py
+# Carga datos sintéticos realistas en una base local para los benchmarks.
+# La actividad se reparte entre vendedores y clientes con una distribución de Zipf
+# (pocos vendedores/clientes concentran la mayoría de las interacciones), como en producción.
+#   python -m bench.seed --crear-esquema --interacciones 1000000
+#   python -m bench.seed --interacciones 10000000 --vendedores 80 --clientes 50000 --truncar
+# ¡Usar solo contra una base local! --truncar borra users, cliente e interacciones_comerciales.
+import argparse
+import csv
+import io
+import os
+import random
+import time
+import uuid
+from datetime import datetime as dt, timedelta
+from dotenv import load_dotenv
+from core.db import init_db_pool, get_db_connection, release_db_connection
+from core.password import hash_password
+
+ZONAS = ['Norte', 'Sur', 'Centro', 'Oeste', 'Costa', 'Interior']
+TIPOS = ['Llamada', 'Llamada', 'Llamada', 'WhatsApp', 'Visita', 'Email']
+MOTIVOS = ['Precio', 'Completo de mercadería', 'Otro']
+RESPUESTAS = ['Pide lista de precios actualizada', 'Volver a llamar la semana próxima', 'No atiende', 'Conforme con el último pedido', 'Consulta por cortes especiales', None, None]
+COMENTARIOS = ['Entrega martes', 'Pidió media res', 'Reclamo por demora', None, None, None]
+PASSWORD_BENCH = 'bench1234'
+DNI_BASE = 30000000
+CUIT_BASE = 30700000000
+TAMANO_LOTE = 50000
+
+
+def pesos_zipf(n: int, s: float) -> list:
+    return [1 / (rank ** s) for rank in range(1, n + 1)]
+
+
+def _copy(conn, tabla, columnas, filas):
+    buffer = io.StringIO(); csv.writer(buffer).writerows(filas); buffer.seek(0)
+    with conn.cursor() as cur:
+        cur.copy_expert(f"COPY {tabla} ({', '.join(columnas)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def seed_usuarios(conn, n_vendedores: int):
+    password_hash = hash_password(PASSWORD_BENCH) # Un solo hash: bcrypt es lento a propósito
+    filas = [(str(DNI_BASE + i), f"Vendedor {i:03d}", f"vendedor{i:03d}@bench.local", password_hash, 'vendedor', ZONAS[i % len(ZONAS)]) for i in range(n_vendedores)]
+    filas.append((str(DNI_BASE - 1), "Gerente Bench", "gerente@bench.local", password_hash, 'gerente', None))
+    _copy(conn, 'users', ['dni', 'nombre', 'email', 'password_hash', 'rol', 'zona'], filas)
+    return [f[0] for f in filas[:-1]]
+
+
+def seed_clientes(conn, n_clientes: int, rnd: random.Random):
+    filas = [(CUIT_BASE + i, f"Cliente Sintético {i:06d} S.A.", rnd.choice(ZONAS)) for i in range(n_clientes)]
+    for i in range(0, len(filas), TAMANO_LOTE):
+        _copy(conn, 'cliente', ['cuit', 'razon_social', 'zona'], filas[i:i + TAMANO_LOTE])
+    return [f[0] for f in filas]
+
+
+def generar_interacciones(n: int, vendedores: list, clientes: list, anios: float, skew: float, rnd: random.Random):
+    ahora = dt.now().replace(microsecond=0)
+    rango_seg = int(anios * 365 * 86400)
+    pesos_vend = pesos_zipf(len(vendedores), skew); pesos_cli = pesos_zipf(len(clientes), skew)
+    lote = 10000
+    for inicio in range(0, n, lote):
+        k = min(lote, n - inicio)
+        vends = rnd.choices(vendedores, weights=pesos_vend, k=k)
+        clis = rnd.choices(clientes, weights=pesos_cli, k=k)
+        for vend, cli in zip(vends, clis):
+            fecha = ahora - timedelta(seconds=rnd.randrange(rango_seg))
+            concretada = rnd.random() < 0.65
+            venta = concretada and rnd.random() < 0.3
+            prox = fecha + timedelta(days=rnd.randint(1, 21), hours=rnd.randint(0, 8)) if rnd.random() < 0.4 else None
+            yield (
+                fecha.isoformat(sep=' '), vend, cli, rnd.choice(TIPOS), concretada, rnd.choice(RESPUESTAS),
+                prox.isoformat(sep=' ') if prox else None, venta,
+                rnd.choice(MOTIVOS) if concretada and not venta else None, concretada and not venta and rnd.random() < 0.3,
+                concretada and rnd.random() < 0.6, concretada and rnd.random() < 0.9, rnd.choice(COMENTARIOS) if concretada else None,
+                concretada and rnd.random() < 0.2, concretada and rnd.random() < 0.2, None, str(uuid.UUID(int=rnd.getrandbits(128), version=4))
+            )
+
+
+COLUMNAS_INTERACCION = [
+    'fecha_interaccion', 'fk_vendedor_dni', 'fk_cliente_cuit', 'tipo_interaccion', 'llamada_concretada', 'respuesta_cliente',
+    'fecha_prox_seguimiento', 'venta_cerrada', 'motivo_no_venta', 'ofrecio_otros_precios', 'cliente_conoce_catalogo',
+    'le_llego_bien_pedido', 'comentarios_venta', 'cliente_informo_pago', 'reviso_cta_cte', 'comentarios_cobranza', 'idempotency_key'
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos para benchmarks (base local).")
+    parser.add_argument('--interacciones', type=int, default=100_000, help="10k a 10M")
+    parser.add_argument('--vendedores', type=int, default=40)
+    parser.add_argument('--clientes', type=int, default=20_000)
+    parser.add_argument('--anios', type=float, default=3, help="Años de historia hacia atrás")
+    parser.add_argument('--skew', type=float, default=1.1, help="Exponente de Zipf para vendedores y clientes")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--crear-esquema', action='store_true', help="Aplica bench/schema.sql")
+    parser.add_argument('--truncar', action='store_true', help="Vacía las tablas antes de cargar")
+    args = parser.parse_args()
+
+    load_dotenv()
+    init_db_pool()
+    rnd = random.Random(args.seed)
+    conn = get_db_connection()
+    inicio = time.perf_counter()
+    try:
+        with conn.cursor() as cur:
+            if args.crear_esquema:
+                with open(os.path.join(os.path.dirname(__file__), 'schema.sql'), encoding='utf-8') as f: cur.execute(f.read())
+            if args.truncar:
+                cur.execute("TRUNCATE interacciones_comerciales, interacciones_idempotencia, cliente, users RESTART IDENTITY CASCADE")
+        vendedores = seed_usuarios(conn, args.vendedores)
+        clientes = seed_clientes(conn, args.clientes, rnd)
+        conn.commit()
+        print(f"Usuarios: {len(vendedores)} vendedores + 1 gerente (password '{PASSWORD_BENCH}'). Clientes: {len(clientes)}.")
+
+        cargadas = 0; lote = []
+        for fila in generar_interacciones(args.interacciones, vendedores, clientes, args.anios, args.skew, rnd):
+            lote.append(fila)
+            if len(lote) >= TAMANO_LOTE:
+                _copy(conn, 'interacciones_comerciales', COLUMNAS_INTERACCION, lote); conn.commit()
+                cargadas += len(lote); lote = []
+                print(f"   {cargadas:,} interacciones ({time.perf_counter() - inicio:.0f}s)", end='\r')
+        if lote:
+            _copy(conn, 'interacciones_comerciales', COLUMNAS_INTERACCION, lote); cargadas += len(lote)
+        with conn.cursor() as cur:
+            # El COPY no pasa por CrmRepository: las claves se registran en bloque
+            cur.execute("""
+                INSERT INTO interacciones_idempotencia (idempotency_key, interaccion_id, fecha_interaccion)
+                SELECT idempotency_key, id, fecha_interaccion FROM interacciones_comerciales WHERE idempotency_key IS NOT NULL
+                ON CONFLICT (idempotency_key) DO NOTHING
+            """)
+            cur.execute("ANALYZE users; ANALYZE cliente; ANALYZE interacciones_comerciales; ANALYZE interacciones_idempotencia;")
+        conn.commit()
+        print(f"\nInteracciones cargadas: {cargadas:,} en {time.perf_counter() - inicio:.0f}s")
+    except Exception:
+        conn.rollback(); raise
+    finally:
+        release_db_connection(conn)
+
+
+if __name__ == "__main__":
+    main()
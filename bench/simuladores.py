@@ -0,0 +1,189 @@
+# bench/simuladores.py
+# Servidores locales que reemplazan al ERP y a Google Calendar para medir la sincronización
+# de clientes y el guardado de interacciones sin depender de servicios externos.
+#   python -m bench.simuladores --clientes 50000 --latencia-ms 80 --jitter-ms 40 --tasa-error 0.01 --rps 20
+#   python -m bench.simuladores --credenciales-bench      # credenciales falsas para los users @bench.local
+# Variables de entorno para apuntar la app / sync_cliente_manual.py al simulador:
+#   ERP_API_URL=http://localhost:8091/erp/clientes  ERP_API_USER=bench  ERP_API_PASSWORD=bench  ERP_PAGE_SIZE=1000
+#   GOOGLE_CALENDAR_API_ENDPOINT=http://localhost:8091/  GOOGLE_TOKEN_URI=http://localhost:8091/token
+# Calendar respeta el 'id' del cuerpo (409 si ya existe) y atiende /batch/calendar/v3 (multipart/mixed):
+# un pedido batch paga una sola latencia, pero cada evento consume del límite de --rps.
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ZONAS = ['Norte', 'Sur', 'Centro', 'Oeste', 'Este']
+CUIT_BASE = 30700000000 # Mismo rango que bench.seed: los clientes del catálogo coinciden con los sembrados
+
+
+class TokenBucket:
+    """ Limitador de pedidos por segundo; sin capacidad el simulador responde 429 como las APIs reales. """
+    def __init__(self, rps: float):
+        self.rps = rps; self.tokens = rps; self.ultimo = time.monotonic(); self.lock = threading.Lock()
+    def tomar(self) -> bool:
+        if not self.rps: return True
+        with self.lock:
+            ahora = time.monotonic()
+            self.tokens = min(self.rps, self.tokens + (ahora - self.ultimo) * self.rps); self.ultimo = ahora
+            if self.tokens < 1: return False
+            self.tokens -= 1; return True
+
+
+def catalogo(n: int, seed: int = 42) -> list:
+    """ Catálogo de clientes con la forma de la respuesta del ERP (name, numero_documento, mobile, phone). """
+    rnd = random.Random(seed)
+    return [{
+        'id': i + 1, 'name': f"Cliente Bench {i:06d} S.A.", 'numero_documento': str(CUIT_BASE + i),
+        'mobile': f"11{rnd.randrange(10**8):08d}", 'phone': None if rnd.random() < 0.5 else f"11{rnd.randrange(10**8):08d}",
+        'zona': rnd.choice(ZONAS),
+    } for i in range(n)]
+
+
+def crear_handler(config, clientes, bucket):
+    contadores = {'erp': 0, 'calendar': 0, 'calendar_batch': 0, 'token': 0, 'errores': 0, 'throttled': 0}
+    lock = threading.Lock()
+    eventos = set() # ids de eventos creados (los que manda el cliente o los generados)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1' # Keep-alive: requests.Session reutiliza la conexión entre páginas
+
+        def log_message(self, *args):
+            if config.verbose: super().log_message(*args)
+
+        def _responder(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json'); self.send_header('Content-Length', str(len(body)))
+            self.end_headers(); self.wfile.write(body)
+
+        def _contar(self, clave):
+            with lock: contadores[clave] += 1
+
+        def _simular_red(self) -> bool:
+            """ Latencia + jitter, throttling y errores 5xx. Devuelve False si ya se respondió con error. """
+            demora = config.latencia_ms + random.uniform(-config.jitter_ms, config.jitter_ms)
+            if demora > 0: time.sleep(demora / 1000)
+            if not bucket.tomar():
+                self._contar('throttled'); self._responder(429, {'error': {'code': 429, 'message': 'Rate Limit Exceeded'}}); return False
+            if random.random() < config.tasa_error:
+                self._contar('errores'); self._responder(503, {'error': {'code': 503, 'message': 'Backend Error'}}); return False
+            return True
+
+        def _crear_evento(self, body):
+            """ (status, payload) de un insert de Calendar: 409 si el id ya existe. """
+            event_id = body.get('id') or uuid.uuid4().hex
+            with lock:
+                if event_id in eventos: return 409, {'error': {'code': 409, 'message': 'The requested identifier already exists.'}}
+                eventos.add(event_id)
+            return 200, {**body, 'id': event_id, 'status': 'confirmed', 'htmlLink': f"http://localhost:{config.puerto}/event?eid={event_id}"}
+
+        def _batch_calendar(self):
+            """ Batch de Calendar: cada parte es un insert; la respuesta lleva una parte por pedido con Content-ID response-<id>. """
+            cuerpo = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            mensaje = BytesParser().parsebytes(f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode() + cuerpo)
+            demora = config.latencia_ms + random.uniform(-config.jitter_ms, config.jitter_ms)
+            if demora > 0: time.sleep(demora / 1000)
+            self._contar('calendar_batch'); frontera = uuid.uuid4().hex; partes = []
+            for parte in mensaje.get_payload() if mensaje.is_multipart() else []:
+                pedido = re.split(r'\r?\n\r?\n', parte.get_payload(), maxsplit=1)
+                try: body = json.loads(pedido[1]) if len(pedido) > 1 and pedido[1].strip() else {}
+                except ValueError: body = {}
+                if not bucket.tomar(): self._contar('throttled'); status, payload = 429, {'error': {'code': 429, 'message': 'Rate Limit Exceeded'}}
+                elif random.random() < config.tasa_error: self._contar('errores'); status, payload = 503, {'error': {'code': 503, 'message': 'Backend Error'}}
+                else: self._contar('calendar'); status, payload = self._crear_evento(body)
+                cid = (parte['Content-ID'] or '').strip('<>')
+                partes.append(f"--{frontera}\r\nContent-Type: application/http\r\nContent-ID: <response-{cid}>\r\n\r\n"
+                              f"HTTP/1.1 {status} {self.responses.get(status, ('',))[0]}\r\nContent-Type: application/json\r\n\r\n{json.dumps(payload)}\r\n")
+            respuesta = (''.join(partes) + f"--{frontera}--\r\n").encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', f"multipart/mixed; boundary={frontera}"); self.send_header('Content-Length', str(len(respuesta)))
+            self.end_headers(); self.wfile.write(respuesta)
+
+        def _leer_json(self):
+            largo = int(self.headers.get('Content-Length') or 0)
+            if not largo: return {}
+            try: return json.loads(self.rfile.read(largo))
+            except ValueError: return {}
+
+        def do_GET(self):
+            if self.path == '/_stats': self._responder(200, contadores); return
+            self._responder(404, {'error': 'not found'})
+
+        def do_POST(self):
+            ruta = self.path.split('?', 1)[0]
+            if ruta == '/token': # Refresh de OAuth: no pasa por latencia ni errores
+                self.rfile.read(int(self.headers.get('Content-Length') or 0)); self._contar('token')
+                self._responder(200, {'access_token': f"sim-{uuid.uuid4().hex}", 'expires_in': 3600, 'token_type': 'Bearer'}); return
+            if ruta == '/batch/calendar/v3': self._batch_calendar(); return
+            body = self._leer_json()
+            if not self._simular_red(): return
+            if ruta == config.ruta_erp:
+                self._contar('erp')
+                params = body.get('params') or {}
+                offset = int(params.get('offset') or 0); limit = params.get('limit')
+                # Sin limit el ERP devuelve todo el catálogo de una vez (comportamiento actual de ErpService)
+                pagina = clientes[offset:offset + int(limit)] if limit else clientes[offset:]
+                self._responder(200, {'jsonrpc': '2.0', 'result': pagina}); return
+            if ruta.startswith('/calendar/v3/calendars/') and ruta.endswith('/events'):
+                self._contar('calendar')
+                self._responder(*self._crear_evento(body)); return
+            self._responder(404, {'error': 'not found'})
+
+    return Handler, contadores
+
+
+def credenciales_bench(puerto: int):
+    """ Asigna credenciales de Google falsas (que apuntan al simulador) a los usuarios sembrados por bench.seed. """
+    from dotenv import load_dotenv
+    from core.db import get_db_connection, release_db_connection
+    load_dotenv()
+    creds = json.dumps({
+        'token': 'sim-token', 'refresh_token': 'sim-refresh', 'token_uri': f"http://localhost:{puerto}/token",
+        'client_id': 'bench', 'client_secret': 'bench', 'scopes': ['https://www.googleapis.com/auth/calendar.events'],
+    })
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("UPDATE users SET google_creds_json = %s WHERE email LIKE %s", (creds, '%@bench.local'))
+            print(f"Credenciales de simulador asignadas a {cur.rowcount} usuarios @bench.local.")
+        conn.commit()
+    finally:
+        release_db_connection(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simuladores locales de ERP y Google Calendar.")
+    parser.add_argument('--puerto', type=int, default=8091)
+    parser.add_argument('--ruta-erp', default='/erp/clientes')
+    parser.add_argument('--clientes', type=int, default=10_000, help="Tamaño del catálogo del ERP")
+    parser.add_argument('--duplicados', type=float, default=0.0, help="Fracción de clientes repetidos en el catálogo (el ERP real los repite)")
+    parser.add_argument('--latencia-ms', type=float, default=50)
+    parser.add_argument('--jitter-ms', type=float, default=20)
+    parser.add_argument('--tasa-error', type=float, default=0.0, help="Probabilidad de responder 503")
+    parser.add_argument('--rps', type=float, default=0, help="Límite de pedidos por segundo (0 = sin límite); excedido responde 429")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--credenciales-bench', action='store_true', help="Solo asigna credenciales del simulador a los users @bench.local y sale")
+    parser.add_argument('--verbose', action='store_true')
+    config = parser.parse_args()
+
+    if config.credenciales_bench: credenciales_bench(config.puerto); return
+    random.seed(config.seed)
+    clientes = catalogo(config.clientes, config.seed)
+    if config.duplicados: clientes += random.sample(clientes, int(len(clientes) * config.duplicados))
+    handler, contadores = crear_handler(config, clientes, TokenBucket(config.rps))
+    servidor = ThreadingHTTPServer(('0.0.0.0', config.puerto), handler)
+    print(f"Simuladores en http://localhost:{config.puerto}  (ERP: {config.ruta_erp}, {len(clientes)} clientes; Calendar: /calendar/v3/... y /batch/calendar/v3; stats: /_stats)")
+    try: servidor.serve_forever()
+    except KeyboardInterrupt: pass
+    finally:
+        servidor.server_close(); print(f"\nPedidos atendidos: {contadores}")
+
+
+if __name__ == "__main__":
+    main()
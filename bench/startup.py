@@ -0,0 +1,65 @@
+# bench/startup.py
+# Tiempo de arranque: importa cada módulo en un proceso nuevo con `python -X importtime`
+# y reporta el tiempo total, los imports más caros y qué dependencias pesadas se cargaron.
+#   python -m bench.startup
+#   python -m bench.startup --modulos app core.erp --top 20
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MODULOS_DEFAULT = ['app', 'sync_cliente_manual', 'core.erp', 'core.services']
+DEPENDENCIAS_PESADAS = ['pandas', 'numpy', 'plotly.express', 'googleapiclient.discovery', 'google_auth_oauthlib.flow', 'requests', 'unidecode', 'dash', 'psycopg2']
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr: str) -> dict:
+    """ {módulo: (self_us, cumulative_us)} a partir de la salida de -X importtime. """
+    modulos = {}
+    for linea in stderr.splitlines():
+        if not linea.startswith('import time:') or 'self [us]' in linea: continue
+        try:
+            self_us, cumulative_us, nombre = linea[len('import time:'):].split('|')
+            modulos[nombre.strip()] = (int(self_us), int(cumulative_us))
+        except ValueError:
+            continue
+    return modulos
+
+
+def medir_modulo(modulo: str, repeticiones: int):
+    tiempos = []; modulos = {}
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {modulo}"], cwd=RAIZ, capture_output=True, text=True)
+        tiempos.append(time.perf_counter() - t0)
+        if proc.returncode != 0:
+            print(f"ERROR importando {modulo}:\n{proc.stderr.splitlines()[-1] if proc.stderr else ''}")
+            return None
+        modulos = parse_importtime(proc.stderr)
+    return statistics.median(tiempos), modulos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reporte de tiempo de import (arranque de workers y scripts).")
+    parser.add_argument('--modulos', nargs='+', default=MODULOS_DEFAULT)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    for modulo in args.modulos:
+        resultado = medir_modulo(modulo, args.repeticiones)
+        if not resultado: continue
+        wall, modulos = resultado
+        total_ms = sum(s for s, _ in modulos.values()) / 1000
+        print(f"\n=== import {modulo}: {wall * 1000:.0f} ms de proceso (mediana de {args.repeticiones}), {total_ms:.0f} ms en imports, {len(modulos)} módulos ===")
+        top = sorted(modulos.items(), key=lambda kv: kv[1][1], reverse=True)[:args.top]
+        for nombre, (self_us, cumulative_us) in top:
+            print(f"   {cumulative_us / 1000:8.1f} ms acumulado  {self_us / 1000:7.1f} ms propio  {nombre}")
+        cargadas = [d for d in DEPENDENCIAS_PESADAS if d in modulos]
+        print(f"   Dependencias pesadas cargadas: {', '.join(cargadas) if cargadas else 'ninguna'}")
+
+
+if __name__ == "__main__":
+    main()
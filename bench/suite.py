@@ -0,0 +1,127 @@
+# bench/suite.py
+# Benchmarks de los caminos críticos del repositorio y los servicios contra la base de .env
+# (normalmente una base local cargada con bench.seed). Reporta p50/p95, filas y pico de memoria
+# y guarda los resultados en JSON para comparar entre commits.
+#   python -m bench.suite
+#   python -m bench.suite --repeticiones 20 --comparar bench/results/20260101-120000_abc1234.json
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import time
+import tracemalloc
+import uuid
+from datetime import date, timedelta
+from dotenv import load_dotenv
+from core.db import init_db_pool, get_db_connection, release_db_connection
+from core.repository import CrmRepository
+from core.services import CrmService
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def _contar(resultado):
+    if isinstance(resultado, dict):
+        if 'kpis' in resultado: return resultado['kpis'].get('totalInteracciones', 0)
+        return len(next(iter(resultado.values()), []))
+    return len(resultado) if resultado is not None else 0
+
+
+def medir(nombre, funcion, repeticiones, warmup=1):
+    for _ in range(warmup): funcion()
+    latencias = []; filas = 0
+    for _ in range(repeticiones):
+        t0 = time.perf_counter(); resultado = funcion(); latencias.append((time.perf_counter() - t0) * 1000)
+        filas = _contar(resultado)
+    # Pico de memoria en una corrida aparte: tracemalloc distorsiona los tiempos
+    tracemalloc.start(); funcion(); _, pico = tracemalloc.get_traced_memory(); tracemalloc.stop()
+    latencias.sort()
+    p95 = latencias[min(len(latencias) - 1, int(round(0.95 * (len(latencias) - 1))))]
+    resultado = {'nombre': nombre, 'p50_ms': round(statistics.median(latencias), 2), 'p95_ms': round(p95, 2), 'filas': filas, 'pico_mem_mb': round(pico / 2**20, 2), 'repeticiones': repeticiones}
+    print(f"{nombre:<55} p50={resultado['p50_ms']:>9.2f}ms  p95={resultado['p95_ms']:>9.2f}ms  filas={filas:>9}  mem={resultado['pico_mem_mb']:>8.2f}MB")
+    return resultado
+
+
+def _muestras():
+    """ Vendedor con más y con menos actividad, cliente más activo y una interacción de ejemplo. """
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT fk_vendedor_dni, count(*) FROM interacciones_comerciales GROUP BY 1 ORDER BY 2 DESC")
+            vendedores = cur.fetchall()
+            cur.execute("SELECT fk_cliente_cuit FROM interacciones_comerciales GROUP BY 1 ORDER BY count(*) DESC LIMIT 1")
+            cliente = cur.fetchone()
+        if not vendedores: raise SystemExit("La base no tiene interacciones. Cargar datos con: python -m bench.seed")
+        return vendedores[0][0], vendedores[-1][0], cliente[0]
+    finally:
+        conn.rollback(); release_db_connection(conn)
+
+
+def crear_interaccion_rollback(vendedor_dni, cliente_cuit):
+    """ create_interaccion dentro de una transacción que se descarta: mide el INSERT sin ensuciar la base. """
+    conn = get_db_connection()
+    try:
+        datos = {'clienteCuit': cliente_cuit, 'tipoInteraccion': 'Llamada', 'llamadaConcretada': True, 'respuestaCliente': 'bench', 'idempotencyKey': str(uuid.uuid4())}
+        return [CrmRepository.create_interaccion(conn, datos, vendedor_dni)]
+    finally:
+        conn.rollback(); release_db_connection(conn)
+
+
+def git_sha():
+    try: return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception: return 'desconocido'
+
+
+def comparar(actual: list, ruta_anterior: str):
+    with open(ruta_anterior, encoding='utf-8') as f: anterior = {r['nombre']: r for r in json.load(f)['resultados']}
+    print(f"\n--- Comparación contra {os.path.basename(ruta_anterior)} (p50) ---")
+    for r in actual:
+        previo = anterior.get(r['nombre'])
+        if not previo: continue
+        delta = (r['p50_ms'] - previo['p50_ms']) / previo['p50_ms'] * 100 if previo['p50_ms'] else 0
+        marca = '  <-- REGRESIÓN' if delta > 10 else ''
+        print(f"{r['nombre']:<55} {previo['p50_ms']:>9.2f} -> {r['p50_ms']:>9.2f}ms ({delta:+.0f}%){marca}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suite de benchmarks de repositorio y servicios.")
+    parser.add_argument('--repeticiones', type=int, default=10)
+    parser.add_argument('--salida', help="Ruta del JSON de resultados (default: bench/results/<fecha>_<sha>.json)")
+    parser.add_argument('--comparar', help="JSON de una corrida anterior para mostrar diferencias")
+    args = parser.parse_args()
+
+    load_dotenv()
+    init_db_pool()
+    vend_top, vend_cola, cliente_top = _muestras()
+    hoy = date.today()
+    permutaciones = {
+        'sin filtros': {},
+        'vendedor top': {'vendedorDni': vend_top},
+        'vendedor cola': {'vendedorDni': vend_cola},
+        'cliente top': {'clienteCuit': cliente_top},
+        'últimos 30 días': {'fechaDesde': str(hoy - timedelta(days=30)), 'fechaHasta': str(hoy)},
+        'último año': {'fechaDesde': str(hoy - timedelta(days=365)), 'fechaHasta': str(hoy)},
+        'vendedor top + 30 días': {'vendedorDni': vend_top, 'fechaDesde': str(hoy - timedelta(days=30)), 'fechaHasta': str(hoy)},
+    }
+
+    resultados = []
+    for etiqueta, filtros in permutaciones.items():
+        resultados.append(medir(f"CrmRepository.get_dashboard_data [{etiqueta}]", lambda f=filtros: CrmRepository.get_dashboard_data(f), args.repeticiones))
+        resultados.append(medir(f"CrmService.get_dashboard [{etiqueta}]", lambda f=filtros: CrmService.get_dashboard(f), args.repeticiones))
+    resultados.append(medir("CrmService.get_datos_vendedor [vendedor top]", lambda: CrmService.get_datos_vendedor(vend_top), args.repeticiones))
+    resultados.append(medir("CrmService.get_datos_vendedor [vendedor cola]", lambda: CrmService.get_datos_vendedor(vend_cola), args.repeticiones))
+    resultados.append(medir("CrmRepository.get_clientes_para_dropdown", CrmRepository.get_clientes_para_dropdown, args.repeticiones))
+    resultados.append(medir("CrmRepository.create_interaccion (rollback)", lambda: crear_interaccion_rollback(vend_top, cliente_top), args.repeticiones * 5))
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    sha = git_sha()
+    salida = args.salida or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}_{sha}.json")
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump({'commit': sha, 'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'), 'repeticiones': args.repeticiones, 'resultados': resultados}, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {salida}")
+    if args.comparar: comparar(resultados, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
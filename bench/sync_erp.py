@@ -0,0 +1,29 @@
+# bench/sync_erp.py
+# Throughput de la sincronización de clientes (ErpService + CrmRepository.sincronizar_clientes)
+# contra el simulador de bench.simuladores. Toma ERP_API_URL/ERP_PAGE_SIZE del entorno.
+#   python -m bench.simuladores --clientes 50000 &
+#   ERP_API_URL=http://localhost:8091/erp/clientes ERP_API_USER=bench ERP_API_PASSWORD=bench ERP_PAGE_SIZE=1000 python -m bench.sync_erp
+import argparse
+import time
+from dotenv import load_dotenv
+from core.db import init_db_pool
+from core.erp import ErpService
+from core.repository import CrmRepository
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la sincronización de clientes del ERP.")
+    parser.add_argument('--repeticiones', type=int, default=3, help="La primera corrida inserta; las siguientes miden el caso sin cambios")
+    args = parser.parse_args()
+    load_dotenv()
+    init_db_pool()
+    for i in range(args.repeticiones):
+        t0 = time.perf_counter(); clientes = ErpService.fetch_clientes_from_erp(); t1 = time.perf_counter()
+        resultado = CrmRepository.sincronizar_clientes(clientes) if clientes else {}
+        t2 = time.perf_counter()
+        n = len(clientes) or 1
+        print(f"corrida {i + 1}: {len(clientes)} clientes  fetch={t1 - t0:.2f}s  upsert={t2 - t1:.2f}s  ({n / max(t2 - t0, 1e-9):,.0f} clientes/s)  {resultado}")
+
+
+if __name__ == "__main__":
+    main()
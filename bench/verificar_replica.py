@@ -0,0 +1,49 @@
+# bench/verificar_replica.py
+# Comprueba el ruteo primaria/réplica de core.db con dos instancias locales de Postgres
+# (DB_* = primaria, DB_REPLICA_* = standby) y mide el retraso de replicación de una escritura.
+#   DB_REPLICA_HOST=localhost DB_REPLICA_PORT=5433 python -m bench.verificar_replica
+import time
+from dotenv import load_dotenv
+from core import db
+from core.repository import CrmRepository
+
+
+def servidor(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT inet_server_port(), pg_is_in_recovery()")
+        puerto, en_recuperacion = cur.fetchone()
+    conn.rollback()
+    return f"puerto {puerto} ({'réplica' if en_recuperacion else 'primaria'})"
+
+
+def main():
+    load_dotenv()
+    if not db.REPLICA_CONFIGURADA: raise SystemExit("Definir DB_REPLICA_HOST (y DB_REPLICA_PORT) para probar el ruteo.")
+    for solo_lectura in (False, True):
+        conn = db.get_db_connection(solo_lectura=solo_lectura)
+        try: print(f"get_db_connection(solo_lectura={solo_lectura}): {servidor(conn)}")
+        finally: db.release_db_connection(conn)
+    print(f"get_clientes_para_dropdown (réplica): {len(CrmRepository.get_clientes_para_dropdown())} clientes")
+
+    # Retraso de replicación: cuánto tarda la réplica en ver un commit de la primaria
+    # (es el piso razonable para DB_REPLICA_STICKY_SEG).
+    primaria = db.get_db_connection(); replica = db.get_db_connection(solo_lectura=True)
+    try:
+        with primaria.cursor() as cur:
+            cur.execute("SELECT pg_current_wal_lsn()"); lsn = cur.fetchone()[0]
+        primaria.rollback()
+        t0 = time.perf_counter()
+        while True:
+            with replica.cursor() as cur:
+                cur.execute("SELECT pg_last_wal_replay_lsn() >= %s::pg_lsn", (lsn,)); al_dia = cur.fetchone()[0]
+            replica.rollback()
+            if al_dia or time.perf_counter() - t0 > 30: break
+            time.sleep(0.01)
+        print(f"Réplica al día con la primaria en {(time.perf_counter() - t0) * 1000:.0f} ms (sticky actual: {db.REPLICA_STICKY_SEG}s)")
+    finally:
+        db.release_db_connection(primaria); db.release_db_connection(replica)
+    print(f"pool_status: {db.pool_status()}")
+
+
+if __name__ == "__main__":
+    main()
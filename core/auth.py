@@ -1,8 +1,15 @@
 # core/auth.py
+import logging
 from flask_login import UserMixin
-from core.db import get_db_connection, release_db_connection
+from core.db import get_db_connection, release_db_connection, cache_local
 from core.password import check_password
 from psycopg2.extras import DictCursor
+from core.tracing import trazado
+
+logger = logging.getLogger(__name__)
+
+# user_loader corre en cada request: el usuario se cachea por worker (UserRepository.create invalida)
+_cache_usuarios = cache_local('usuarios', ttl=300)
 
 class User(UserMixin):
     """Clase de Usuario para Flask-Login."""
@@ -15,8 +22,13 @@ class User(UserMixin):
         self.zona = zona
 
     @staticmethod
+    @trazado
     def get(user_id, pool):
         """Carga un usuario desde la DB por su ID (DNI), incluyendo el rol."""
+        return _cache_usuarios.obtener(user_id, lambda: User._cargar(user_id, pool))
+
+    @staticmethod
+    def _cargar(user_id, pool):
         conn = None
         try:
             conn = pool.getconn()
@@ -35,13 +47,14 @@ class User(UserMixin):
                     )
             return None
         except Exception as e:
-            print(f"Error en User.get: {e}")
+            logger.error("Error en User.get: %s", e)
             return None
         finally:
             if conn:
                 pool.putconn(conn)
 
     @staticmethod
+    @trazado
     def authenticate(email, password, pool):
         """Autentica un usuario, incluyendo el rol."""
         conn = None
@@ -64,7 +77,7 @@ class User(UserMixin):
                     )
             return None
         except Exception as e:
-            print(f"Error en User.authenticate: {e}")
+            logger.error("Error en User.authenticate: %s", e)
             return None
         finally:
             if conn:
@@ -0,0 +1,226 @@
+# core/calendario.py
+# Feed ICS (RFC 5545) de los seguimientos de cada vendedor: /calendario/<token>.ics (ruta en app.py).
+# El vendedor se suscribe una vez desde cualquier app de calendario (Google, Outlook, Apple) y la app
+# vuelve a pedir el feed cada tanto; registrar_interaccion no llama a ninguna API externa.
+# Cada pedido hace una consulta index-only (CrmRepository.get_version_seguimientos): si la versión
+# coincide con el ETag del cliente se responde 304 sin armar nada. Las interacciones no se
+# modifican, así que cada VEVENT armado se guarda por worker y al cambiar la versión solo se leen
+# y arman los seguimientos con id mayor al último visto. Si el conteo no cierra (commits fuera de
+# orden de id) se rearma el feed completo. Configuración por entorno:
+#   ICS_DIAS_PASADOS  días hacia atrás que siguen en el feed (default 30; el resto son próximos)
+#
+# Para vendedores con Google Calendar conectado (y sin feed), reconciliar() crea los eventos de los
+# seguimientos que quedaron sin evento (Google caído al guardar, Calendar conectado después) con el
+# batch de la API: hasta CALENDAR_LOTE eventos por pedido HTTP, con CALENDAR_PAUSA_SEG entre pedidos
+# del mismo vendedor (la cuota de Calendar es por usuario); la pausa se duplica ante 429/403 de cuota.
+# Se corre con reconciliar_calendario.py (cron).
+import hashlib
+import itertools
+import logging
+import os
+import secrets
+import threading
+import time
+from datetime import datetime as dt, timedelta, timezone
+from zoneinfo import ZoneInfo
+from core import google_auth
+from core.db import cache_local
+from core.repository import CrmRepository, UserRepository
+from core.tracing import trazado
+
+DIAS_PASADOS = int(os.getenv('ICS_DIAS_PASADOS') or 30)
+# Misma duración y aviso en el feed y en los eventos de Google Calendar (evento_google)
+DURACION = timedelta(minutes=30)
+AVISO_MINUTOS = 15
+ZONA_AR = ZoneInfo('America/Argentina/Buenos_Aires')
+LOTE_CALENDAR = int(os.getenv('CALENDAR_LOTE') or 50) # Google recomienda no pasar de 50 por batch
+PAUSA_CALENDAR_SEG = float(os.getenv('CALENDAR_PAUSA_SEG') or 5)
+
+logger = logging.getLogger(__name__)
+
+# registrar_interaccion pregunta en cada alta si el vendedor usa el feed; set_ics_token invalida
+_cache_tokens = cache_local('ics_tokens', ttl=300, cachear_none=True)
+_feeds = {} # dni -> {'version', 'nombre', 'ultimo_id', 'eventos': {id: (inicio, texto)}}
+_feeds_lock = threading.Lock()
+
+
+def _escapar(texto) -> str:
+    """ Escape de TEXT (RFC 5545 3.3.11). """
+    texto = str(texto or '').replace('\r\n', '\n').replace('\r', '\n')
+    return texto.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _plegar(linea: str) -> str:
+    """ Líneas de 75 octetos como máximo; las de continuación empiezan con un espacio (sin cortar caracteres UTF-8). """
+    if len(linea.encode('utf-8')) <= 75: return linea
+    partes = []; actual = ''; tamano = 0; limite = 75
+    for caracter in linea:
+        n = len(caracter.encode('utf-8'))
+        if tamano + n > limite: partes.append(actual); actual = ''; tamano = 0; limite = 74
+        actual += caracter; tamano += n
+    partes.append(actual)
+    return '\r\n '.join(partes)
+
+
+def _utc(fecha: dt) -> str:
+    return fecha.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _descripcion(fila: dict, vendedor_nombre: str) -> str:
+    prefijo = "Próximo contacto agendado" if fila['llamada_concretada'] else "Intentar contactar nuevamente"
+    return f"{prefijo} con {fila['cliente_razon_social']} ({fila['cliente_cuit']}).\nRegistrado por: {vendedor_nombre}\n---\nÚltima respuesta/obs: {fila['respuesta_cliente'] or ''}"
+
+
+def _vevento(fila: dict, vendedor_nombre: str) -> str:
+    """ VEVENT de un seguimiento. Solo depende de la fila (DTSTAMP = alta de la interacción): se puede guardar armado. """
+    razon_social = fila['cliente_razon_social']
+    descripcion = _descripcion(fila, vendedor_nombre)
+    lineas = [
+        'BEGIN:VEVENT',
+        f"UID:seguimiento-{fila['id']}@crm",
+        f"DTSTAMP:{_utc(fila['fecha_interaccion'])}",
+        f"DTSTART:{_utc(fila['fecha_prox_seguimiento'])}",
+        f"DTEND:{_utc(fila['fecha_prox_seguimiento'] + DURACION)}",
+        f"SUMMARY:{_escapar(f'Seguimiento Cliente: {razon_social}')}",
+        f"DESCRIPTION:{_escapar(descripcion)}",
+        'BEGIN:VALARM', f"TRIGGER:-PT{AVISO_MINUTOS}M", 'ACTION:DISPLAY', f"DESCRIPTION:{_escapar(f'Seguimiento {razon_social}')}", 'END:VALARM',
+        'END:VEVENT',
+    ]
+    return '\r\n'.join(_plegar(linea) for linea in lineas) + '\r\n'
+
+
+class CalendarioService:
+
+    @staticmethod
+    def feed_activo(dni: str) -> bool:
+        """ ¿El vendedor está suscripto al feed? (cacheado; ante error de DB se asume que no). """
+        try: return bool(_cache_tokens.obtener(dni, lambda: UserRepository.get_ics_token(dni)))
+        except Exception as e: logger.error("Error consultando el feed ICS de %s: %s", dni, e); return False
+
+    @staticmethod
+    def get_token(dni: str):
+        try: return _cache_tokens.obtener(dni, lambda: UserRepository.get_ics_token(dni))
+        except Exception as e: logger.error("Error consultando el feed ICS de %s: %s", dni, e); return None
+
+    @staticmethod
+    @trazado
+    def regenerar_token(dni: str) -> str:
+        """ Activa el feed con un token nuevo; la URL anterior (si había) deja de funcionar. """
+        token = secrets.token_urlsafe(24)
+        UserRepository.set_ics_token(dni, token)
+        return token
+
+    @staticmethod
+    @trazado
+    def desactivar(dni: str):
+        UserRepository.set_ics_token(dni, None)
+        with _feeds_lock: _feeds.pop(dni, None)
+
+    @staticmethod
+    @trazado
+    def version(token: str):
+        """
+        Versión del feed del dueño del token (None si el token no existe): etag, modificado (Last-Modified)
+        y los datos que necesita generar(). Una consulta por el usuario y otra index-only por los seguimientos.
+        """
+        usuario = UserRepository.get_por_ics_token(token) if token else None
+        if not usuario: return None
+        hoy = dt.now(ZONA_AR).replace(hour=0, minute=0, second=0, microsecond=0)
+        desde = hoy - timedelta(days=DIAS_PASADOS)
+        cantidad, ultimo_id, ultima = CrmRepository.get_version_seguimientos(usuario['dni'], desde)
+        # A medianoche la ventana avanza y salen eventos aunque no haya altas
+        modificado = max(ultima, hoy) if ultima else hoy
+        clave = f"{usuario['dni']}|{usuario['nombre']}|{desde.isoformat()}|{cantidad}|{ultimo_id}"
+        return {'dni': usuario['dni'], 'nombre': usuario['nombre'], 'desde': desde, 'cantidad': cantidad, 'ultimoId': ultimo_id or 0,
+                'etag': hashlib.sha1(clave.encode('utf-8')).hexdigest(), 'modificado': modificado.astimezone(timezone.utc).replace(microsecond=0)}
+
+    @staticmethod
+    @trazado
+    def generar(version: dict) -> str:
+        """ Texto del feed para la versión dada, reusando los VEVENT ya armados en este worker. """
+        dni = version['dni']
+        with _feeds_lock: previo = _feeds.get(dni)
+        if previo and previo['version'] == version['etag']: eventos = previo['eventos']
+        else:
+            eventos = {}; desde_id = 0
+            if previo and previo['nombre'] == version['nombre']: # El nombre va en cada DESCRIPTION
+                # La ventana solo avanza: alcanza con descartar lo que quedó antes de desde y leer los ids nuevos
+                eventos = {i: ev for i, ev in previo['eventos'].items() if ev[0] >= version['desde']}; desde_id = previo['ultimo_id']
+            for fila in CrmRepository.get_seguimientos_calendario(dni, version['desde'], desde_id):
+                eventos[fila['id']] = (fila['fecha_prox_seguimiento'], _vevento(fila, version['nombre']))
+            if len(eventos) != version['cantidad']:
+                logger.debug("Feed ICS de %s: %s eventos para %s seguimientos, se rearma completo", dni, len(eventos), version['cantidad'])
+                eventos = {fila['id']: (fila['fecha_prox_seguimiento'], _vevento(fila, version['nombre']))
+                           for fila in CrmRepository.get_seguimientos_calendario(dni, version['desde'])}
+            with _feeds_lock: _feeds[dni] = {'version': version['etag'], 'nombre': version['nombre'], 'ultimo_id': max(eventos, default=0), 'eventos': eventos}
+        encabezado = [
+            'BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//CRM//Seguimientos//ES', 'CALSCALE:GREGORIAN', 'METHOD:PUBLISH',
+            'X-WR-CALNAME:' + _escapar('Seguimientos CRM - ' + version['nombre']), 'X-WR-TIMEZONE:America/Argentina/Buenos_Aires',
+            'REFRESH-INTERVAL;VALUE=DURATION:PT1H', 'X-PUBLISHED-TTL:PT1H',
+        ]
+        cuerpo = ''.join(ev[1] for _, ev in sorted(eventos.items(), key=lambda item: (item[1][0], item[0]))) # Mismo orden en todos los workers
+        return '\r\n'.join(_plegar(linea) for linea in encabezado) + '\r\n' + cuerpo + 'END:VCALENDAR\r\n'
+
+    @staticmethod
+    def evento_google(fila: dict, vendedor_nombre: str) -> dict:
+        """
+        Cuerpo del evento de Google Calendar de un seguimiento (mismos datos que el VEVENT del feed).
+        El id se deriva del de la interacción (base32hex, 5 caracteres o más): crear dos veces el mismo
+        evento da 409 en lugar de un duplicado.
+        """
+        inicio = fila['fecha_prox_seguimiento']
+        return {
+            'id': f"crm{fila['id']:08d}",
+            'summary': f"Seguimiento Cliente: {fila['cliente_razon_social']}", 'description': _descripcion(fila, vendedor_nombre),
+            'start': {'dateTime': inicio.isoformat(), 'timeZone': 'America/Argentina/Buenos_Aires'},
+            'end': {'dateTime': (inicio + DURACION).isoformat(), 'timeZone': 'America/Argentina/Buenos_Aires'},
+            'reminders': {'useDefault': False, 'overrides': [{'method': 'popup', 'minutes': AVISO_MINUTOS}]},
+        }
+
+    @staticmethod
+    @trazado
+    def reconciliar(vendedor_dni: str = None, lote: int = LOTE_CALENDAR, pausa: float = PAUSA_CALENDAR_SEG, max_reintentos: int = 5, limite: int = 5000) -> dict:
+        """
+        Crea en Google Calendar los eventos de los seguimientos futuros que no tienen google_event_id
+        (CrmRepository.get_seguimientos_sin_evento) y guarda los ids después de cada pedido. Por vendedor:
+        lotes de `lote` eventos en un pedido batch, `pausa` segundos entre pedidos; lo que vuelve por límites
+        de uso (403/429), credenciales (401) o 5xx se reintenta con la pausa duplicada (hasta 60 s) y, tras
+        max_reintentos seguidos, queda pendiente para la próxima corrida. Los rechazos definitivos
+        (400/404/410) se guardan en google_event_error y no se vuelven a enviar. Devuelve un resumen con contadores.
+        """
+        pendientes = CrmRepository.get_seguimientos_sin_evento(vendedor_dni, limite)
+        resumen = {'pendientes': len(pendientes), 'vendedores': 0, 'pedidos': 0, 'creados': 0, 'existentes': 0, 'rechazados': 0, 'fallidos': 0}
+        for dni, filas in itertools.groupby(pendientes, key=lambda f: f['fk_vendedor_dni']):
+            por_id = {f['id']: f for f in filas}; resumen['vendedores'] += 1
+            service = google_auth.build_calendar_service(google_auth.load_google_credentials(dni))
+            if not service:
+                logger.warning("Reconciliación: sin servicio de Calendar para %s, quedan %s seguimientos pendientes", dni, len(por_id))
+                resumen['fallidos'] += len(por_id); continue
+            cola = list(por_id); espera = pausa; pedidos = 0; reintentos = 0
+            while cola:
+                actual, cola = cola[:lote], cola[lote:]
+                if pedidos: time.sleep(espera)
+                cuerpos = {i: CalendarioService.evento_google(por_id[i], por_id[i]['vendedor_nombre']) for i in actual}
+                try: resultados = google_auth.insertar_eventos_lote(service, cuerpos)
+                except Exception as e:
+                    logger.warning("Reconciliación: falló el pedido batch de %s (%s eventos): %s", dni, len(actual), e); resultados = {}
+                pedidos += 1; resumen['pedidos'] += 1
+                guardar = []; rechazos = []; reintentar = []
+                for i in actual:
+                    estado, valor = resultados.get(i, ('cuota', None)) # Sin respuesta (pedido caído): se reintenta
+                    if estado in ('ok', 'duplicado'):
+                        guardar.append((i, por_id[i]['fecha_interaccion'], valor)); resumen['creados' if estado == 'ok' else 'existentes'] += 1
+                    elif estado == 'cuota': reintentar.append(i)
+                    else:
+                        logger.error("Reconciliación: Calendar rechazó el evento de la interacción %s: %s", i, valor)
+                        rechazos.append((i, por_id[i]['fecha_interaccion'], str(valor))); resumen['rechazados'] += 1
+                CrmRepository.set_google_event_ids(guardar); CrmRepository.set_google_event_errores(rechazos)
+                if not reintentar: reintentos = 0; espera = max(pausa, espera / 2); continue
+                reintentos += 1
+                if reintentos > max_reintentos:
+                    logger.warning("Reconciliación: %s sigue limitado por cuota; %s seguimientos quedan para la próxima corrida", dni, len(reintentar) + len(cola))
+                    resumen['fallidos'] += len(reintentar) + len(cola); break
+                espera = min(espera * 2, 60); cola = reintentar + cola
+                logger.info("Reconciliación: %s eventos de %s limitados por cuota, reintento en %.0fs", len(reintentar), dni, espera)
+            logger.info("Reconciliación de %s: %s pedidos para %s seguimientos", dni, pedidos, len(por_id))
+        return resumen
@@ -1,54 +1,114 @@
 # core/db.py
+import contextvars
+import json
+import logging
 import os
+import select
+import threading
+import time
 import psycopg2
 from psycopg2.extras import DictCursor # <-- Importante para que devuelva diccionarios
 from psycopg2.pool import ThreadedConnectionPool # <-- El pool de V2
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
 load_dotenv()
 
 # Variable global para el pool
 db_pool = None
+_db_pool_lock = threading.Lock()
+
+# Réplica de solo lectura (opcional). Con DB_REPLICA_HOST definido, las lecturas marcadas como
+# solo_lectura van a la réplica; el resto de DB_REPLICA_* toma por defecto los valores de DB_*.
+# Para probar en local alcanza con dos instancias de Postgres (la segunda como standby de la primera):
+#   DB_HOST=localhost DB_PORT=5432  DB_REPLICA_HOST=localhost DB_REPLICA_PORT=5433
+replica_pool = None
+_replica_pool_lock = threading.Lock()
+REPLICA_CONFIGURADA = bool(os.getenv('DB_REPLICA_HOST'))
+# Read-your-writes: tras una escritura, las lecturas del mismo usuario van a la primaria durante esta ventana
+REPLICA_STICKY_SEG = float(os.getenv('DB_REPLICA_STICKY_SEG') or 5)
+# CacheLocal recalcula desde la primaria lo invalidado hace poco (ver CacheLocal.obtener)
+_forzar_primaria = contextvars.ContextVar('forzar_primaria', default=False)
+
+def _conn_info(prefijo: str, respaldo: str = 'DB') -> str:
+    """ DSN 'key=value' a partir de <prefijo>_DATABASE, _USER, ... (con <respaldo>_* para los que falten). """
+    valor = lambda campo: os.getenv(f"{prefijo}_{campo}") or os.getenv(f"{respaldo}_{campo}")
+    return f"dbname='{valor('DATABASE')}' \
+             user='{valor('USER')}' \
+             password='{valor('PASSWORD')}' \
+             host='{valor('HOST')}' \
+             port='{valor('PORT')}'"
+
+def _crear_pool(conn_info: str, nombre: str):
+    try:
+        # Usamos ThreadedConnectionPool
+        pool = ThreadedConnectionPool(
+            minconn=2,
+            maxconn=10,
+            dsn=conn_info
+        )
+
+        # Prueba de conexión
+        conn = pool.getconn()
+        # ¡Importante! Usamos DictCursor aquí para que devuelva dicts
+        cur = conn.cursor(cursor_factory=DictCursor)
+        cur.execute("SELECT NOW()")
+        logger.info("Pool de conexiones (psycopg2) %s inicializado con éxito.", nombre)
+        cur.close()
+        pool.putconn(conn)
+        return pool
+
+    except Exception as e:
+        logger.error("Error fatal al inicializar el pool %s de (psycopg2): %s", nombre, e)
+        return None
 
 def init_db_pool():
     """Inicializa el pool de conexiones (usando psycopg2)."""
     global db_pool
     if db_pool is None:
-        # El formato de conn_info es un string de 'key=value'
-        conn_info = f"dbname='{os.getenv('DB_DATABASE')}' \
-                     user='{os.getenv('DB_USER')}' \
-                     password='{os.getenv('DB_PASSWORD')}' \
-                     host='{os.getenv('DB_HOST')}' \
-                     port='{os.getenv('DB_PORT')}'"
-        try:
-            # Usamos ThreadedConnectionPool
-            db_pool = ThreadedConnectionPool(
-                minconn=2,
-                maxconn=10,
-                dsn=conn_info
-            )
-            
-            # Prueba de conexión
-            conn = db_pool.getconn()
-            # ¡Importante! Usamos DictCursor aquí para que devuelva dicts
-            cur = conn.cursor(cursor_factory=DictCursor) 
-            cur.execute("SELECT NOW()")
-            print("Pool de conexiones (psycopg2) inicializado con éxito.")
-            cur.close()
-            db_pool.putconn(conn)
-            
-        except Exception as e:
-            print(f"Error fatal al inicializar el pool de (psycopg2): {e}")
-            db_pool = None
-            
+        db_pool = _crear_pool(_conn_info('DB'), 'primario')
     return db_pool
 
-def get_db_connection():
-    """Obtiene una conexión del pool (psycopg2)."""
-    global db_pool
+def get_db_pool():
+    """
+    Devuelve el pool, creándolo en el primer uso. Así el pool no se abre al importar app.py
+    sino en cada worker cuando atiende su primer request (o None si la base no está disponible).
+    """
     if db_pool is None:
-        init_db_pool()
-    
+        with _db_pool_lock: # Varios threads del worker pueden llegar juntos al primer request
+            if db_pool is None: init_db_pool()
+    return db_pool
+
+def get_replica_pool():
+    """ Pool de la réplica (lazy como el primario); None si no hay réplica configurada o no está disponible. """
+    global replica_pool
+    if REPLICA_CONFIGURADA and replica_pool is None:
+        with _replica_pool_lock:
+            if replica_pool is None: replica_pool = _crear_pool(_conn_info('DB_REPLICA'), 'réplica')
+    return replica_pool
+
+def marcar_escritura():
+    """ Llamar después de un commit del usuario actual: sus lecturas siguientes van a la primaria por un rato. """
+    if not REPLICA_CONFIGURADA: return
+    from flask import has_request_context, session
+    # En la sesión (cookie) y no en memoria: el próximo request del usuario puede caer en otro worker
+    if has_request_context(): session['_db_primaria_hasta'] = time.time() + REPLICA_STICKY_SEG
+
+def _lectura_en_primaria() -> bool:
+    if _forzar_primaria.get(): return True
+    from flask import has_request_context, session
+    return has_request_context() and session.get('_db_primaria_hasta', 0) > time.time()
+
+def get_db_connection(solo_lectura: bool = False):
+    """
+    Obtiene una conexión del pool (psycopg2). Con solo_lectura=True usa la réplica si está
+    configurada, salvo que el usuario haya escrito hace menos de REPLICA_STICKY_SEG segundos.
+    """
+    if solo_lectura and REPLICA_CONFIGURADA and not _lectura_en_primaria():
+        pool = get_replica_pool()
+        if pool: return pool.getconn() # Si la réplica no está disponible se sigue con la primaria
+    get_db_pool()
     if db_pool:
         # Esto obtiene una conexión del pool
         conn = db_pool.getconn()
@@ -57,7 +117,143 @@ def get_db_connection():
         raise Exception("El pool de la base de datos no está disponible.")
 
 def release_db_connection(conn):
-    """Devuelve una conexión al pool (psycopg2)."""
-    if db_pool:
+    """Devuelve una conexión al pool (psycopg2) del que salió."""
+    if replica_pool and id(conn) in replica_pool._rused:
+        replica_pool.putconn(conn)
+    elif db_pool:
         # Esto devuelve la conexión al pool
-        db_pool.putconn(conn)
\ No newline at end of file
+        db_pool.putconn(conn)
+
+def pool_status():
+    """Ocupación de los pools de este worker (para pruebas de carga): conexiones en uso, libres y máximo."""
+    def _estado(pool):
+        if not pool: return {'en_uso': 0, 'libres': 0, 'max': 0}
+        return {'en_uso': len(pool._used), 'libres': len(pool._pool), 'max': pool.maxconn}
+    estado = _estado(db_pool)
+    if REPLICA_CONFIGURADA: estado['replica'] = _estado(replica_pool)
+    return estado
+
+
+# =============================================================================
+# BUS DE INVALIDACIÓN (LISTEN/NOTIFY) Y CACHES EN MEMORIA POR WORKER
+# =============================================================================
+# Cada worker de gunicorn tiene sus propias CacheLocal. Quien escribe llama a publicar_invalidacion:
+# la entrada se borra en el acto en su worker y, vía NOTIFY, en todos los demás. Un hilo por
+# worker, con una conexión propia fuera del pool, escucha CANAL_INVALIDACION y los canales que
+# otros módulos registren con escuchar() (p.ej. core.tiempo_real). Si esa conexión se cae se
+# vacían todas las caches al reconectar: los avisos de mientras tanto se perdieron.
+# El TTL de cada cache es la red de seguridad para escrituras que no publican (SQL a mano).
+CANAL_INVALIDACION = 'crm_invalidacion'
+
+_caches = {}
+_canales = {} # canal -> [funcion(payload)]
+_escucha = None
+_escucha_lock = threading.Lock()
+_AUSENTE = object()
+
+class CacheLocal:
+    """ Cache en memoria con TTL, segura entre threads. Uso: cache.obtener(clave, lambda: consulta()). """
+    def __init__(self, nombre: str, ttl: float, max_entradas: int = 1000, cachear_none: bool = False):
+        self.nombre = nombre; self.ttl = ttl; self.max_entradas = max_entradas; self.cachear_none = cachear_none
+        self._datos = {}; self._lock = threading.Lock(); self._generacion = 0; self._invalidada = float('-inf')
+
+    def obtener(self, clave, calcular):
+        clave = str(clave); ahora = time.monotonic()
+        with self._lock: valor, vence = self._datos.get(clave, (_AUSENTE, 0)); generacion = self._generacion; invalidada = self._invalidada
+        if valor is not _AUSENTE and vence > ahora: return valor
+        iniciar_escucha() # Sin el hilo de escucha, una cache podría no enterarse de escrituras de otros workers
+        # La invalidación llega con el commit en la primaria: hasta REPLICA_STICKY_SEG después, la réplica puede
+        # no tener la escritura todavía y el valor viejo quedaría guardado por todo el TTL
+        token = _forzar_primaria.set(True) if REPLICA_CONFIGURADA and ahora - invalidada < REPLICA_STICKY_SEG else None
+        try: valor = calcular()
+        finally:
+            if token: _forzar_primaria.reset(token)
+        if valor is None and not self.cachear_none: return valor
+        with self._lock:
+            # Si hubo una invalidación mientras se calculaba, el valor puede ser anterior a la escritura: no se guarda
+            if generacion != self._generacion: return valor
+            if len(self._datos) >= self.max_entradas: self._datos.clear() # Tope simple: se vuelve a llenar con lo que se usa
+            self._datos[clave] = (valor, ahora + self.ttl)
+        return valor
+
+    def invalidar(self, clave=None):
+        with self._lock:
+            self._generacion += 1; self._invalidada = time.monotonic()
+            if clave is None: self._datos.clear()
+            else: self._datos.pop(str(clave), None)
+
+def cache_local(nombre: str, ttl: float, **kwargs) -> CacheLocal:
+    """ Crea (una vez por nombre) una cache que se invalida con publicar_invalidacion(nombre, ...). """
+    if nombre not in _caches: _caches[nombre] = CacheLocal(nombre, ttl, **kwargs)
+    return _caches[nombre]
+
+def _invalidar_local(nombre: str, clave=None):
+    cache = _caches.get(nombre)
+    if cache: cache.invalidar(clave)
+
+def publicar_invalidacion(nombre: str, clave=None, conn=None):
+    """
+    Invalida la cache `nombre` (una clave o toda) en todos los workers. Con conn, el NOTIFY va
+    en esa transacción y se entrega recién con su commit (llamar antes del commit); sin conn,
+    se publica en una transacción propia (llamar después del commit de la escritura).
+    """
+    _invalidar_local(nombre, clave)
+    payload = json.dumps({'cache': nombre, 'clave': None if clave is None else str(clave)})
+    propia = conn is None
+    try:
+        if propia: conn = get_db_connection()
+        with conn.cursor() as cur: cur.execute("SELECT pg_notify(%s, %s)", (CANAL_INVALIDACION, payload))
+        if propia: conn.commit()
+    except Exception as e:
+        # No rompe la escritura: los demás workers se enteran por el TTL
+        logger.error("No se pudo publicar la invalidación de %s: %s", nombre, e)
+        if propia and conn: conn.rollback()
+        if not propia: raise
+    finally:
+        if propia and conn: release_db_connection(conn)
+
+def _aplicar_invalidacion(payload: str):
+    try: aviso = json.loads(payload)
+    except ValueError: logger.warning("Invalidación con payload inválido: %.200s", payload); return
+    # También llega al worker que publicó: vuelve a borrar lo que otro thread haya cargado antes del commit
+    _invalidar_local(aviso.get('cache'), aviso.get('clave'))
+
+def escuchar(canal: str, funcion):
+    """ Registra funcion(payload) para los NOTIFY de canal en este worker. Registrar al importar el módulo. """
+    _canales.setdefault(canal, []).append(funcion)
+
+def _escuchar_loop():
+    espera = 1
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(_conn_info('DB')); conn.autocommit = True
+            escuchados = set()
+            for cache in list(_caches.values()): cache.invalidar() # Lo que haya pasado sin conexión se perdió
+            logger.info("Bus de invalidación conectado (pid %s)", os.getpid()); espera = 1
+            while True:
+                for canal in set(_canales) - escuchados:
+                    with conn.cursor() as cur: cur.execute(f'LISTEN "{canal}"')
+                    escuchados.add(canal)
+                if select.select([conn], [], [], 5) == ([], [], []): continue
+                conn.poll()
+                while conn.notifies:
+                    aviso = conn.notifies.pop(0)
+                    for funcion in _canales.get(aviso.channel, []):
+                        try: funcion(aviso.payload)
+                        except Exception as e: logger.exception("Error procesando aviso de %s: %s", aviso.channel, e)
+        except Exception as e:
+            logger.warning("Conexión LISTEN caída: %s. Reintento en %ss", e, espera)
+            time.sleep(espera); espera = min(espera * 2, 60)
+        finally:
+            if conn: conn.close()
+
+def iniciar_escucha():
+    """ Arranca (una vez por worker, en el primer uso) el hilo que escucha los canales registrados. """
+    global _escucha
+    if _escucha is not None and _escucha.is_alive(): return
+    with _escucha_lock:
+        if _escucha is None or not _escucha.is_alive():
+            _escucha = threading.Thread(target=_escuchar_loop, name='db-listen', daemon=True); _escucha.start()
+
+escuchar(CANAL_INVALIDACION, _aplicar_invalidacion)
@@ -0,0 +1,61 @@
+# core/erp.py
+# Cliente del ERP. Módulo aparte de core/services.py para que sync_cliente_manual.py
+# lo importe sin arrastrar pandas, Dash ni las librerías de Google.
+import os
+import json
+import logging
+from core.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Tope de páginas por sincronización: un ERP que ignora offset no deja el loop girando para siempre
+MAX_PAGINAS = int(os.getenv('ERP_MAX_PAGES') or 1000)
+
+
+# --- ERP Service ---
+class ErpService:
+    @staticmethod
+    def fetch_clientes_from_erp(filtros=None):
+        """ Obtiene clientes del ERP, devuelve lista vacía en error. """
+        import requests # Import diferido: solo lo paga quien sincroniza
+        from requests.auth import HTTPBasicAuth
+        url = os.getenv('ERP_API_URL'); user = os.getenv('ERP_API_USER'); pwd = os.getenv('ERP_API_PASSWORD')
+        if not url or not user or not pwd: logger.error("Faltan variables de entorno ERP."); return []
+        # ERP_PAGE_SIZE > 0 pide el catálogo por páginas (limit/offset); sin definir, una sola llamada como siempre
+        page_size = int(os.getenv('ERP_PAGE_SIZE') or 0)
+        try:
+            clientes_mapeados = []; offset = 0; primero_anterior = None
+            with requests.Session() as http: # Keep-alive entre páginas
+                while True:
+                    params = {"filtros": filtros or {}}
+                    if page_size: params.update({"limit": page_size, "offset": offset})
+                    with span('erp.post', offset=offset) as sp:
+                        response = http.post( url, json={"params": params}, auth=HTTPBasicAuth(user, pwd), timeout=45 )
+                        sp.set('http.status', response.status_code); sp.set('http.bytes_respuesta', len(response.content))
+                    if response.status_code == 401: logger.error("ERP 401: Autenticación fallida."); return []
+                    response.raise_for_status()
+                    try: data = response.json()
+                    except json.JSONDecodeError: logger.error("Respuesta ERP no JSON. Resp:\n%s...", response.text[:500]); return []
+                    clientes = None;
+                    if isinstance(data, dict): clientes = data['result'] if isinstance(data.get('result'), list) else data.get('clientes')
+                    elif isinstance(data, list): clientes = data
+                    if not isinstance(clientes, list):
+                        logger.warning("Respuesta JSON ERP sin lista. Resp: %s", data); return clientes_mapeados
+                    if page_size and len(clientes) > page_size:
+                        # El ERP ignoró limit/offset: esta respuesta ya es el catálogo completo
+                        logger.warning("ERP devolvió %s clientes con limit=%s: se toma como catálogo completo.", len(clientes), page_size)
+                        clientes_mapeados = []; page_size = 0
+                    primero = clientes[0].get('id') if clientes and isinstance(clientes[0], dict) else None
+                    if offset and primero is not None and primero == primero_anterior:
+                        logger.error("ERP repitió la página anterior en offset %s (ignora offset?): se corta la paginación.", offset); return clientes_mapeados
+                    primero_anterior = primero
+                    for c in clientes:
+                        if isinstance(c, dict): clientes_mapeados.append({ **c, 'documento': c.get('numero_documento') or c.get('documento'), 'celular': c.get('mobile'), 'telefono': c.get('phone') })
+                    if not page_size or len(clientes) < page_size: return clientes_mapeados
+                    offset += page_size
+                    if offset >= page_size * MAX_PAGINAS:
+                        logger.error("ERP: se alcanzó el tope de %s páginas (ERP_MAX_PAGES); catálogo posiblemente incompleto.", MAX_PAGINAS); return clientes_mapeados
+        except requests.exceptions.Timeout: logger.error("Timeout ERP en %s.", url); return []
+        except requests.exceptions.ConnectionError: logger.error("No se pudo conectar a ERP en %s.", url); return []
+        except requests.exceptions.RequestException as e: logger.error("Error HTTP/Red ERP: %s", e); return []
+        except Exception as e: logger.error("Error inesperado ERP: %s", e); return []
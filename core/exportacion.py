@@ -0,0 +1,80 @@
+# core/exportacion.py
+# Exportación de interacciones filtradas como stream (CSV o Parquet).
+# Lee con CrmRepository.iter_dashboard_data (cursor server-side por bloques), así que la
+# memoria usada no depende del rango exportado y la conexión del pool se ocupa solo
+# mientras dura la descarga.
+import csv
+import io
+import importlib.util
+from datetime import datetime as dt
+from core.repository import CrmRepository
+
+TAMANO_BLOQUE = 5000
+FORMATOS = {'csv': 'text/csv; charset=utf-8', 'parquet': 'application/vnd.apache.parquet'}
+
+
+class _SinkStream:
+    """ Archivo de solo escritura que acumula lo escrito hasta que se lo vacía con drain(). """
+    def __init__(self):
+        self._partes = []; self._pos = 0; self.closed = False
+    def write(self, data):
+        self._partes.append(bytes(data)); self._pos += len(data); return len(data)
+    def tell(self): return self._pos
+    def flush(self): pass
+    def close(self): self.closed = True
+    def drain(self):
+        data = b''.join(self._partes); self._partes = []; return data
+
+
+def _tipo_arrow(type_code):
+    """ OID de PostgreSQL (cursor.description) -> tipo de pyarrow. """
+    import pyarrow as pa
+    return {
+        16: pa.bool_(), 20: pa.int64(), 21: pa.int64(), 23: pa.int64(), 700: pa.float64(), 701: pa.float64(),
+        1700: pa.float64(), 1082: pa.date32(), 1114: pa.timestamp('us'), 1184: pa.timestamp('us', tz='UTC'),
+    }.get(type_code, pa.string())
+
+
+class ExportacionService:
+
+    @staticmethod
+    def parquet_disponible() -> bool:
+        return importlib.util.find_spec('pyarrow') is not None
+
+    @staticmethod
+    def nombre_archivo(filters: dict, formato: str) -> str:
+        partes = ['interacciones']
+        if filters.get('fechaDesde'): partes.append(f"desde_{filters['fechaDesde']}")
+        if filters.get('fechaHasta'): partes.append(f"hasta_{filters['fechaHasta']}")
+        if not filters.get('fechaDesde') and not filters.get('fechaHasta'): partes.append(dt.now().strftime('%Y%m%d'))
+        return f"{'_'.join(partes)}.{formato}"
+
+    @staticmethod
+    def stream_csv(filters: dict, tamano_bloque: int = TAMANO_BLOQUE):
+        """ Genera el CSV en bloques de bytes (UTF-8 con BOM para que Excel respete los acentos). """
+        buffer = io.StringIO(); writer = csv.writer(buffer)
+        buffer.write('\ufeff')
+        for i, (descripcion, filas) in enumerate(CrmRepository.iter_dashboard_data(filters, tamano_bloque)):
+            if i == 0: writer.writerow([col.name for col in descripcion])
+            writer.writerows(filas)
+            chunk = buffer.getvalue(); buffer.seek(0); buffer.truncate(0)
+            yield chunk.encode('utf-8')
+
+    @staticmethod
+    def stream_parquet(filters: dict, tamano_bloque: int = TAMANO_BLOQUE):
+        """ Genera un Parquet con un row group por bloque leído de la base. Requiere pyarrow. """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        sink = _SinkStream(); writer = None
+        try:
+            for descripcion, filas in CrmRepository.iter_dashboard_data(filters, tamano_bloque):
+                if writer is None:
+                    schema = pa.schema([(col.name, _tipo_arrow(col.type_code)) for col in descripcion])
+                    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+                columnas = list(zip(*filas)) if filas else [[] for _ in schema]
+                arrays = [pa.array(valores, type=campo.type) for valores, campo in zip(columnas, schema)]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                yield sink.drain()
+        finally:
+            if writer is not None: writer.close()
+        yield sink.drain() # Footer del archivo
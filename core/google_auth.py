@@ -1,12 +1,17 @@
 # core/google_auth.py
 import os
 import json
+import logging
 from flask import current_app, url_for, request, session, redirect
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 from flask_login import current_user
+from core.db import get_db_pool, cache_local, publicar_invalidacion
+from core.tracing import trazado, span
+
+logger = logging.getLogger(__name__)
+# La navbar consulta las credenciales en cada cambio de página; save_google_credentials invalida
+_cache_credenciales = cache_local('google_creds', ttl=300, cachear_none=True)
+# google-auth, google_auth_oauthlib y googleapiclient se importan dentro de cada función:
+# son las dependencias más pesadas del arranque y solo se usan al conectar o crear eventos.
 
 # --- Configuración ---
 # El archivo descargado de Google Cloud Console
@@ -16,11 +21,16 @@ SCOPES = ['https://www.googleapis.com/auth/calendar.events']
 # La ruta DENTRO de tu aplicación donde Google redirigirá después de la autorización
 # Debe coincidir EXACTAMENTE con una de las URIs de redirección en Google Cloud Console
 REDIRECT_URI = 'http://localhost:3000/oauth2callback' # ¡Ajusta si es necesario!
+# Para pruebas de rendimiento: apuntar Calendar y el refresh de tokens a un simulador local
+# (python -m bench.simuladores). Sin definir se usan los endpoints reales de Google.
+CALENDAR_API_ENDPOINT = os.getenv('GOOGLE_CALENDAR_API_ENDPOINT') # p.ej. http://localhost:8091/
+TOKEN_URI_OVERRIDE = os.getenv('GOOGLE_TOKEN_URI')
 
 # --- Funciones de Autenticación ---
 
 def get_google_auth_flow():
     """Crea y configura el objeto Flow de OAuth."""
+    from google_auth_oauthlib.flow import Flow
     try:
         flow = Flow.from_client_secrets_file(
             CLIENT_SECRETS_FILE,
@@ -29,23 +39,27 @@ def get_google_auth_flow():
         )
         return flow
     except FileNotFoundError:
-        print(f"ERROR CRÍTICO: No se encontró el archivo '{CLIENT_SECRETS_FILE}'. Descárgalo de Google Cloud Console.")
+        logger.critical("No se encontró el archivo '%s'. Descárgalo de Google Cloud Console.", CLIENT_SECRETS_FILE)
         return None
     except Exception as e:
-        print(f"Error al crear el flow de Google Auth: {e}")
+        logger.error("Error al crear el flow de Google Auth: %s", e)
         return None
 
+@trazado
 def build_calendar_service(credentials_json_string):
     """Construye el servicio de Calendar API a partir de credenciales guardadas."""
     if not credentials_json_string:
         return None
+    from google.oauth2.credentials import Credentials
+    from googleapiclient.discovery import build
     try:
         creds_data = json.loads(credentials_json_string)
         # Asegurarse de que los campos necesarios estén presentes
         if not all(k in creds_data for k in ["token", "refresh_token", "client_id", "client_secret", "scopes"]):
-             print("WARN: Faltan campos en las credenciales guardadas.")
+             logger.warning("Faltan campos en las credenciales guardadas.")
              return None
 
+        if TOKEN_URI_OVERRIDE: creds_data['token_uri'] = TOKEN_URI_OVERRIDE
         credentials = Credentials(**creds_data)
 
         # Refrescar si es necesario (la librería maneja esto si el refresh_token está presente)
@@ -53,21 +67,25 @@ def build_calendar_service(credentials_json_string):
         # if credentials.expired and credentials.refresh_token:
         #     credentials.refresh(Request()) # Request necesitaría importarse de google.auth.transport.requests
 
-        service = build('calendar', 'v3', credentials=credentials)
+        if CALENDAR_API_ENDPOINT:
+            service = build('calendar', 'v3', credentials=credentials, client_options={'api_endpoint': CALENDAR_API_ENDPOINT})
+        else:
+            service = build('calendar', 'v3', credentials=credentials)
         return service
     except json.JSONDecodeError:
-        print("Error: No se pudo decodificar el JSON de credenciales de Google.")
+        logger.error("No se pudo decodificar el JSON de credenciales de Google.")
         return None
     except Exception as e:
-        print(f"Error construyendo el servicio de Calendar: {e}")
+        logger.error("Error construyendo el servicio de Calendar: %s", e)
         return None
 
+@trazado
 def save_google_credentials(dni, credentials):
     """Guarda las credenciales (como JSON) en la base de datos para el usuario."""
-    pool = current_app.config.get("DB_POOL")
+    pool = get_db_pool()
     conn = None
     if not pool:
-        print("Error: No se pudo obtener el pool de DB para guardar credenciales.")
+        logger.error("No se pudo obtener el pool de DB para guardar credenciales.")
         return False
     try:
         # Convertir credenciales a formato serializable (diccionario -> JSON string)
@@ -84,50 +102,90 @@ def save_google_credentials(dni, credentials):
         conn = pool.getconn()
         with conn.cursor() as cur:
             cur.execute("UPDATE users SET google_creds_json = %s WHERE dni = %s", (creds_json, dni))
+            publicar_invalidacion('google_creds', dni, conn=conn)
             conn.commit()
-            print(f"Credenciales de Google guardadas para usuario DNI {dni}")
+            logger.info("Credenciales de Google guardadas para usuario DNI %s", dni)
             return True
     except Exception as e:
         if conn: conn.rollback()
-        print(f"Error al guardar credenciales de Google para DNI {dni}: {e}")
+        logger.error("Error al guardar credenciales de Google para DNI %s: %s", dni, e)
         return False
     finally:
         if conn: pool.putconn(conn)
 
+@trazado
 def load_google_credentials(dni):
     """Carga las credenciales (como string JSON) desde la base de datos."""
-    pool = current_app.config.get("DB_POOL")
-    conn = None
-    if not pool:
-        print("Error: No se pudo obtener el pool de DB para cargar credenciales.")
+    try:
+        return _cache_credenciales.obtener(dni, lambda: _leer_credenciales(dni)) # None (sin conectar) también se cachea
+    except Exception as e:
+        logger.error("Error al cargar credenciales de Google para DNI %s: %s", dni, e)
         return None
+
+def _leer_credenciales(dni):
+    """ Lanza ante errores de DB: así un fallo no queda cacheado como 'sin credenciales'. """
+    pool = get_db_pool()
+    if not pool: raise RuntimeError("No se pudo obtener el pool de DB para cargar credenciales.")
+    conn = pool.getconn()
     try:
-        conn = pool.getconn()
         with conn.cursor() as cur:
             cur.execute("SELECT google_creds_json FROM users WHERE dni = %s", (dni,))
             result = cur.fetchone()
-            if result and result[0]:
-                return result[0] # Devuelve el string JSON
-            else:
-                return None
-    except Exception as e:
-        print(f"Error al cargar credenciales de Google para DNI {dni}: {e}")
-        return None
+            return result[0] if result and result[0] else None # Devuelve el string JSON
     finally:
-        if conn: pool.putconn(conn)
+        conn.rollback(); pool.putconn(conn)
 
 # --- Funciones para interactuar con Calendar ---
 
 def create_calendar_event(service, event_data):
     """Crea un evento usando el servicio de Calendar API."""
+    from googleapiclient.errors import HttpError
     try:
-        event = service.events().insert(calendarId='primary', body=event_data).execute()
-        print(f"Evento de Google Calendar creado: {event.get('htmlLink')}")
+        with span('calendar.events.insert') as sp:
+            event = service.events().insert(calendarId='primary', body=event_data).execute()
+            sp.set('calendar.event_id', event.get('id'))
+        logger.info("Evento de Google Calendar creado: %s", event.get('htmlLink'))
         return event
     except HttpError as error:
-        print(f'Error al crear evento en Google Calendar: {error}')
+        logger.error('Error al crear evento en Google Calendar: %s', error)
         # Podrías querer levantar una excepción aquí para manejarla en el servicio
         raise error
     except Exception as e:
-        print(f"Error inesperado al crear evento: {e}")
-        raise e
\ No newline at end of file
+        logger.error("Error inesperado al crear evento: %s", e)
+        raise e
+
+# Rechazos del evento en sí (cuerpo inválido, calendario inexistente o borrado): reintentarlo no cambia nada.
+# El resto (401, 403 usageLimits: rateLimitExceeded, userRateLimitExceeded, quotaExceeded, dailyLimitExceeded;
+# 429, 5xx) depende del momento o de las credenciales y se reintenta.
+RECHAZOS_DEFINITIVOS = (400, 404, 410)
+
+def _estado_http(error):
+    return getattr(getattr(error, 'resp', None), 'status', None)
+
+@trazado
+def insertar_eventos_lote(service, eventos: dict) -> dict:
+    """
+    Crea varios eventos en un solo pedido HTTP (batch de la API de Calendar). eventos = {clave: cuerpo}.
+    Devuelve {clave: (estado, valor)} con estado 'ok' (valor = id del evento), 'duplicado' (409: ya
+    existía un evento con el id del cuerpo), 'error' (rechazo definitivo: RECHAZOS_DEFINITIVOS) o 'cuota'
+    (cualquier otro error: límites de uso, credenciales, 5xx; reintentar más tarde).
+    Si falla el pedido entero (red, 5xx, token) lanza la excepción.
+    """
+    from googleapiclient.errors import HttpError
+    resultados = {}; claves = {str(clave): clave for clave in eventos}
+    def _callback(request_id, respuesta, error):
+        clave = claves[request_id]
+        if error is None: resultados[clave] = ('ok', respuesta.get('id'))
+        elif isinstance(error, HttpError) and _estado_http(error) == 409: resultados[clave] = ('duplicado', eventos[clave].get('id'))
+        elif isinstance(error, HttpError) and _estado_http(error) in RECHAZOS_DEFINITIVOS: resultados[clave] = ('error', error)
+        else: resultados[clave] = ('cuota', error)
+    if CALENDAR_API_ENDPOINT: # Simulador: el batch por defecto apunta a www.googleapis.com
+        from googleapiclient.http import BatchHttpRequest
+        lote = BatchHttpRequest(callback=_callback, batch_uri=CALENDAR_API_ENDPOINT.rstrip('/') + '/batch/calendar/v3')
+    else:
+        lote = service.new_batch_http_request(callback=_callback)
+    for clave, cuerpo in eventos.items():
+        lote.add(service.events().insert(calendarId='primary', body=cuerpo), request_id=str(clave))
+    with span('calendar.events.batch_insert', eventos=len(eventos)):
+        lote.execute()
+    return resultados
@@ -0,0 +1,181 @@
+# core/importacion.py
+# Importación masiva de interacciones históricas desde CSV o Excel (.xlsx).
+# El archivo se lee fila a fila, cada fila se valida con las mismas reglas que el
+# formulario (CrmService.validar_interaccion) y las válidas se cargan por lotes con COPY
+# a una tabla de staging. Al final se crean en bloque los clientes faltantes y se
+# vuelca staging a interacciones_comerciales en una sola transacción.
+import csv
+import io
+import json
+import logging
+import os
+import uuid
+from datetime import datetime as dt
+import psycopg2
+from core.db import get_db_connection, release_db_connection, marcar_escritura, publicar_invalidacion
+from core.repository import CrmRepository
+from core.services import CrmService
+
+logger = logging.getLogger(__name__)
+
+# Columnas reconocidas en el archivo (encabezado, sin importar mayúsculas) -> clave de CrmService
+COLUMNAS_ARCHIVO = {
+    'fecha_interaccion': 'fechaInteraccion', 'vendedor_dni': 'vendedorDni', 'cliente_cuit': 'clienteCuit',
+    'cliente_razon_social': 'clienteRazonSocial', 'tipo_interaccion': 'tipoInteraccion',
+    'llamada_concretada': 'llamadaConcretada', 'respuesta_cliente': 'respuestaCliente',
+    'fecha_prox_seguimiento': 'fechaProxSeguimiento', 'venta_cerrada': 'ventaCerrada',
+    'motivo_no_venta': 'motivoNoVenta', 'ofrecio_otros_precios': 'ofrecioOtrosPrecios',
+    'cliente_conoce_catalogo': 'clienteConoceCatalogo', 'le_llego_bien_pedido': 'leLlegoBienPedido',
+    'comentarios_venta': 'comentariosVenta', 'cliente_informo_pago': 'clienteInformoPago',
+    'reviso_cta_cte': 'revisoCtaCte', 'comentarios_cobranza': 'comentariosCobranza',
+}
+COLUMNAS_OBLIGATORIAS = ['fecha_interaccion', 'vendedor_dni', 'cliente_cuit', 'cliente_razon_social']
+COLUMNAS_BOOL = ['llamadaConcretada', 'ventaCerrada', 'ofrecioOtrosPrecios', 'clienteConoceCatalogo', 'leLlegoBienPedido', 'clienteInformoPago', 'revisoCtaCte']
+VALORES_SI = {'si', 'sí', 's', 'true', 'verdadero', '1', 'x', 'yes', 'y'}
+VALORES_NO = {'no', 'n', 'false', 'falso', '0', ''}
+FORMATOS_FECHA = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y']
+# Espacio de nombres para claves de idempotencia derivadas del contenido: reimportar el mismo archivo no duplica
+NAMESPACE_IMPORTACION = uuid.UUID('6f1d3c2e-8a4b-4f0e-9c51-2b7d0e6a9f13')
+TAMANO_LOTE = 20000
+# Tope del archivo subido desde la página: dcc.Upload lo manda en base64 dentro del request del callback
+MAX_BYTES_SUBIDA = int(float(os.getenv('IMPORTACION_MAX_MB') or 20) * 1024 * 1024)
+
+
+def _leer_csv(ruta):
+    with open(ruta, newline='', encoding='utf-8-sig') as f:
+        muestra = f.read(4096); f.seek(0)
+        try: dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t')
+        except csv.Error: dialecto = csv.excel
+        reader = csv.reader(f, dialecto)
+        yield from reader
+
+
+def _leer_xlsx(ruta, hoja=None):
+    from openpyxl import load_workbook # Solo necesario para Excel
+    wb = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        ws = wb[hoja] if hoja else wb.active
+        for fila in ws.iter_rows(values_only=True):
+            yield ['' if v is None else v for v in fila]
+    finally:
+        wb.close()
+
+
+def leer_filas(ruta, hoja=None):
+    """ Itera el archivo como dicts {columna_normalizada: valor}, con el número de fila (1 = encabezado). """
+    filas = _leer_xlsx(ruta, hoja) if ruta.lower().endswith(('.xlsx', '.xlsm')) else _leer_csv(ruta)
+    encabezado = None
+    for numero, fila in enumerate(filas, start=1):
+        if encabezado is None:
+            encabezado = [str(c).strip().lower() for c in fila]
+            faltantes = [c for c in COLUMNAS_OBLIGATORIAS if c not in encabezado]
+            if faltantes: raise ValueError(f"Faltan columnas obligatorias: {', '.join(faltantes)}")
+            continue
+        if not any(str(v).strip() for v in fila): continue
+        yield numero, dict(zip(encabezado, fila))
+
+
+def _parse_bool(valor, columna):
+    if isinstance(valor, bool): return valor
+    texto = str(valor).strip().lower()
+    if texto in VALORES_SI: return True
+    if texto in VALORES_NO: return False
+    raise ValueError(f"Valor no reconocido para {columna}: '{valor}'")
+
+
+def _parse_fecha(valor, columna):
+    if valor in (None, ''): return None
+    if isinstance(valor, dt): return valor
+    texto = str(valor).strip()
+    for formato in FORMATOS_FECHA:
+        try: return dt.strptime(texto, formato)
+        except ValueError: pass
+    raise ValueError(f"Fecha inválida en {columna}: '{valor}'")
+
+
+def _parse_cuit(valor):
+    texto = str(valor).strip().replace('-', '').replace('.', '')
+    if texto.endswith('.0'): texto = texto[:-2] # Excel guarda números como float
+    try: return int(texto)
+    except ValueError: raise ValueError(f"CUIT inválido: '{valor}'")
+
+
+def preparar_fila(fila: dict, vendedores: set) -> list:
+    """ Convierte una fila del archivo en la fila de staging (orden de IMPORTACION_COLUMNAS). Lanza ValueError. """
+    datos = {clave: fila.get(col, '') for col, clave in COLUMNAS_ARCHIVO.items()}
+    for clave in COLUMNAS_BOOL: datos[clave] = _parse_bool(datos[clave], clave)
+    for clave in ('respuestaCliente', 'comentariosVenta', 'comentariosCobranza', 'motivoNoVenta', 'tipoInteraccion', 'clienteRazonSocial'):
+        datos[clave] = str(datos[clave]).strip() or None
+    datos['clienteCuit'] = _parse_cuit(datos['clienteCuit'])
+    datos['fechaProxSeguimiento'] = _parse_fecha(datos['fechaProxSeguimiento'], 'fecha_prox_seguimiento')
+    fecha_interaccion = _parse_fecha(datos['fechaInteraccion'], 'fecha_interaccion')
+    if not fecha_interaccion: raise ValueError("La fecha de la interacción es obligatoria.")
+    vendedor_dni = str(datos['vendedorDni']).strip()
+    if vendedor_dni.endswith('.0'): vendedor_dni = vendedor_dni[:-2]
+    if vendedor_dni not in vendedores: raise ValueError(f"Vendedor inexistente: '{vendedor_dni}'")
+
+    repo = CrmService.validar_interaccion(datos)
+    fila_staging = [
+        fecha_interaccion.isoformat(sep=' '), vendedor_dni, repo['clienteCuit'], repo['clienteRazonSocial'],
+        repo['tipoInteraccion'], repo['llamadaConcretada'], repo['respuestaCliente'],
+        repo['fechaProxSeguimiento'].isoformat(sep=' ') if repo['fechaProxSeguimiento'] else None,
+        repo['ventaCerrada'], repo['motivoNoVenta'], repo['ofrecioOtrosPrecios'], repo['clienteConoceCatalogo'],
+        repo['leLlegoBienPedido'], repo['comentariosVenta'], repo['clienteInformoPago'], repo['revisoCtaCte'],
+        repo['comentariosCobranza'],
+    ]
+    # La clave sale de toda la fila normalizada (salvo la razón social, que es del cliente): con fechas sin hora,
+    # dos llamadas distintas al mismo cliente el mismo día no se toman como duplicadas
+    contenido = [valor for i, valor in enumerate(fila_staging) if i != 3]
+    clave = uuid.uuid5(NAMESPACE_IMPORTACION, json.dumps(contenido, default=str, ensure_ascii=False))
+    return fila_staging + [str(clave)]
+
+
+class ImportacionService:
+
+    @staticmethod
+    def importar_interacciones(ruta: str, ruta_rechazos: str = None, hoja: str = None, tamano_lote: int = TAMANO_LOTE):
+        """
+        Importa un CSV/XLSX de interacciones históricas. Las filas inválidas no detienen la importación:
+        se escriben en ruta_rechazos (CSV: fila, error, columnas originales).
+        Devuelve un resumen con leidas, importadas, duplicadas, rechazadas y clientes_creados.
+        """
+        if ruta_rechazos is None: ruta_rechazos = os.path.splitext(ruta)[0] + '_rechazos.csv'
+        resumen = {'leidas': 0, 'importadas': 0, 'duplicadas': 0, 'rechazadas': 0, 'clientes_creados': 0, 'reporte_rechazos': ruta_rechazos}
+        conn = None
+        try:
+            conn = get_db_connection()
+            with conn.cursor() as cur:
+                cur.execute("SELECT dni::text FROM users")
+                vendedores = {r[0] for r in cur.fetchall()}
+            CrmRepository.crear_staging_importacion(conn)
+
+            with open(ruta_rechazos, 'w', newline='', encoding='utf-8') as f_rechazos:
+                rechazos = csv.writer(f_rechazos)
+                rechazos.writerow(['fila', 'error'] + list(COLUMNAS_ARCHIVO.keys()))
+                lote = io.StringIO(); escritor = csv.writer(lote); en_lote = 0
+                for numero, fila in leer_filas(ruta, hoja):
+                    resumen['leidas'] += 1
+                    try:
+                        escritor.writerow([numero] + preparar_fila(fila, vendedores)); en_lote += 1
+                    except ValueError as e:
+                        resumen['rechazadas'] += 1
+                        rechazos.writerow([numero, str(e)] + [fila.get(c, '') for c in COLUMNAS_ARCHIVO.keys()])
+                        continue
+                    if en_lote >= tamano_lote:
+                        lote.seek(0); CrmRepository.copy_staging_importacion(conn, lote)
+                        lote = io.StringIO(); escritor = csv.writer(lote); en_lote = 0
+                if en_lote:
+                    lote.seek(0); CrmRepository.copy_staging_importacion(conn, lote)
+
+            resultado = CrmRepository.volcar_staging_importacion(conn)
+            publicar_invalidacion('dashboard', conn=conn); publicar_invalidacion('clientes', conn=conn)
+            conn.commit(); marcar_escritura()
+            resumen['importadas'] = resultado['importadas']; resumen['clientes_creados'] = resultado['clientes_creados']
+            resumen['duplicadas'] = resumen['leidas'] - resumen['rechazadas'] - resumen['importadas']
+            return resumen
+        except (Exception, psycopg2.DatabaseError) as error:
+            if conn: conn.rollback()
+            logger.error("Error al importar %s: %s", ruta, error)
+            raise
+        finally:
+            if conn: release_db_connection(conn)
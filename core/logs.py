@@ -0,0 +1,108 @@
+# core/logs.py
+# Configuración central de logging. Cada módulo usa logging.getLogger(__name__) con argumentos
+# estilo % (el mensaje solo se formatea si el nivel está habilitado: DEBUG apagado no cuesta nada).
+# Los registros pasan por una cola y un hilo aparte los escribe: el request nunca espera por stdout.
+# Configuración por entorno:
+#   LOG_LEVEL            nivel raíz (default INFO)
+#   LOG_LEVELS           niveles por logger, p.ej. "core.repository=DEBUG,pages=WARNING"
+#   LOG_RATE_LIMIT_SEG   ventana del limitador de mensajes DEBUG/INFO repetidos en segundos (default 10; 0 = sin límite)
+#   LOG_DEBUG_SAMPLE     fracción de mensajes DEBUG que se emiten (default 1)
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+FORMATO = '%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s'
+
+_listener = None
+_config_lock = threading.Lock()
+
+
+class LimitadorRepetidos(logging.Filter):
+    """
+    Deja pasar un mensaje DEBUG/INFO por (logger, nivel, plantilla) cada `ventana` segundos. La plantilla
+    es el mensaje sin formatear, así que "Cliente %s sincronizado" cuenta como uno solo. WARNING y
+    superiores pasan siempre (cada error con su traceback). Al reabrirse la ventana, el registro lleva
+    en `repetidos_suprimidos` cuántos se suprimieron; el registro no se modifica (lo ven otros handlers).
+    """
+    def __init__(self, ventana: float):
+        super().__init__(); self.ventana = ventana; self._vistos = {}; self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING: return True
+        clave = (record.name, record.levelno, record.msg); ahora = time.monotonic()
+        with self._lock:
+            ultimo, suprimidos = self._vistos.get(clave, (None, 0))
+            if ultimo is not None and ahora - ultimo < self.ventana:
+                self._vistos[clave] = (ultimo, suprimidos + 1); return False
+            self._vistos[clave] = (ahora, 0)
+        if suprimidos: record.repetidos_suprimidos = suprimidos
+        return True
+
+
+class _Formato(logging.Formatter):
+    """ FORMATO más la cuenta de repetidos que agregó LimitadorRepetidos. """
+    def formatMessage(self, record):
+        texto = super().formatMessage(record)
+        suprimidos = getattr(record, 'repetidos_suprimidos', 0)
+        return f"{texto} [+{suprimidos} repetidos suprimidos]" if suprimidos else texto
+
+
+class MuestreoDebug(logging.Filter):
+    """ Emite solo una fracción de los registros DEBUG (los niveles superiores pasan siempre). """
+    def __init__(self, fraccion: float):
+        super().__init__(); self.fraccion = fraccion
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or random.random() < self.fraccion
+
+
+class _QueueHandlerNoBloqueante(logging.handlers.QueueHandler):
+    """ Con la cola llena descarta el registro en lugar de bloquear el request. """
+    def enqueue(self, record):
+        try: self.queue.put_nowait(record)
+        except queue.Full: pass
+
+
+def _iniciar_listener(cola, handler):
+    global _listener
+    _listener = logging.handlers.QueueListener(cola, handler, respect_handler_level=True)
+    _listener.start()
+
+
+def configurar_logging():
+    """ Idempotente: la app y los scripts la llaman al arrancar. """
+    global _listener
+    with _config_lock:
+        if _listener is not None: return
+        raiz = logging.getLogger()
+        raiz.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+        for par in filter(None, (os.getenv('LOG_LEVELS') or '').split(',')):
+            nombre, _, nivel = par.partition('=')
+            logging.getLogger(nombre.strip()).setLevel(nivel.strip().upper())
+
+        salida = logging.StreamHandler(sys.stdout); salida.setFormatter(_Formato(FORMATO))
+        cola = queue.Queue(maxsize=10000)
+        handler = _QueueHandlerNoBloqueante(cola)
+        ventana = float(os.getenv('LOG_RATE_LIMIT_SEG') or 10)
+        if ventana > 0: handler.addFilter(LimitadorRepetidos(ventana))
+        fraccion = float(os.getenv('LOG_DEBUG_SAMPLE') or 1)
+        if fraccion < 1: handler.addFilter(MuestreoDebug(fraccion))
+        for h in list(raiz.handlers): raiz.removeHandler(h)
+        raiz.addHandler(handler)
+        _iniciar_listener(cola, salida)
+        # gunicorn --preload: el hilo del listener no sobrevive al fork, cada worker arranca el suyo
+        if hasattr(os, 'register_at_fork'): os.register_at_fork(after_in_child=lambda: _iniciar_listener(cola, salida))
+        atexit.register(detener_logging) # Que los scripts no pierdan los últimos registros de la cola
+
+
+def detener_logging():
+    """ Vacía la cola y detiene el hilo de escritura. """
+    global _listener
+    with _config_lock:
+        if _listener is not None: _listener.stop(); _listener = None
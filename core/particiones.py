@@ -0,0 +1,254 @@
+# core/particiones.py
+# Particionado mensual de interacciones_comerciales (PARTITION BY RANGE fecha_interaccion).
+# Los dashboards filtran por fecha_interaccion, así que con particiones el planner descarta los
+# meses fuera del rango (partition pruning) y cada índice queda del tamaño de un mes.
+# Las particiones viejas se archivan a CSV comprimido (gzip) y se eliminan de la base.
+# Requiere sql/002_registro_idempotencia.sql aplicado (la idempotencia deja de depender de un
+# índice único en la tabla). Se opera con el script particiones.py de la raíz.
+import gzip
+import logging
+import os
+import re
+from datetime import date
+import psycopg2
+from psycopg2 import sql
+from core.db import get_db_connection, release_db_connection
+
+TABLA = 'interacciones_comerciales'
+# Los límites de cada partición son medianoche del día 1 en la hora de Argentina, la misma
+# con la que el dashboard muestra y filtra las fechas.
+ZONA = 'America/Argentina/Buenos_Aires'
+MESES_FUTUROS = 3
+_PATRON_PARTICION = re.compile(rf'^{TABLA}_p(\d{{4}})(\d{{2}})$')
+
+logger = logging.getLogger(__name__)
+
+
+def _sumar_meses(d: date, meses: int) -> date:
+    total = d.year * 12 + d.month - 1 + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def _nombre_particion(mes: date) -> str:
+    return f"{TABLA}_p{mes.year:04d}{mes.month:02d}"
+
+
+def _limite(mes: date) -> str:
+    return f"{mes.isoformat()} 00:00:00 {ZONA}"
+
+
+def _esta_particionada(cur) -> bool:
+    cur.execute("SELECT c.relkind = 'p' FROM pg_class c WHERE c.oid = to_regclass(%s)", (TABLA,))
+    fila = cur.fetchone()
+    if fila is None: raise RuntimeError(f"No existe la tabla {TABLA}.")
+    return fila[0]
+
+
+def _particiones(cur) -> list:
+    """ Particiones mensuales existentes como [(nombre, mes)] ordenadas por mes. """
+    cur.execute("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+    """, (TABLA,))
+    particiones = []
+    for (nombre,) in cur.fetchall():
+        m = _PATRON_PARTICION.match(nombre)
+        if m: particiones.append((nombre, date(int(m.group(1)), int(m.group(2)), 1)))
+    return sorted(particiones, key=lambda p: p[1])
+
+
+def _columnas(cur, tabla: str) -> sql.Composable:
+    """ Columnas escribibles de tabla (sin las generadas, p.ej. busqueda), en orden, para copiar filas con INSERT ... SELECT. """
+    cur.execute("""
+        SELECT attname FROM pg_attribute
+        WHERE attrelid = to_regclass(%s) AND attnum > 0 AND NOT attisdropped AND attgenerated = ''
+        ORDER BY attnum
+    """, (tabla,))
+    return sql.SQL(', ').join(sql.Identifier(c) for (c,) in cur.fetchall())
+
+
+def _crear_particion(cur, mes: date) -> bool:
+    """
+    Crea la partición de `mes` si falta. Se arma como tabla suelta, se le pasan las filas que
+    hubieran caído en la partición DEFAULT para ese rango y recién entonces se adjunta:
+    ATTACH toma un lock liviano sobre la tabla padre y no falla por filas en DEFAULT.
+    """
+    nombre = _nombre_particion(mes)
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL", (nombre,))
+    if cur.fetchone()[0]: return False
+    desde, hasta = _limite(mes), _limite(_sumar_meses(mes, 1))
+    tabla, particion, default = sql.Identifier(TABLA), sql.Identifier(nombre), sql.Identifier(f"{TABLA}_default")
+    cur.execute(sql.SQL("CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED)").format(particion, tabla))
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL", (f"{TABLA}_default",))
+    if cur.fetchone()[0]:
+        cur.execute(sql.SQL("""
+            WITH movidas AS (
+                DELETE FROM {default} WHERE fecha_interaccion >= %s::timestamptz AND fecha_interaccion < %s::timestamptz RETURNING *
+            )
+            INSERT INTO {particion} ({columnas}) SELECT {columnas} FROM movidas
+        """).format(default=default, particion=particion, columnas=_columnas(cur, TABLA)), (desde, hasta))
+        if cur.rowcount: logger.warning("%s filas movidas de la partición DEFAULT a %s", cur.rowcount, nombre)
+    cur.execute(sql.SQL("ALTER TABLE {} ATTACH PARTITION {} FOR VALUES FROM (%s) TO (%s)").format(tabla, particion), (desde, hasta))
+    return True
+
+
+class ParticionesService:
+
+    @staticmethod
+    def migrar(meses_futuros: int = MESES_FUTUROS) -> dict:
+        """
+        Convierte interacciones_comerciales en tabla particionada por mes, en una sola transacción.
+        La tabla original queda renombrada como interacciones_comerciales_legacy (mismas columnas,
+        mismos datos) para verificar y borrar a mano. Bloquea escrituras mientras copia.
+        """
+        conn = None
+        try:
+            conn = get_db_connection()
+            with conn.cursor() as cur:
+                if _esta_particionada(cur): raise RuntimeError(f"{TABLA} ya está particionada.")
+                cur.execute("SELECT to_regclass('interacciones_idempotencia') IS NOT NULL")
+                if not cur.fetchone()[0]: raise RuntimeError("Falta interacciones_idempotencia: aplicar sql/002_registro_idempotencia.sql.")
+                cur.execute("SELECT conname FROM pg_constraint WHERE confrelid = to_regclass(%s)", (TABLA,))
+                referencias = [r[0] for r in cur.fetchall()]
+                if referencias: raise RuntimeError(f"Hay FKs que apuntan a {TABLA} ({', '.join(referencias)}); una tabla particionada no puede conservarlas tal cual.")
+
+                legacy = f"{TABLA}_legacy"
+                cur.execute(sql.SQL("LOCK TABLE {} IN EXCLUSIVE MODE").format(sql.Identifier(TABLA)))
+                cur.execute("SELECT pg_get_serial_sequence(%s, 'id')", (TABLA,))
+                secuencia = cur.fetchone()[0]
+                # FKs salientes (vendedor, cliente) para recrearlas en la tabla nueva
+                cur.execute("SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'f'", (TABLA,))
+                fks = cur.fetchall()
+                cur.execute("SELECT min(fecha_interaccion) AT TIME ZONE %s, count(*) FROM " + TABLA, (ZONA,))
+                minima, filas = cur.fetchone()
+
+                cur.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(sql.Identifier(TABLA), sql.Identifier(legacy)))
+                for conname, _ in fks:
+                    cur.execute(sql.SQL("ALTER TABLE {} RENAME CONSTRAINT {} TO {}").format(sql.Identifier(legacy), sql.Identifier(conname), sql.Identifier(f"{conname}_legacy")))
+                # Los índices (incluida la PK) no cambian de nombre con la tabla: se liberan para la tabla nueva
+                cur.execute("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s", (legacy,))
+                for (indice,) in cur.fetchall():
+                    cur.execute(sql.SQL("ALTER INDEX {} RENAME TO {}").format(sql.Identifier(indice), sql.Identifier(f"{indice[:56]}_legacy")))
+                # LIKE ... INCLUDING DEFAULTS conserva el nextval() de la secuencia de id: los ids siguen de corrido
+                cur.execute(sql.SQL("""
+                    CREATE TABLE {tabla} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE INCLUDING GENERATED,
+                                          PRIMARY KEY (id, fecha_interaccion))
+                    PARTITION BY RANGE (fecha_interaccion)
+                """).format(tabla=sql.Identifier(TABLA), legacy=sql.Identifier(legacy)))
+                if secuencia:
+                    cur.execute(sql.SQL("ALTER SEQUENCE {} OWNED BY {}.id").format(sql.SQL(secuencia), sql.Identifier(TABLA)))
+                for conname, definicion in fks:
+                    cur.execute(sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} " + definicion).format(sql.Identifier(TABLA), sql.Identifier(conname)))
+                # Índices en la tabla padre: se crean en cada partición (actual y futura)
+                cur.execute(sql.SQL("""
+                    CREATE INDEX ix_interacciones_fecha ON {t} (fecha_interaccion DESC);
+                    CREATE INDEX ix_interacciones_vendedor_fecha ON {t} (fk_vendedor_dni, fecha_interaccion DESC);
+                    CREATE INDEX ix_interacciones_cliente_historial ON {t} (fk_cliente_cuit, fecha_interaccion DESC, id DESC)
+                        INCLUDE (fk_vendedor_dni, tipo_interaccion, llamada_concretada, venta_cerrada, motivo_no_venta, fecha_prox_seguimiento);
+                    CREATE INDEX ix_interacciones_idempotency_key ON {t} (idempotency_key);
+                    CREATE INDEX ix_interacciones_seguimientos ON {t} (fk_vendedor_dni, fecha_prox_seguimiento)
+                        INCLUDE (id, fecha_interaccion) WHERE fecha_prox_seguimiento IS NOT NULL;
+                """).format(t=sql.Identifier(TABLA)))
+                cur.execute("SELECT EXISTS (SELECT 1 FROM pg_attribute WHERE attrelid = to_regclass(%s) AND attname = 'busqueda' AND NOT attisdropped)", (TABLA,))
+                if cur.fetchone()[0]: # Búsqueda en comentarios (sql/004_busqueda_comentarios.sql)
+                    cur.execute(sql.SQL("CREATE INDEX ix_interacciones_busqueda ON {} USING gin (busqueda)").format(sql.Identifier(TABLA)))
+                cur.execute(sql.SQL("CREATE TABLE {} PARTITION OF {} DEFAULT").format(sql.Identifier(f"{TABLA}_default"), sql.Identifier(TABLA)))
+
+                hoy = date.today().replace(day=1)
+                mes = (minima.date().replace(day=1) if minima else hoy)
+                creadas = 0
+                while mes <= _sumar_meses(hoy, meses_futuros):
+                    creadas += _crear_particion(cur, mes); mes = _sumar_meses(mes, 1)
+                # Columnas explícitas: las generadas (busqueda) no admiten valores y se recalculan al insertar
+                columnas = _columnas(cur, TABLA)
+                cur.execute(sql.SQL("INSERT INTO {} ({}) SELECT {} FROM {}").format(sql.Identifier(TABLA), columnas, columnas, sql.Identifier(legacy)))
+                copiadas = cur.rowcount
+                if copiadas != filas: raise RuntimeError(f"Se copiaron {copiadas} filas de {filas}.")
+                cur.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(TABLA)))
+            conn.commit()
+            logger.info("%s particionada: %s filas en %s particiones mensuales", TABLA, copiadas, creadas)
+            return {'filas': copiadas, 'particiones': creadas, 'legacy': legacy}
+        except (Exception, psycopg2.DatabaseError) as error:
+            if conn: conn.rollback()
+            logger.error("Error al particionar %s: %s", TABLA, error)
+            raise
+        finally:
+            if conn: release_db_connection(conn)
+
+    @staticmethod
+    def asegurar_particiones(meses_futuros: int = MESES_FUTUROS) -> list:
+        """ Crea las particiones faltantes desde el mes actual hasta meses_futuros adelante (correr a diario). """
+        conn = None
+        try:
+            conn = get_db_connection()
+            with conn.cursor() as cur:
+                if not _esta_particionada(cur): return []
+                hoy = date.today().replace(day=1)
+                creadas = [_nombre_particion(_sumar_meses(hoy, i)) for i in range(meses_futuros + 1) if _crear_particion(cur, _sumar_meses(hoy, i))]
+            conn.commit()
+            if creadas: logger.info("Particiones creadas: %s", ', '.join(creadas))
+            return creadas
+        except (Exception, psycopg2.DatabaseError) as error:
+            if conn: conn.rollback()
+            logger.error("Error al crear particiones: %s", error)
+            raise
+        finally:
+            if conn: release_db_connection(conn)
+
+    @staticmethod
+    def archivar(meses_retencion: int, directorio: str, eliminar: bool = True) -> list:
+        """
+        Exporta cada partición anterior a la ventana de retención a <directorio>/<partición>.csv.gz
+        (COPY con encabezado) y, si eliminar, la desvincula y la borra. Una partición por transacción:
+        si falla a mitad de camino, lo ya archivado queda archivado y el resto sigue en la base.
+        """
+        corte = _sumar_meses(date.today().replace(day=1), -meses_retencion)
+        os.makedirs(directorio, exist_ok=True)
+        archivadas = []
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                viejas = [(nombre, mes) for nombre, mes in _particiones(cur) if mes < corte] if _esta_particionada(cur) else []
+            conn.rollback()
+            for nombre, mes in viejas:
+                ruta = os.path.join(directorio, f"{nombre}.csv.gz"); temporal = ruta + '.parcial'
+                with conn.cursor() as cur:
+                    # Sin escrituras en la partición mientras se exporta y se borra
+                    cur.execute(sql.SQL("LOCK TABLE {} IN SHARE MODE").format(sql.Identifier(nombre)))
+                    cur.execute(sql.SQL("SELECT count(*) FROM {}").format(sql.Identifier(nombre)))
+                    filas = cur.fetchone()[0]
+                    with gzip.open(temporal, 'wb', compresslevel=6) as f:
+                        cur.copy_expert(sql.SQL("COPY {} TO STDOUT WITH (FORMAT csv, HEADER)").format(sql.Identifier(nombre)).as_string(conn), f)
+                    with gzip.open(temporal, 'rb') as f: escritas = sum(1 for _ in f) - 1 # Verificación antes de borrar nada
+                    if escritas < filas: raise RuntimeError(f"{nombre}: el archivo tiene {escritas} líneas para {filas} filas.")
+                    os.replace(temporal, ruta)
+                    if eliminar:
+                        cur.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(sql.Identifier(TABLA), sql.Identifier(nombre)))
+                        cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(nombre)))
+                conn.commit()
+                archivadas.append({'particion': nombre, 'filas': filas, 'archivo': ruta, 'bytes': os.path.getsize(ruta)})
+                logger.info("Partición %s archivada en %s (%s filas)", nombre, ruta, filas)
+            return archivadas
+        except (Exception, psycopg2.DatabaseError) as error:
+            conn.rollback()
+            logger.error("Error al archivar particiones: %s", error)
+            raise
+        finally:
+            release_db_connection(conn)
+
+    @staticmethod
+    def listar() -> list:
+        """ Particiones con filas estimadas y tamaño en disco. """
+        conn = None
+        try:
+            conn = get_db_connection(solo_lectura=True)
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint, pg_total_relation_size(c.oid)
+                    FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                    WHERE i.inhparent = to_regclass(%s) ORDER BY c.relname
+                """, (TABLA,))
+                return [{'particion': r[0], 'rango': r[1], 'filas_estimadas': max(r[2], 0), 'bytes': r[3]} for r in cur.fetchall()]
+        finally:
+            if conn:
+                conn.rollback(); release_db_connection(conn)
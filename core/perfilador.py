@@ -0,0 +1,147 @@
+# core/perfilador.py
+# Perfilado bajo demanda (cProfile) de los próximos N requests que coincidan con un patrón
+# (path o id del output del callback de Dash). Se activa desde la página /perfilador y vale
+# solo para el worker que atendió la activación: el objetivo es perfilar contra datos reales
+# sin redeployar. Sin sesión activa el costo por request es una comparación con None.
+# Por cada sesión se guarda en PROFILE_DIR (default 'perfiles'):
+#   <sesion>_<n>.prof     stats de cada request (pstats / snakeviz)
+#   <sesion>.prof         stats agregados de todos los requests de la sesión
+#   <sesion>.json         metadatos: patrón, pid, y por request path, callback, huella e ids de inputs (sin valores) y duración
+import cProfile
+import hashlib
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from datetime import datetime as dt
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'perfiles')
+PREFIJO_PROPIO = 'perfilador-' # Los callbacks de la página del perfilador no se perfilan a sí mismos
+
+logger = logging.getLogger(__name__)
+
+_sesion = None
+_sesion_lock = threading.Lock()
+_en_uso = threading.Lock() # cProfile admite un solo perfilador activo por intérprete
+
+
+def activar(patron: str, cantidad: int, usuario: str = None) -> dict:
+    """ Abre una sesión en este worker: perfila los próximos `cantidad` requests que coincidan con `patron`. """
+    global _sesion
+    with _sesion_lock:
+        _sesion = {
+            'id': f"{dt.now().strftime('%Y%m%d-%H%M%S')}_{os.getpid()}", 'patron': patron, 'objetivo': cantidad,
+            'pid': os.getpid(), 'usuario': usuario, 'inicio': dt.now().isoformat(timespec='seconds'), 'requests': [],
+        }
+        logger.info("Perfilador activado en pid %s: %s requests que coincidan con '%s'", os.getpid(), cantidad, patron)
+        return dict(_sesion)
+
+
+def desactivar():
+    global _sesion
+    with _sesion_lock:
+        sesion, _sesion = _sesion, None
+    if sesion and sesion['requests']: _guardar_agregado(sesion)
+    return sesion
+
+
+def estado():
+    with _sesion_lock:
+        return dict(_sesion) if _sesion else None
+
+
+def _items(lista) -> list:
+    """ inputs/state de Dash: cada elemento es {id, property, value} o, con ALL/ALLSMALLER, una lista de ellos. """
+    return [item for elem in lista or [] for item in (elem if isinstance(elem, list) else [elem]) if isinstance(item, dict)]
+
+
+def _huella_inputs(payload: dict) -> tuple:
+    """
+    Huella de inputs + state del callback (para agrupar ejecuciones con los mismos filtros) e ids de los
+    inputs. Los valores no se guardan: el patrón puede coincidir con el callback de login. Los ids con
+    'password' tampoco entran en la huella.
+    """
+    datos = {clave: [{**item, 'value': None} if 'password' in str(item.get('id', '')).lower() else item for item in _items(payload.get(clave))]
+             for clave in ('inputs', 'state')}
+    crudo = json.dumps(datos, sort_keys=True, default=str)
+    ids = sorted({f"{item.get('id')}.{item.get('property')}" for clave in ('inputs', 'state') for item in datos[clave]})
+    return hashlib.sha1(crudo.encode('utf-8')).hexdigest()[:12], ids
+
+
+def _guardar_agregado(sesion):
+    archivos = [os.path.join(PROFILE_DIR, r['archivo']) for r in sesion['requests']]
+    stats = pstats.Stats(archivos[0])
+    for archivo in archivos[1:]: stats.add(archivo)
+    stats.dump_stats(os.path.join(PROFILE_DIR, f"{sesion['id']}.prof"))
+    with open(os.path.join(PROFILE_DIR, f"{sesion['id']}.json"), 'w', encoding='utf-8') as f:
+        json.dump({**sesion, 'fin': dt.now().isoformat(timespec='seconds')}, f, indent=2, ensure_ascii=False)
+    logger.info("Perfilador: sesión %s guardada (%s requests)", sesion['id'], len(sesion['requests']))
+
+
+def instalar_perfilador(server):
+    from flask import g, request
+
+    @server.before_request
+    def _iniciar_perfil():
+        if _sesion is None: return
+        nombre = request.path; payload = {}
+        if request.path.endswith('/_dash-update-component'):
+            payload = request.get_json(silent=True) or {}
+            nombre = str(payload.get('output', ''))
+            if nombre.lstrip('.').startswith(PREFIJO_PROPIO): return
+        sesion = _sesion
+        if sesion is None or sesion['patron'] not in nombre: return
+        if not _en_uso.acquire(blocking=False): return # Otro request se está perfilando: este no cuenta
+        g._perfil = (sesion, cProfile.Profile(), time.perf_counter(), nombre, payload)
+        g._perfil[1].enable()
+
+    @server.teardown_request
+    def _terminar_perfil(exc):
+        perfil = g.pop('_perfil', None)
+        if perfil is None: return
+        sesion, profiler, t0, nombre, payload = perfil
+        try:
+            profiler.disable()
+            duracion_ms = round((time.perf_counter() - t0) * 1000, 1)
+            with _sesion_lock:
+                if _sesion is not sesion or len(sesion['requests']) >= sesion['objetivo']: return
+                n = len(sesion['requests']) + 1 # _en_uso: nadie más agrega a la sesión hasta el append de abajo
+            archivo = f"{sesion['id']}_{n}.prof"
+            # El archivo se escribe antes de anotarlo: desactivar() arma el agregado con los .prof anotados
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            profiler.dump_stats(os.path.join(PROFILE_DIR, archivo))
+            huella, inputs = _huella_inputs(payload) if payload else (None, [])
+            with _sesion_lock:
+                if _sesion is not sesion: return # Desactivada mientras se escribía: el .prof queda fuera del agregado
+                sesion['requests'].append({'n': n, 'archivo': archivo, 'path': request.path, 'callback': nombre if payload else None,
+                                           'huella_inputs': huella, 'inputs': inputs, 'duracion_ms': duracion_ms, 'error': repr(exc) if exc else None})
+                completa = n >= sesion['objetivo']
+            if completa: desactivar()
+        except Exception as e:
+            logger.exception("Perfilador: error guardando el perfil de %s: %s", nombre, e)
+        finally:
+            _en_uso.release()
+
+
+def listar_sesiones() -> list:
+    """ Sesiones guardadas en disco (de cualquier worker), más recientes primero. """
+    if not os.path.isdir(PROFILE_DIR): return []
+    sesiones = []
+    for nombre in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if not nombre.endswith('.json'): continue
+        try:
+            with open(os.path.join(PROFILE_DIR, nombre), encoding='utf-8') as f: sesiones.append(json.load(f))
+        except (OSError, ValueError): continue
+    return sesiones
+
+
+def resumen_stats(sesion_id: str, orden: str = 'cumulative', limite: int = 40) -> str:
+    """ Texto de pstats para los stats agregados de una sesión. """
+    ruta = os.path.join(PROFILE_DIR, f"{os.path.basename(sesion_id)}.prof")
+    if not os.path.exists(ruta): return ''
+    salida = io.StringIO()
+    pstats.Stats(ruta, stream=salida).strip_dirs().sort_stats(orden).print_stats(limite)
+    return salida.getvalue()
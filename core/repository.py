@@ -1,14 +1,22 @@
 # core/repository.py
+import logging
 import psycopg2
-from psycopg2.extras import DictCursor
-from core.db import db_pool, get_db_connection, release_db_connection
+from array import array
+from psycopg2.extras import DictCursor, execute_values
+from psycopg2.errors import InvalidSqlStatementName, UniqueViolation
+from core.tracing import trazado
+from core.db import db_pool, get_db_connection, release_db_connection, publicar_invalidacion
 from core.password import hash_password
+from core.tiempo_real import CANAL as CANAL_INTERACCIONES
+
+logger = logging.getLogger(__name__)
 
 # =============================================================================
 # REPOSITORIO DE USUARIOS
 # =============================================================================
 class UserRepository:
     @staticmethod
+    @trazado
     def create(dni: str, nombre: str, email: str, hashed_password: str, rol: str, zona: str = None):
         conn = None
         try:
@@ -20,6 +28,7 @@ class UserRepository:
                     """INSERT INTO users (dni, nombre, email, password_hash, zona, rol) VALUES (%s, %s, %s, %s, %s, %s)""",
                     (dni, nombre, email, hashed_password, zona, rol)
                 )
+                publicar_invalidacion('usuarios', dni, conn=conn); publicar_invalidacion('vendedores', conn=conn); publicar_invalidacion('zonas', conn=conn)
                 conn.commit()
                 return {"email": email}
         except (Exception, psycopg2.DatabaseError) as error:
@@ -29,6 +38,7 @@ class UserRepository:
             if conn: release_db_connection(conn)
 
     @staticmethod
+    @trazado
     def get_vendedores(conn):
         try:
             with conn.cursor(cursor_factory=DictCursor) as cur:
@@ -36,48 +46,379 @@ class UserRepository:
                 result = cur.fetchall()
                 return result if result else []
         except (Exception, psycopg2.DatabaseError) as error:
-             print(f"Error al obtener lista de vendedores: {error}")
+             logger.error("Error al obtener lista de vendedores: %s", error)
              raise error
 
+    @staticmethod
+    @trazado
+    def get_ics_token(dni: str):
+        """ Token del feed ICS del usuario (None si no lo activó). Lanza ante errores de DB. """
+        conn = None
+        try:
+            conn = get_db_connection(solo_lectura=True)
+            with conn.cursor() as cur:
+                cur.execute("SELECT ics_token FROM users WHERE dni = %s", (dni,))
+                fila = cur.fetchone()
+                return fila[0] if fila else None
+        finally:
+            if conn:
+                conn.rollback(); release_db_connection(conn)
+
+    @staticmethod
+    @trazado
+    def get_por_ics_token(token: str):
+        """ {'dni', 'nombre'} del dueño del token del feed ICS, o None. """
+        conn = None
+        try:
+            conn = get_db_connection(solo_lectura=True)
+            with conn.cursor(cursor_factory=DictCursor) as cur:
+                cur.execute("SELECT dni, nombre FROM users WHERE ics_token = %s", (token,))
+                fila = cur.fetchone()
+                return dict(fila) if fila else None
+        finally:
+            if conn:
+                conn.rollback(); release_db_connection(conn)
+
+    @staticmethod
+    @trazado
+    def set_ics_token(dni: str, token: str = None):
+        """ Guarda (o con None, borra) el token del feed ICS. La URL con el token anterior deja de funcionar. """
+        conn = None
+        try:
+            conn = get_db_connection()
+            with conn.cursor() as cur:
+                cur.execute("UPDATE users SET ics_token = %s WHERE dni = %s", (token, dni))
+                publicar_invalidacion('ics_tokens', dni, conn=conn)
+                conn.commit()
+        except (Exception, psycopg2.DatabaseError) as error:
+            if conn: conn.rollback()
+            logger.error("Error al guardar el token ICS de %s: %s", dni, error)
+            raise error
+        finally:
+            if conn: release_db_connection(conn)
+
 # =============================================================================
 # REPOSITORIO CRM
 # =============================================================================
+def _interaccion_params(input_data: dict, vendedor_dni: str) -> tuple:
+    """ Parámetros (16) de una interacción en el orden de las columnas del INSERT. """
+    params = (
+        vendedor_dni, input_data.get('clienteCuit'), input_data.get('tipoInteraccion') or None,
+        bool(input_data.get('llamadaConcretada', False)), input_data.get('respuestaCliente') or None,
+        input_data.get('fechaProxSeguimiento') or None, bool(input_data.get('ventaCerrada', False)),
+        input_data.get('motivoNoVenta') or None, bool(input_data.get('ofrecioOtrosPrecios', False)),
+        bool(input_data.get('clienteConoceCatalogo', False)), bool(input_data.get('leLlegoBienPedido', False)),
+        input_data.get('comentariosVenta') or None, bool(input_data.get('clienteInformoPago', False)),
+        bool(input_data.get('revisoCtaCte', False)), input_data.get('comentariosCobranza') or None,
+        input_data.get('idempotencyKey') or None
+    )
+    if len(params) != 16: raise ValueError(f"Fallo en construcción de params, {len(params)} != 16")
+    return params
+
+def _dashboard_filtros(filters: dict) -> tuple:
+    """ Condiciones (' AND ...' sobre el alias i) + parámetros de los filtros del dashboard. """
+    query = ""; params = []
+    if filters.get('vendedorDni'): query += " AND i.fk_vendedor_dni = %s"; params.append(filters['vendedorDni'])
+    if filters.get('clienteCuit'): query += " AND i.fk_cliente_cuit = %s"; params.append(filters['clienteCuit'])
+    # Zona del cliente (sql/005): igualdad sobre ix_cliente_zona, sin unir cliente en cada consulta
+    if filters.get('zonaId'): query += " AND i.fk_cliente_cuit IN (SELECT cuit FROM cliente WHERE zona_id = %s)"; params.append(filters['zonaId'])
+    if filters.get('fechaDesde'): query += " AND i.fecha_interaccion >= %s"; params.append(filters['fechaDesde'])
+    if filters.get('fechaHasta'): query += " AND i.fecha_interaccion < (%s::date + interval '1 day')"; params.append(filters['fechaHasta'])
+    if filters.get('idMayorA'): query += " AND i.id > %s"; params.append(filters['idMayorA']) # Refresco incremental (dashboard vendedor)
+    if filters.get('idsExcluidos'): query += " AND NOT (i.id = ANY(%s))"; params.append(list(filters['idsExcluidos'])) # Ya contadas
+    return query, params
+
+def _dashboard_query(filters: dict) -> tuple:
+    """ SQL + parámetros del listado de interacciones con los filtros del dashboard. """
+    # --- MODIFICACIÓN: Simplificar conversión ---
+    query = """
+      SELECT
+        i.id,
+        -- Asume que PG sabe la zona horaria original o usa la del server,
+        -- y convierte directamente a Argentina.
+        i.fecha_interaccion AT TIME ZONE 'America/Argentina/Buenos_Aires' AS fecha_interaccion,
+        i.tipo_interaccion, i.llamada_concretada, i.respuesta_cliente,
+        -- Convertir también fecha_prox_seguimiento si existe
+        i.fecha_prox_seguimiento AT TIME ZONE 'America/Argentina/Buenos_Aires' AS fecha_prox_seguimiento,
+        i.venta_cerrada,
+        i.motivo_no_venta, i.ofrecio_otros_precios, i.cliente_conoce_catalogo, i.le_llego_bien_pedido,
+        i.comentarios_venta, i.cliente_informo_pago, i.reviso_cta_cte, i.comentarios_cobranza,
+        i.fk_vendedor_dni,
+        u.nombre AS vendedor_nombre, u.zona AS vendedor_zona,
+        i.fk_cliente_cuit,
+        c.razon_social AS cliente_razon_social, c.zona AS cliente_zona
+      FROM interacciones_comerciales i
+      JOIN users u ON i.fk_vendedor_dni = u.dni
+      JOIN cliente c ON i.fk_cliente_cuit = c.cuit
+      WHERE 1=1
+    """
+    condiciones, params = _dashboard_filtros(filters)
+    query += condiciones
+
+    query += " ORDER BY i.fecha_interaccion DESC"
+    return query, tuple(params)
+
+# Columnas que se acumulan en array.array tipado (8 bytes por valor en lugar de un objeto Python cada uno),
+# por OID de cursor.description. bool va como 'B' (0/1): construir_dashboard lo lee como bool sin copiar.
+_TIPOS_ARRAY = {16: 'B', 20: 'q', 21: 'q', 23: 'q', 700: 'd', 701: 'd'}
+
+def _columnas_vacias(description) -> dict:
+    return {col.name: array(_TIPOS_ARRAY[col.type_code]) if col.type_code in _TIPOS_ARRAY else [] for col in description}
+
+def _acumular_columnas(columnas: dict, filas: list):
+    """
+    Transpone un bloque de tuplas (fetchmany) y lo agrega a cada columna. array no admite None:
+    la primera vez que una columna tipada trae un NULL pasa a lista (bool vuelve a True/False).
+    """
+    for nombre, valores in zip(list(columnas), zip(*filas)):
+        destino = columnas[nombre]
+        if isinstance(destino, array):
+            try: destino.extend(array(destino.typecode, valores)); continue # El bloque entero o nada
+            except TypeError: destino = columnas[nombre] = [bool(v) for v in destino] if destino.typecode == 'B' else destino.tolist()
+        destino.extend(valores)
+
+def _fetch_columnar(query: str, params: tuple, cursor_name: str, chunk_size: int) -> dict:
+    """
+    Ejecuta query con un cursor con nombre (server-side) y acumula el resultado por columna.
+    Por bloque de fetchmany las tuplas se transponen con zip; enteros, float y bool quedan en
+    arrays tipados y el resto en listas, así en memoria no queda un objeto por fila.
+    """
+    conn = None
+    try:
+        conn = get_db_connection(solo_lectura=True)
+        with conn.cursor(name=cursor_name) as cur:
+            cur.itersize = chunk_size
+            cur.execute(query, params)
+            filas = cur.fetchmany(chunk_size)
+            columnas = _columnas_vacias(cur.description)
+            while filas:
+                _acumular_columnas(columnas, filas)
+                filas = cur.fetchmany(chunk_size)
+        return columnas
+    except (Exception, psycopg2.DatabaseError) as error:
+        logger.error("Error en lectura columnar (%s): %s", cursor_name, error)
+        raise error
+    finally:
+        if conn:
+            conn.rollback() # Cierra la transacción de solo lectura del cursor con nombre
+            release_db_connection(conn)
+
+# Columnas de interacciones_comerciales que completan los INSERT (en el orden de _interaccion_params)
+_INTERACCION_COLUMNAS = """
+    fk_vendedor_dni, fk_cliente_cuit, tipo_interaccion, llamada_concretada,
+    respuesta_cliente, fecha_prox_seguimiento, venta_cerrada,
+    motivo_no_venta, ofrecio_otros_precios, cliente_conoce_catalogo,
+    le_llego_bien_pedido, comentarios_venta, cliente_informo_pago,
+    reviso_cta_cte, comentarios_cobranza, idempotency_key
+"""
+
+# Registro de claves de idempotencia (sql/002), común a los tres caminos de alta (create_interaccion,
+# _REGISTRAR_INTERACCION_SQL y volcar_staging_importacion): la fila registrada para una clave y el CTE
+# 'registro' que anota las filas insertadas por el CTE 'nueva' (id, fecha_interaccion, idempotency_key).
+_CLAVE_REGISTRADA = "SELECT interaccion_id, fecha_interaccion FROM interacciones_idempotencia WHERE idempotency_key = {}"
+_REGISTRO_IDEMPOTENCIA_CTE = """registro AS (
+    INSERT INTO interacciones_idempotencia (idempotency_key, interaccion_id, fecha_interaccion)
+    SELECT idempotency_key, id, fecha_interaccion FROM nueva WHERE idempotency_key IS NOT NULL
+  )"""
+
+# Upsert de cliente + insert de interacción en una sola sentencia. $2 (cuit) y $17 (razón social)
+# alimentan el cliente; el resto sigue el orden de _interaccion_params. cliente_creado indica si el
+# upsert insertó el cliente (para invalidar la cache de clientes solo en ese caso).
+# La idempotencia se resuelve contra interacciones_idempotencia (sql/002): una tabla particionada
+# no admite un índice único solo sobre idempotency_key. Dos envíos simultáneos con la misma clave
+# chocan en la PK del registro (UniqueViolation) y el segundo se reintenta como repetido.
+# Tipos explícitos: en INSERT ... SELECT los parámetros no toman el tipo de la columna destino.
+_REGISTRAR_INTERACCION_STMT = "crm_registrar_interaccion_v4"
+_REGISTRAR_INTERACCION_TIPOS = "text, bigint, text, boolean, text, timestamp, boolean, text, boolean, boolean, boolean, text, boolean, boolean, text, uuid, text"
+_REGISTRAR_INTERACCION_SQL = f"""
+  WITH cliente_upsert AS (
+    INSERT INTO cliente (cuit, razon_social) VALUES ($2, $17)
+    ON CONFLICT (cuit) DO NOTHING
+    RETURNING cuit
+  ),
+  existente AS ({_CLAVE_REGISTRADA.format('$16')}),
+  nueva AS (
+    INSERT INTO interacciones_comerciales ({_INTERACCION_COLUMNAS})
+    SELECT $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16
+    WHERE NOT EXISTS (SELECT 1 FROM existente)
+    RETURNING id, fecha_interaccion, idempotency_key
+  ),
+  {_REGISTRO_IDEMPOTENCIA_CTE}
+  SELECT id, fecha_interaccion, true AS insertada, EXISTS (SELECT 1 FROM cliente_upsert) AS cliente_creado FROM nueva
+  UNION ALL
+  SELECT interaccion_id, fecha_interaccion, false, EXISTS (SELECT 1 FROM cliente_upsert) FROM existente
+"""
+# Aviso a los dashboards abiertos (core/tiempo_real.py) con lo necesario para sumar la fila y los KPIs
+# sin recargar. Va en la misma transacción que el INSERT: sin commit no se entrega. Textos recortados
+# para no pasar el límite de 8000 bytes del payload de NOTIFY.
+_NOTIFICAR_INTERACCION_SQL = """
+  SELECT pg_notify(%s, json_build_object(
+    'id', i.id,
+    'fecha_interaccion', to_char(i.fecha_interaccion AT TIME ZONE 'America/Argentina/Buenos_Aires', 'YYYY-MM-DD"T"HH24:MI:SS'),
+    'tipo_interaccion', i.tipo_interaccion, 'llamada_concretada', i.llamada_concretada,
+    'venta_cerrada', i.venta_cerrada, 'motivo_no_venta', i.motivo_no_venta,
+    'respuesta_cliente', left(i.respuesta_cliente, 500), 'comentarios_venta', left(i.comentarios_venta, 500),
+    'vendedor_dni', i.fk_vendedor_dni, 'vendedor_nombre', u.nombre,
+    'cliente_cuit', i.fk_cliente_cuit, 'cliente_razon_social', left(c.razon_social, 200), 'cliente_zona_id', c.zona_id
+  )::text)
+  FROM interacciones_comerciales i
+  JOIN users u ON i.fk_vendedor_dni = u.dni
+  JOIN cliente c ON i.fk_cliente_cuit = c.cuit
+  WHERE i.id = %s AND i.fecha_interaccion = %s
+"""
+
+def _notificar_interaccion(cur, interaccion_id, fecha_interaccion):
+    # Con fecha_interaccion la lectura va solo a la partición del mes (sin ella se revisan todas)
+    cur.execute(_NOTIFICAR_INTERACCION_SQL, (CANAL_INTERACCIONES, interaccion_id, fecha_interaccion))
+
+# Backends (PID) en los que ya se hizo PREPARE. El PREPARE vive lo que vive la sesión.
+_prepared_backends = set()
+
 class CrmRepository:
 
     @staticmethod
+    @trazado
     def create_interaccion(conn, input_data: dict, vendedor_dni: str):
+        """
+        Inserta una interacción. Si 'idempotencyKey' ya fue usada, no duplica:
+        devuelve la fila existente con insertada = False.
+        """
         with conn.cursor(cursor_factory=DictCursor) as cur:
-            interaccion_query = """
-              INSERT INTO interacciones_comerciales (
-                fk_vendedor_dni, fk_cliente_cuit, tipo_interaccion, llamada_concretada,
-                respuesta_cliente, fecha_prox_seguimiento, venta_cerrada,
-                motivo_no_venta, ofrecio_otros_precios, cliente_conoce_catalogo,
-                le_llego_bien_pedido, comentarios_venta, cliente_informo_pago,
-                reviso_cta_cte, comentarios_cobranza
-              ) VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-              ) RETURNING *;
+            # Reintento con la misma clave: no inserta, devuelve la fila existente (ver _REGISTRAR_INTERACCION_SQL)
+            interaccion_query = f"""
+              WITH existente AS ({_CLAVE_REGISTRADA.format('%s::uuid')}),
+              nueva AS (
+                INSERT INTO interacciones_comerciales ({_INTERACCION_COLUMNAS})
+                SELECT %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s::uuid
+                WHERE NOT EXISTS (SELECT 1 FROM existente)
+                RETURNING *
+              ),
+              {_REGISTRO_IDEMPOTENCIA_CTE}
+              SELECT nueva.*, true AS insertada FROM nueva
+              UNION ALL
+              SELECT i.*, false FROM interacciones_comerciales i
+              JOIN existente e ON i.id = e.interaccion_id AND i.fecha_interaccion = e.fecha_interaccion;
             """
-            params_list = [
-                vendedor_dni, input_data.get('clienteCuit'), input_data.get('tipoInteraccion') or None,
-                bool(input_data.get('llamadaConcretada', False)), input_data.get('respuestaCliente') or None,
-                input_data.get('fechaProxSeguimiento') or None, bool(input_data.get('ventaCerrada', False)),
-                input_data.get('motivoNoVenta') or None, bool(input_data.get('ofrecioOtrosPrecios', False)),
-                bool(input_data.get('clienteConoceCatalogo', False)), bool(input_data.get('leLlegoBienPedido', False)),
-                input_data.get('comentariosVenta') or None, bool(input_data.get('clienteInformoPago', False)),
-                bool(input_data.get('revisoCtaCte', False)), input_data.get('comentariosCobranza') or None
-            ]
-            params = tuple(params_list)
-            if len(params) != 15: raise ValueError(f"Fallo en construcción de params, {len(params)} != 15")
+            params = _interaccion_params(input_data, vendedor_dni)
             try:
-                cur.execute(interaccion_query, params)
-                return cur.fetchone()
+                cur.execute(interaccion_query, (params[-1],) + params)
+                row = cur.fetchone()
+                if row and row['insertada']: _notificar_interaccion(cur, row['id'], row['fecha_interaccion'])
+                return row
             except Exception as db_error:
-                 print(f"!!! Error directo de DB en cur.execute: {db_error}")
-                 import traceback; traceback.print_exc()
+                 logger.exception("Error directo de DB en cur.execute: %s", db_error)
                  raise
 
     @staticmethod
+    @trazado
+    def create_interaccion_con_cliente(conn, input_data: dict, vendedor_dni: str):
+        """
+        Camino de escritura de registrar_interaccion: crea el cliente si no existe e inserta
+        la interacción en una única sentencia preparada en el servidor (EXECUTE).
+        Devuelve {'id', 'fecha_interaccion', 'insertada', 'cliente_creado'}; no hace commit. Los reintentos
+        vuelven a un SAVEPOINT tomado en el mismo viaje que el EXECUTE: lo que el llamador ya hizo en la
+        transacción se conserva.
+        """
+        params = _interaccion_params(input_data, vendedor_dni) + (input_data.get('clienteRazonSocial') or None,)
+        execute_sql = f"EXECUTE {_REGISTRAR_INTERACCION_STMT} ({', '.join(['%s'] * len(params))})"
+        backend_pid = conn.get_backend_pid()
+        with conn.cursor(cursor_factory=DictCursor) as cur:
+            prepare_sql = f"PREPARE {_REGISTRAR_INTERACCION_STMT} ({_REGISTRAR_INTERACCION_TIPOS}) AS {_REGISTRAR_INTERACCION_SQL}"
+            if backend_pid not in _prepared_backends:
+                cur.execute(prepare_sql)
+                _prepared_backends.add(backend_pid)
+            try:
+                cur.execute("SAVEPOINT crm_registrar_interaccion; " + execute_sql, params)
+            except InvalidSqlStatementName:
+                # PID reutilizado por una sesión nueva sin el PREPARE: se prepara y reintenta
+                cur.execute("ROLLBACK TO SAVEPOINT crm_registrar_interaccion")
+                cur.execute(prepare_sql)
+                cur.execute(execute_sql, params)
+            except UniqueViolation:
+                # Otro envío con la misma clave ganó la carrera: al reintentar ya figura como existente
+                cur.execute("ROLLBACK TO SAVEPOINT crm_registrar_interaccion")
+                cur.execute(execute_sql, params)
+            row = cur.fetchone()
+            if row and row['insertada']: _notificar_interaccion(cur, row['id'], row['fecha_interaccion'])
+            return {'id': row['id'], 'fecha_interaccion': row['fecha_interaccion'], 'insertada': row['insertada'], 'cliente_creado': row['cliente_creado']} if row else None
+
+    # --- Importación masiva (COPY a staging) ---
+    IMPORTACION_COLUMNAS = [
+        'fila', 'fecha_interaccion', 'fk_vendedor_dni', 'fk_cliente_cuit', 'cliente_razon_social',
+        'tipo_interaccion', 'llamada_concretada', 'respuesta_cliente', 'fecha_prox_seguimiento', 'venta_cerrada',
+        'motivo_no_venta', 'ofrecio_otros_precios', 'cliente_conoce_catalogo', 'le_llego_bien_pedido',
+        'comentarios_venta', 'cliente_informo_pago', 'reviso_cta_cte', 'comentarios_cobranza', 'idempotency_key'
+    ]
+
+    @staticmethod
+    def crear_staging_importacion(conn):
+        """ Tabla temporal de staging para la importación; se descarta al terminar la transacción. """
+        with conn.cursor() as cur:
+            # Mismos tipos que la tabla destino (fk_vendedor_dni, fk_cliente_cuit, fechas) sin repetirlos acá
+            cur.execute("""
+                CREATE TEMP TABLE staging_interacciones ON COMMIT DROP AS
+                SELECT
+                    0::integer AS fila, fecha_interaccion, fk_vendedor_dni, fk_cliente_cuit,
+                    NULL::text AS cliente_razon_social, tipo_interaccion, llamada_concretada,
+                    respuesta_cliente, fecha_prox_seguimiento, venta_cerrada, motivo_no_venta,
+                    ofrecio_otros_precios, cliente_conoce_catalogo, le_llego_bien_pedido, comentarios_venta,
+                    cliente_informo_pago, reviso_cta_cte, comentarios_cobranza, idempotency_key
+                FROM interacciones_comerciales
+                WITH NO DATA;
+            """)
+
+    @staticmethod
+    @trazado
+    def copy_staging_importacion(conn, csv_buffer):
+        """ Carga un lote (file-like en formato CSV, sin encabezado) en staging con COPY. """
+        columnas = ', '.join(CrmRepository.IMPORTACION_COLUMNAS)
+        with conn.cursor() as cur:
+            cur.copy_expert(f"COPY staging_interacciones ({columnas}) FROM STDIN WITH (FORMAT csv)", csv_buffer)
+
+    @staticmethod
+    @trazado
+    def volcar_staging_importacion(conn):
+        """
+        Crea en bloque los clientes faltantes y pasa staging a interacciones_comerciales.
+        Las filas cuya clave de idempotencia ya está registrada (archivo reimportado) se omiten. No hace commit.
+        """
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO cliente (cuit, razon_social)
+                SELECT DISTINCT ON (fk_cliente_cuit) fk_cliente_cuit, cliente_razon_social
+                FROM staging_interacciones ORDER BY fk_cliente_cuit, fila
+                ON CONFLICT (cuit) DO NOTHING;
+            """)
+            clientes_creados = cur.rowcount
+            # DISTINCT ON: filas idénticas dentro del archivo comparten clave y se importan una sola vez
+            cur.execute(f"""
+                WITH nueva AS (
+                    INSERT INTO interacciones_comerciales (
+                        fecha_interaccion, fk_vendedor_dni, fk_cliente_cuit, tipo_interaccion, llamada_concretada,
+                        respuesta_cliente, fecha_prox_seguimiento, venta_cerrada, motivo_no_venta,
+                        ofrecio_otros_precios, cliente_conoce_catalogo, le_llego_bien_pedido, comentarios_venta,
+                        cliente_informo_pago, reviso_cta_cte, comentarios_cobranza, idempotency_key
+                    )
+                    SELECT
+                        fecha_interaccion, fk_vendedor_dni, fk_cliente_cuit, tipo_interaccion, llamada_concretada,
+                        respuesta_cliente, fecha_prox_seguimiento, venta_cerrada, motivo_no_venta,
+                        ofrecio_otros_precios, cliente_conoce_catalogo, le_llego_bien_pedido, comentarios_venta,
+                        cliente_informo_pago, reviso_cta_cte, comentarios_cobranza, idempotency_key
+                    FROM (
+                        SELECT DISTINCT ON (s.idempotency_key) s.* FROM staging_interacciones s
+                        WHERE NOT EXISTS ({_CLAVE_REGISTRADA.format('s.idempotency_key')})
+                        ORDER BY s.idempotency_key, s.fila
+                    ) s
+                    ORDER BY fila
+                    RETURNING id, fecha_interaccion, idempotency_key
+                ),
+                {_REGISTRO_IDEMPOTENCIA_CTE}
+                SELECT count(*) FROM nueva;
+            """)
+            return {'clientes_creados': clientes_creados, 'importadas': cur.fetchone()[0]}
+
+    @staticmethod
+    @trazado
     def get_dashboard_data(filters: dict):
         """
         Obtiene los datos crudos para el dashboard.
@@ -85,81 +426,573 @@ class CrmRepository:
         """
         conn = None
         try:
-            conn = get_db_connection()
+            conn = get_db_connection(solo_lectura=True)
             with conn.cursor(cursor_factory=DictCursor) as cur:
-                # --- MODIFICACIÓN: Simplificar conversión ---
-                query = """
-                  SELECT
-                    i.id,
-                    -- Asume que PG sabe la zona horaria original o usa la del server,
-                    -- y convierte directamente a Argentina.
-                    i.fecha_interaccion AT TIME ZONE 'America/Argentina/Buenos_Aires' AS fecha_interaccion,
-                    i.tipo_interaccion, i.llamada_concretada, i.respuesta_cliente,
-                    -- Convertir también fecha_prox_seguimiento si existe
-                    i.fecha_prox_seguimiento AT TIME ZONE 'America/Argentina/Buenos_Aires' AS fecha_prox_seguimiento,
-                    i.venta_cerrada,
-                    i.motivo_no_venta, i.ofrecio_otros_precios, i.cliente_conoce_catalogo, i.le_llego_bien_pedido,
-                    i.comentarios_venta, i.cliente_informo_pago, i.reviso_cta_cte, i.comentarios_cobranza,
-                    i.fk_vendedor_dni,
-                    u.nombre AS vendedor_nombre, u.zona AS vendedor_zona,
-                    i.fk_cliente_cuit,
-                    c.razon_social AS cliente_razon_social, c.zona AS cliente_zona
-                  FROM interacciones_comerciales i
-                  JOIN users u ON i.fk_vendedor_dni = u.dni
-                  JOIN cliente c ON i.fk_cliente_cuit = c.cuit
-                  WHERE 1=1
-                """
-                params = []
-                if filters.get('vendedorDni'): query += " AND i.fk_vendedor_dni = %s"; params.append(filters['vendedorDni'])
-                if filters.get('clienteCuit'): query += " AND i.fk_cliente_cuit = %s"; params.append(filters['clienteCuit'])
-                if filters.get('fechaDesde'): query += " AND i.fecha_interaccion >= %s"; params.append(filters['fechaDesde'])
-                if filters.get('fechaHasta'): query += " AND i.fecha_interaccion < (%s::date + interval '1 day')"; params.append(filters['fechaHasta'])
-                
-                # --- BLOQUE DE FILTRO ZONA ELIMINADO ---
-                # if filters.get('zona'):
-                #     zona_param = f"%{filters['zona']}%"
-                #     query += " AND (u.zona ILIKE %s OR c.zona ILIKE %s)"
-                #     params.extend([zona_param, zona_param])
-                # ----------------------------------------
-
-                query += " ORDER BY i.fecha_interaccion DESC"
-                
-                # print(f"DEBUG SQL Query: {cur.mogrify(query, tuple(params))}") # Descomentar si quieres ver la SQL
-                
-                cur.execute(query, tuple(params))
+                query, params = _dashboard_query(filters)
+                # logger.debug("SQL: %s", cur.mogrify(query, params)) # Descomentar si quieres ver la SQL
+                cur.execute(query, params)
                 result = cur.fetchall()
 
-                # print(f"DEBUG: Datos crudos desde get_dashboard_data: {len(result) if result else 0} filas") # Debug opcional
+                # logger.debug("Datos crudos desde get_dashboard_data: %s filas", len(result) if result else 0) # Debug opcional
 
                 return result
         except (Exception, psycopg2.DatabaseError) as error:
-            print(f"Error al obtener datos del dashboard: {error}")
+            logger.error("Error al obtener datos del dashboard: %s", error)
             raise error
         finally:
             if conn: release_db_connection(conn)
 
     @staticmethod
+    def iter_dashboard_data(filters: dict, chunk_size: int = 5000):
+        """
+        Igual que get_dashboard_data pero sin cargar todo en memoria: cursor con nombre (server-side)
+        y fetchmany. Genera (cur.description, filas) por bloque; filas son tuplas.
+        La conexión se toma al empezar a iterar y se devuelve al pool al terminar o al cerrar el generador.
+        """
+        conn = None
+        try:
+            conn = get_db_connection(solo_lectura=True)
+            query, params = _dashboard_query(filters)
+            with conn.cursor(name='iter_dashboard_data') as cur:
+                cur.itersize = chunk_size
+                cur.execute(query, params)
+                # El primer bloque se entrega aunque venga vacío, para que el consumidor conozca las columnas
+                filas = cur.fetchmany(chunk_size)
+                yield cur.description, filas
+                while filas:
+                    filas = cur.fetchmany(chunk_size)
+                    if filas: yield cur.description, filas
+        except (Exception, psycopg2.DatabaseError) as error:
+            logger.error("Error al iterar datos del dashboard: %s", error)
+            raise error
+        finally:
+            if conn:
+                conn.rollback() # Cierra la transacción de solo lectura del cursor con nombre
+                release_db_connection(conn)
+
+    @staticmethod
+    @trazado
+    def get_dashboard_data_columnar(filters: dict, chunk_size: int = 10000):
+        """
+        Mismos datos que get_dashboard_data en formato columnar: {columna: array.array | list}.
+        Usa cursor server-side + fetchmany con tuplas planas, sin crear un DictRow por fila;
+        CrmService.construir_dashboard arma el DataFrame sobre los buffers de los arrays.
+        """
+        query, params = _dashboard_query(filters)
+        return _fetch_columnar(query, params, 'dashboard_columnar', chunk_size)
+
+    # Series de tendencia: expresión SQL de cada dimensión (nunca se interpola texto del usuario)
+    TENDENCIAS_DIMENSIONES = {'vendedor': "coalesce(u.nombre, i.fk_vendedor_dni)", 'tipo': "coalesce(i.tipo_interaccion, 'Sin tipo')"}
+    TENDENCIAS_GRANULARIDADES = ('day', 'week', 'month', 'quarter', 'year')
+
+    @staticmethod
+    @trazado
+    def get_rango_fechas(filters: dict):
+        """ (mínima, máxima) fecha_interaccion en hora de Argentina para los filtros; con ix_interacciones_fecha son dos lecturas de índice. """
+        condiciones, params = _dashboard_filtros(filters)
+        conn = None
+        try:
+            conn = get_db_connection(solo_lectura=True)
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    SELECT min(i.fecha_interaccion) AT TIME ZONE 'America/Argentina/Buenos_Aires',
+                           max(i.fecha_interaccion) AT TIME ZONE 'America/Argentina/Buenos_Aires'
+                    FROM interacciones_comerciales i WHERE 1=1 {condiciones}
+                """, params)
+                return cur.fetchone()
+        finally:
+            if conn:
+                conn.rollback(); release_db_connection(conn)
+
+    @staticmethod
+    @trazado
+    def get_tendencias(filters: dict, granularidad: str, dimension: str, max_series: int = 8):
+        """
+        Interacciones, contactadas y cerradas por período (date_trunc en hora de Argentina) y serie.
+        Se agrega todo en la base: vuelven a lo sumo períodos x (max_series + 1) filas; las series
+        fuera de las max_series de más volumen se suman como 'Otros'.
+        """
+        if granularidad not in CrmRepository.TENDENCIAS_GRANULARIDADES: raise ValueError(f"Granularidad inválida: {granularidad}")
+        serie = CrmRepository.TENDENCIAS_DIMENSIONES[dimension]
+        condiciones, params = _dashboard_filtros(filters)
+        query = f"""
+            WITH base AS (
+                SELECT date_trunc(%s, i.fecha_interaccion AT TIME ZONE 'America/Argentina/Buenos_Aires') AS periodo,
+                       {serie} AS serie,
+                       count(*) AS interacciones,
+                       count(*) FILTER (WHERE i.llamada_concretada) AS contactadas,
+                       count(*) FILTER (WHERE i.venta_cerrada) AS cerradas
+                FROM interacciones_comerciales i
+                LEFT JOIN users u ON i.fk_vendedor_dni = u.dni
+                WHERE 1=1 {condiciones}
+                GROUP BY 1, 2
+            ),
+            principales AS (
+                SELECT serie FROM base GROUP BY serie ORDER BY sum(interacciones) DESC LIMIT %s
+            )
+            SELECT b.periodo, CASE WHEN p.serie IS NULL THEN 'Otros' ELSE b.serie END AS serie,
+                   sum(b.interacciones)::int AS interacciones, sum(b.contactadas)::int AS contactadas, sum(b.cerradas)::int AS cerradas
+            FROM base b LEFT JOIN principales p ON p.serie = b.serie
+            GROUP BY 1, 2 ORDER BY 1, 2
+        """
+        conn = None
+        try:
+            conn = get_db_connection(solo_lectura=True)
+            with conn.cursor(cursor_factory=DictCursor) as cur:
+                cur.execute(query, [granularidad] + params + [max_series])
+                return [dict(fila) for fila in cur.fetchall()]
+        except (Exception, psycopg2.DatabaseError) as error:
+            logger.error("Error al calcular tendencias (%s, %s): %s", granularidad, dimension, error)
+            raise error
+        finally:
+            if conn:
+                conn.rollback(); release_db_connection(conn)
+
+    @staticmethod
+    @trazado
+    def get_ranking_vendedores(filters: dict):
+        """
+        Ranking de todos los vendedores en una sola consulta: interacciones, tasas de contacto y cierre,
+        clientes distintos y seguimientos vencidos (la última interacción del período con cada cliente
+        dejó un seguimiento ya pasado), con el puesto en cada métrica por funciones de ventana.
+        Ignora el filtro de vendedor: compara a todos en el mismo período.
+        """
+        condiciones, params = _dashboard_filtros({**filters, 'vendedorDni': None})
+        query = f"""
+            WITH periodo AS (
+                SELECT i.fk_vendedor_dni, i.fk_cliente_cuit, i.llamada_concretada, i.venta_cerrada, i.fecha_prox_seguimiento,
+                       row_number() OVER (PARTITION BY i.fk_vendedor_dni, i.fk_cliente_cuit ORDER BY i.fecha_interaccion DESC, i.id DESC) AS orden_cliente
+                FROM interacciones_comerciales i
+                WHERE 1=1 {condiciones}
+            ),
+            por_vendedor AS (
+                SELECT fk_vendedor_dni,
+                       count(*) AS interacciones,
+                       count(*) FILTER (WHERE llamada_concretada) AS contactadas,
+                       count(*) FILTER (WHERE venta_cerrada) AS cerradas,
+                       count(DISTINCT fk_cliente_cuit) AS clientes,
+                       count(*) FILTER (WHERE orden_cliente = 1 AND fecha_prox_seguimiento < now()) AS seguimientos_vencidos
+                FROM periodo GROUP BY fk_vendedor_dni
+            ),
+            metricas AS (
+                SELECT u.dni, u.nombre,
+                       coalesce(p.interacciones, 0) AS interacciones, coalesce(p.clientes, 0) AS clientes,
+                       coalesce(p.seguimientos_vencidos, 0) AS seguimientos_vencidos,
+                       coalesce(round(p.contactadas * 100.0 / nullif(p.interacciones, 0), 1), 0) AS tasa_contacto,
+                       coalesce(round(p.cerradas * 100.0 / nullif(p.interacciones, 0), 1), 0) AS tasa_cierre
+                FROM users u LEFT JOIN por_vendedor p ON p.fk_vendedor_dni = u.dni
+                WHERE u.rol = 'vendedor'
+            )
+            SELECT m.*,
+                   rank() OVER (ORDER BY interacciones DESC) AS puesto_interacciones,
+                   rank() OVER (ORDER BY tasa_contacto DESC) AS puesto_contacto,
+                   rank() OVER (ORDER BY tasa_cierre DESC) AS puesto_cierre,
+                   rank() OVER (ORDER BY seguimientos_vencidos ASC) AS puesto_seguimientos
+            FROM metricas m
+            ORDER BY puesto_interacciones, nombre
+        """
+        conn = None
+        try:
+            conn = get_db_connection(solo_lectura=True)
+            with conn.cursor(cursor_factory=DictCursor) as cur:
+                cur.execute(query, params)
+                return [dict(fila) for fila in cur.fetchall()]
+        except (Exception, psycopg2.DatabaseError) as error:
+            logger.error("Error al calcular el ranking de vendedores: %s", error)
+            raise error
+        finally:
+            if conn:
+                conn.rollback(); release_db_connection(conn)
+
+    @staticmethod
+    @trazado
+    def get_resumen_cliente(cuit: int, vendedor_dni: str = None):
+        """
+        Datos del cliente y totales de toda su historia (con ix_interacciones_cliente_historial, sin leer el heap).
+        Con vendedor_dni, solo las interacciones de ese vendedor.
+        """
+        filtro_motivos = " AND fk_vendedor_dni = %s" if vendedor_dni else ""
+        filtro_join = " AND i.fk_vendedor_dni = %s" if vendedor_dni else ""
+        conn = None
+        try:
+            conn = get_db_connection(solo_lectura=True)
+            with conn.cursor(cursor_factory=DictCursor) as cur:
+                cur.execute("""
+                    SELECT c.cuit, c.razon_social, c.zona,
+                           count(i.id) AS interacciones,
+                           count(*) FILTER (WHERE i.llamada_concretada) AS contactadas,
+                           count(*) FILTER (WHERE i.venta_cerrada) AS cerradas,
+                           count(*) FILTER (WHERE i.fecha_prox_seguimiento >= now()) AS seguimientos_pendientes,
+                           min(i.fecha_interaccion) AT TIME ZONE 'America/Argentina/Buenos_Aires' AS primera_interaccion,
+                           max(i.fecha_interaccion) AT TIME ZONE 'America/Argentina/Buenos_Aires' AS ultima_interaccion,
+                           (SELECT json_agg(json_build_object('label', m.motivo_no_venta, 'value', m.n) ORDER BY m.n DESC)
+                            FROM (SELECT motivo_no_venta, count(*) AS n FROM interacciones_comerciales
+                                  WHERE fk_cliente_cuit = c.cuit AND NOT coalesce(venta_cerrada, false) AND motivo_no_venta <> ''""" + filtro_motivos + """
+                                  GROUP BY motivo_no_venta) m) AS motivos_no_venta
+                    FROM cliente c
+                    LEFT JOIN interacciones_comerciales i ON i.fk_cliente_cuit = c.cuit""" + filtro_join + """
+                    WHERE c.cuit = %s
+                    GROUP BY c.cuit, c.razon_social, c.zona
+                """, ([vendedor_dni] * 2 if vendedor_dni else []) + [cuit])
+                fila = cur.fetchone()
+                return dict(fila) if fila else None
+        except (Exception, psycopg2.DatabaseError) as error:
+            logger.error("Error al obtener el resumen del cliente %s: %s", cuit, error)
+            raise error
+        finally:
+            if conn:
+                conn.rollback(); release_db_connection(conn)
+
+    @staticmethod
+    @trazado
+    def get_historial_cliente(cuit: int, despues_de: tuple = None, limite: int = 50, vendedor_dni: str = None):
+        """
+        Una página del historial del cliente (con vendedor_dni, solo sus interacciones), más recientes primero. despues_de = (fecha_interaccion, id)
+        de la última fila ya mostrada (keyset): la consulta baja por ix_interacciones_cliente_historial
+        desde ese punto, sin OFFSET, así cualquier página cuesta lo mismo. Devuelve limite + 1 filas
+        como máximo: la sobrante solo indica que hay más.
+        """
+        query = """
+            SELECT i.id, i.fecha_interaccion AS cursor_fecha,
+                   i.fecha_interaccion AT TIME ZONE 'America/Argentina/Buenos_Aires' AS fecha_interaccion,
+                   i.fecha_prox_seguimiento AT TIME ZONE 'America/Argentina/Buenos_Aires' AS fecha_prox_seguimiento,
+                   i.tipo_interaccion, i.llamada_concretada, i.venta_cerrada, i.motivo_no_venta,
+                   i.respuesta_cliente, i.comentarios_venta, i.comentarios_cobranza,
+                   u.nombre AS vendedor_nombre
+            FROM interacciones_comerciales i
+            JOIN users u ON i.fk_vendedor_dni = u.dni
+            WHERE i.fk_cliente_cuit = %s
+        """
+        params = [cuit]
+        if vendedor_dni: query += " AND i.fk_vendedor_dni = %s"; params.append(vendedor_dni)
+        if despues_de: query += " AND (i.fecha_interaccion, i.id) < (%s::timestamptz, %s)"; params.extend(despues_de)
+        query += " ORDER BY i.fecha_interaccion DESC, i.id DESC LIMIT %s"; params.append(limite + 1)
+        conn = None
+        try:
+            conn = get_db_connection(solo_lectura=True)
+            with conn.cursor(cursor_factory=DictCursor) as cur:
+                cur.execute(query, params)
+                return [dict(fila) for fila in cur.fetchall()]
+        except (Exception, psycopg2.DatabaseError) as error:
+            logger.error("Error al obtener el historial del cliente %s: %s", cuit, error)
+            raise error
+        finally:
+            if conn:
+                conn.rollback(); release_db_connection(conn)
+
+    # Marcas de ts_headline: la capa de servicio escapa el texto y recién después las convierte en negrita
+    BUSQUEDA_MARCA_INICIO, BUSQUEDA_MARCA_FIN = '\u27e6', '\u27e7'
+
+    @staticmethod
+    @trazado
+    def buscar_interacciones(texto: str, filters: dict, limite: int = 50):
+        """
+        Búsqueda de texto completo en respuesta_cliente, comentarios_venta y comentarios_cobranza
+        (columna generada busqueda + ix_interacciones_busqueda, sql/004). texto admite la sintaxis de
+        websearch_to_tsquery ("frase exacta", -excluir, or). Respeta los filtros del dashboard.
+        Ordena por relevancia (ts_rank_cd) y fecha; ts_headline, que relee el texto, se calcula
+        solo para las `limite` filas devueltas. coincidencias = total de filas que coinciden.
+        """
+        condiciones, params = _dashboard_filtros(filters)
+        query = f"""
+            WITH consulta AS (SELECT websearch_to_tsquery('crm_es', %s) AS q)
+            SELECT r.id, r.fecha_interaccion AT TIME ZONE 'America/Argentina/Buenos_Aires' AS fecha_interaccion,
+                   r.tipo_interaccion, r.venta_cerrada, r.rango, r.coincidencias,
+                   u.nombre AS vendedor_nombre, r.fk_cliente_cuit, c.razon_social AS cliente_razon_social,
+                   ts_headline('crm_es', concat_ws(E'\\n', r.respuesta_cliente, r.comentarios_venta, r.comentarios_cobranza), consulta.q,
+                               'StartSel={CrmRepository.BUSQUEDA_MARCA_INICIO}, StopSel={CrmRepository.BUSQUEDA_MARCA_FIN}, MaxFragments=3, MaxWords=18, MinWords=6, FragmentDelimiter=" … "') AS fragmento
+            FROM (
+                SELECT i.id, i.fecha_interaccion, i.tipo_interaccion, i.venta_cerrada, i.fk_vendedor_dni, i.fk_cliente_cuit,
+                       i.respuesta_cliente, i.comentarios_venta, i.comentarios_cobranza,
+                       ts_rank_cd(i.busqueda, consulta.q) AS rango, count(*) OVER () AS coincidencias
+                FROM interacciones_comerciales i, consulta
+                WHERE i.busqueda @@ consulta.q {condiciones}
+                ORDER BY rango DESC, i.fecha_interaccion DESC
+                LIMIT %s
+            ) r
+            CROSS JOIN consulta
+            JOIN users u ON r.fk_vendedor_dni = u.dni
+            JOIN cliente c ON r.fk_cliente_cuit = c.cuit
+            ORDER BY r.rango DESC, r.fecha_interaccion DESC
+        """
+        conn = None
+        try:
+            conn = get_db_connection(solo_lectura=True)
+            with conn.cursor(cursor_factory=DictCursor) as cur:
+                cur.execute(query, [texto] + params + [limite])
+                return [dict(fila) for fila in cur.fetchall()]
+        except (Exception, psycopg2.DatabaseError) as error:
+            logger.error("Error en la búsqueda de interacciones '%s': %s", texto, error)
+            raise error
+        finally:
+            if conn:
+                conn.rollback(); release_db_connection(conn)
+
+    @staticmethod
+    @trazado
+    def hay_interacciones_nuevas(vendedor_dni: str, ultimo_id: int, desde: str = None, excluidos: list = None) -> bool:
+        """
+        Chequeo barato del refresco del dashboard del vendedor: ¿hay interacciones suyas con id > ultimo_id
+        que no estén en excluidos (las ya contadas)? Con desde (fecha) usa el índice (vendedor, fecha) y
+        solo las particiones recientes.
+        """
+        conn = None
+        try:
+            conn = get_db_connection(solo_lectura=True)
+            with conn.cursor() as cur:
+                query = "SELECT EXISTS (SELECT 1 FROM interacciones_comerciales WHERE fk_vendedor_dni = %s AND id > %s"
+                params = [vendedor_dni, ultimo_id]
+                if desde: query += " AND fecha_interaccion >= %s"; params.append(desde)
+                if excluidos: query += " AND NOT (id = ANY(%s))"; params.append(list(excluidos))
+                cur.execute(query + ")", params)
+                return cur.fetchone()[0]
+        except (Exception, psycopg2.DatabaseError) as error:
+            logger.error("Error verificando interacciones nuevas de %s: %s", vendedor_dni, error)
+            raise error
+        finally:
+            if conn:
+                conn.rollback(); release_db_connection(conn)
+
+    @staticmethod
+    @trazado
+    def get_kpis_por_zona(filters: dict):
+        """
+        Interacciones, contactadas, cerradas, clientes y vendedores por zona del cliente ('Sin zona' si
+        no tiene). Ignora el filtro de zona: compara todas en el mismo período.
+        """
+        condiciones, params = _dashboard_filtros({**filters, 'zonaId': None})
+        query = f"""
+            SELECT z.id AS zona_id, coalesce(z.nombre, 'Sin zona') AS zona,
+                   count(*) AS interacciones,
+                   count(*) FILTER (WHERE i.llamada_concretada) AS contactadas,
+                   count(*) FILTER (WHERE i.venta_cerrada) AS cerradas,
+                   count(DISTINCT i.fk_cliente_cuit) AS clientes,
+                   count(DISTINCT i.fk_vendedor_dni) AS vendedores
+            FROM interacciones_comerciales i
+            JOIN cliente c ON i.fk_cliente_cuit = c.cuit
+            LEFT JOIN zona z ON c.zona_id = z.id
+            WHERE 1=1 {condiciones}
+            GROUP BY z.id, z.nombre
+            ORDER BY interacciones DESC
+        """
+        conn = None
+        try:
+            conn = get_db_connection(solo_lectura=True)
+            with conn.cursor(cursor_factory=DictCursor) as cur:
+                cur.execute(query, params)
+                return [dict(fila) for fila in cur.fetchall()]
+        except (Exception, psycopg2.DatabaseError) as error:
+            logger.error("Error al calcular los KPIs por zona: %s", error)
+            raise error
+        finally:
+            if conn:
+                conn.rollback(); release_db_connection(conn)
+
+    @staticmethod
+    @trazado
+    def get_zonas_para_dropdown():
+        """ Zonas (tabla zona, sql/005) para dropdowns. """
+        conn = None
+        try:
+            conn = get_db_connection(solo_lectura=True)
+            with conn.cursor(cursor_factory=DictCursor) as cur:
+                cur.execute("SELECT id, nombre FROM zona ORDER BY nombre ASC;")
+                return [dict(fila) for fila in cur.fetchall()]
+        except (Exception, psycopg2.DatabaseError) as error:
+             logger.error("Error Repo get_zonas_para_dropdown: %s", error)
+             return []
+        finally:
+            if conn:
+                conn.rollback(); release_db_connection(conn)
+
+    @staticmethod
+    @trazado
+    def get_version_seguimientos(vendedor_dni: str, desde):
+        """
+        (cantidad, id máximo, última fecha_interaccion) de los seguimientos del vendedor con fecha >= desde.
+        Index-only sobre ix_interacciones_seguimientos (sql/006): el feed ICS lo consulta en cada pedido
+        para decidir si responde 304 o si hay filas nuevas que agregar.
+        """
+        conn = None
+        try:
+            conn = get_db_connection(solo_lectura=True)
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT count(*), max(id), max(fecha_interaccion) FROM interacciones_comerciales
+                    WHERE fk_vendedor_dni = %s AND fecha_prox_seguimiento >= %s
+                """, (vendedor_dni, desde))
+                return cur.fetchone()
+        except (Exception, psycopg2.DatabaseError) as error:
+            logger.error("Error obteniendo la versión de seguimientos de %s: %s", vendedor_dni, error)
+            raise error
+        finally:
+            if conn:
+                conn.rollback(); release_db_connection(conn)
+
+    @staticmethod
+    @trazado
+    def get_seguimientos_calendario(vendedor_dni: str, desde, id_mayor_a: int = 0):
+        """ Seguimientos del vendedor con fecha >= desde (solo los de id > id_mayor_a): datos de cada evento del feed ICS. """
+        conn = None
+        try:
+            conn = get_db_connection(solo_lectura=True)
+            with conn.cursor(cursor_factory=DictCursor) as cur:
+                cur.execute("""
+                    SELECT i.id, i.fecha_interaccion, i.fecha_prox_seguimiento, i.llamada_concretada, i.respuesta_cliente,
+                           c.cuit AS cliente_cuit, c.razon_social AS cliente_razon_social
+                    FROM interacciones_comerciales i
+                    JOIN cliente c ON i.fk_cliente_cuit = c.cuit
+                    WHERE i.fk_vendedor_dni = %s AND i.fecha_prox_seguimiento >= %s AND i.id > %s
+                """, (vendedor_dni, desde, id_mayor_a))
+                return [dict(fila) for fila in cur.fetchall()]
+        except (Exception, psycopg2.DatabaseError) as error:
+            logger.error("Error obteniendo seguimientos para el calendario de %s: %s", vendedor_dni, error)
+            raise error
+        finally:
+            if conn:
+                conn.rollback(); release_db_connection(conn)
+
+    @staticmethod
+    @trazado
+    def get_seguimientos_sin_evento(vendedor_dni: str = None, limite: int = 5000):
+        """
+        Seguimientos futuros sin evento de Google Calendar (google_event_id NULL y sin rechazo definitivo, sql/007) de vendedores
+        con Calendar conectado y sin feed ICS (a esos el feed ya les muestra el seguimiento).
+        Ordenados por vendedor: cada lote de la reconciliación usa las credenciales de uno solo.
+        """
+        query = """
+            SELECT i.id, i.fecha_interaccion, i.fecha_prox_seguimiento, i.llamada_concretada, i.respuesta_cliente,
+                   i.fk_vendedor_dni, u.nombre AS vendedor_nombre, c.cuit AS cliente_cuit, c.razon_social AS cliente_razon_social
+            FROM interacciones_comerciales i
+            JOIN users u ON i.fk_vendedor_dni = u.dni
+            JOIN cliente c ON i.fk_cliente_cuit = c.cuit
+            WHERE i.google_event_id IS NULL AND i.google_event_error IS NULL AND i.fecha_prox_seguimiento >= now()
+              AND u.google_creds_json IS NOT NULL AND u.ics_token IS NULL
+        """
+        params = []
+        if vendedor_dni: query += " AND i.fk_vendedor_dni = %s"; params.append(vendedor_dni)
+        query += " ORDER BY i.fk_vendedor_dni, i.fecha_prox_seguimiento LIMIT %s"; params.append(limite)
+        conn = None
+        try:
+            conn = get_db_connection(solo_lectura=True)
+            with conn.cursor(cursor_factory=DictCursor) as cur:
+                cur.execute(query, params)
+                return [dict(fila) for fila in cur.fetchall()]
+        except (Exception, psycopg2.DatabaseError) as error:
+            logger.error("Error obteniendo seguimientos sin evento de Calendar: %s", error)
+            raise error
+        finally:
+            if conn:
+                conn.rollback(); release_db_connection(conn)
+
+    @staticmethod
+    @trazado
+    def set_google_event_ids(eventos: list):
+        """
+        Guarda el id de evento de Calendar de cada interacción: eventos = [(id, fecha_interaccion, event_id)].
+        fecha_interaccion acota el UPDATE a la partición de cada fila. No pisa un id ya guardado.
+        """
+        if not eventos: return 0
+        conn = None
+        try:
+            conn = get_db_connection()
+            with conn.cursor() as cur:
+                execute_values(cur, """
+                    UPDATE interacciones_comerciales i SET google_event_id = v.event_id
+                    FROM (VALUES %s) AS v (id, fecha_interaccion, event_id)
+                    WHERE i.id = v.id AND i.fecha_interaccion = v.fecha_interaccion AND i.google_event_id IS NULL
+                """, eventos, template="(%s::bigint, %s::timestamptz, %s::text)", page_size=len(eventos)) # Una sentencia: rowcount es el total
+                actualizadas = cur.rowcount
+            conn.commit()
+            return actualizadas
+        except (Exception, psycopg2.DatabaseError) as error:
+            if conn: conn.rollback()
+            logger.error("Error guardando ids de eventos de Calendar: %s", error)
+            raise error
+        finally:
+            if conn: release_db_connection(conn)
+
+    @staticmethod
+    @trazado
+    def set_google_event_errores(errores: list):
+        """
+        Marca los seguimientos que Calendar rechazó de forma definitiva: errores = [(id, fecha_interaccion, error)].
+        Salen de get_seguimientos_sin_evento; para reintentarlos hay que volver google_event_error a NULL.
+        """
+        if not errores: return 0
+        conn = None
+        try:
+            conn = get_db_connection()
+            with conn.cursor() as cur:
+                execute_values(cur, """
+                    UPDATE interacciones_comerciales i SET google_event_error = left(v.error, 1000)
+                    FROM (VALUES %s) AS v (id, fecha_interaccion, error)
+                    WHERE i.id = v.id AND i.fecha_interaccion = v.fecha_interaccion AND i.google_event_id IS NULL
+                """, errores, template="(%s::bigint, %s::timestamptz, %s::text)", page_size=len(errores)) # Una sentencia: rowcount es el total
+                actualizadas = cur.rowcount
+            conn.commit()
+            return actualizadas
+        except (Exception, psycopg2.DatabaseError) as error:
+            if conn: conn.rollback()
+            logger.error("Error guardando rechazos de eventos de Calendar: %s", error)
+            raise error
+        finally:
+            if conn: release_db_connection(conn)
+
+    @staticmethod
+    @trazado
     def get_clientes_para_dropdown():
         """ Obtiene lista de clientes para dropdowns. """
         conn = None
         try:
-            conn = get_db_connection()
+            conn = get_db_connection(solo_lectura=True)
             with conn.cursor(cursor_factory=DictCursor) as cur:
                 query = "SELECT cuit, razon_social FROM cliente ORDER BY razon_social ASC;"
                 cur.execute(query)
                 result = cur.fetchall()
-                # print(f"DEBUG (Repo): get_clientes_para_dropdown encontró {len(result) if result else 0} clientes.")
+                # logger.debug("get_clientes_para_dropdown encontró %s clientes.", len(result) if result else 0)
                 return result if result else []
         except (Exception, psycopg2.DatabaseError) as error:
-             print(f"Error Repo get_clientes_para_dropdown: {error}")
+             logger.error("Error Repo get_clientes_para_dropdown: %s", error)
              return []
         finally:
              if conn: release_db_connection(conn)
 
     @staticmethod
+    @trazado
     def sincronizar_clientes(clientes_erp: list[dict]):
-        # ... (código existente sin cambios) ...
-        pass
+        """
+        Upsert en bloque de los clientes del ERP (ErpService ya mapea 'documento').
+        Devuelve {'insertados', 'actualizados', 'omitidos'}; los que no cambiaron no cuentan como actualizados.
+        """
+        por_cuit = {}
+        for c in clientes_erp:
+            documento = ''.join(ch for ch in str(c.get('documento') or '') if ch.isdigit())
+            razon_social = (c.get('razon_social') or c.get('name') or c.get('nombre') or '').strip()
+            if not documento or not razon_social: continue
+            por_cuit[int(documento)] = (int(documento), razon_social, c.get('zona') or None) # Último gana si el ERP repite CUIT
+        omitidos = len(clientes_erp) - len(por_cuit) # Inválidos + duplicados dentro del lote
+        if not por_cuit: return {'insertados': 0, 'actualizados': 0, 'omitidos': omitidos}
+        conn = None
+        try:
+            conn = get_db_connection()
+            with conn.cursor() as cur:
+                filas = execute_values(cur, """
+                    INSERT INTO cliente (cuit, razon_social, zona) VALUES %s
+                    ON CONFLICT (cuit) DO UPDATE SET razon_social = EXCLUDED.razon_social, zona = COALESCE(EXCLUDED.zona, cliente.zona)
+                    WHERE (cliente.razon_social, cliente.zona) IS DISTINCT FROM (EXCLUDED.razon_social, COALESCE(EXCLUDED.zona, cliente.zona))
+                    RETURNING (xmax = 0) AS insertado
+                """, list(por_cuit.values()), page_size=1000, fetch=True)
+            if filas: publicar_invalidacion('clientes', conn=conn); publicar_invalidacion('dashboard', conn=conn); publicar_invalidacion('zonas', conn=conn) # Razón social en la tabla; el trigger puede crear zonas
+            conn.commit()
+            insertados = sum(1 for (insertado,) in filas if insertado)
+            return {'insertados': insertados, 'actualizados': len(filas) - insertados, 'omitidos': omitidos}
+        except (Exception, psycopg2.DatabaseError) as error:
+            if conn: conn.rollback()
+            logger.error("Error al sincronizar clientes del ERP: %s", error)
+            raise error
+        finally:
+            if conn: release_db_connection(conn)
 
     @staticmethod
     def find_or_create_cliente(conn, cuit: int, razon_social: str):
@@ -167,6 +1000,7 @@ class CrmRepository:
         pass
 
     @staticmethod
+    @trazado
     def get_proximos_seguimientos(conn, vendedor_dni: str):
         """ Obtiene próximos seguimientos para un vendedor. """
         try:
@@ -185,5 +1019,5 @@ class CrmRepository:
                 result = cur.fetchall()
                 return result if result else []
         except (Exception, psycopg2.DatabaseError) as error:
-            print(f"Error obteniendo próximos seguimientos para DNI {vendedor_dni}: {error}")
+            logger.error("Error obteniendo próximos seguimientos para DNI %s: %s", vendedor_dni, error)
             raise error
\ No newline at end of file
@@ -1,118 +1,272 @@
 # core/services.py
-import pandas as pd
-import requests
-from requests.auth import HTTPBasicAuth
-import os
-import json
+# pandas se importa dentro de las funciones que lo usan: importar este módulo (app, páginas,
+# scripts) no debe pagar su costo de carga hasta el primer dashboard.
 import psycopg2
-from core.db import get_db_connection, release_db_connection
+import json
+import os
+import re
+from array import array
+from core.db import get_db_connection, release_db_connection, marcar_escritura, cache_local, publicar_invalidacion
 from core.repository import CrmRepository, UserRepository
 from psycopg2.extras import DictCursor
-import traceback
+import logging
 from datetime import datetime as dt, timedelta
+from zoneinfo import ZoneInfo
 from flask_login import current_user
 # Asegúrate que el import relativo funcione según tu estructura
 from . import google_auth
+from core.calendario import CalendarioService
+from core.erp import ErpService # Re-export: ErpService vive en core/erp.py, sin dependencias de Dash/pandas
+from core.tracing import trazado
 
-# --- ERP Service ---
-class ErpService:
-    @staticmethod
-    def fetch_clientes_from_erp(filtros=None):
-        """ Obtiene clientes del ERP, devuelve lista vacía en error. """
-        url = os.getenv('ERP_API_URL'); user = os.getenv('ERP_API_USER'); pwd = os.getenv('ERP_API_PASSWORD')
-        if not url or not user or not pwd: print("[ErpService] Error: Faltan variables de entorno ERP."); return []
-        try:
-            response = requests.post( url, json={"params": {"filtros": filtros or {}}}, auth=HTTPBasicAuth(user, pwd), timeout=45 )
-            if response.status_code == 401: print("[ErpService] Error 401: Autenticación fallida."); return []
-            response.raise_for_status()
-            try: data = response.json()
-            except json.JSONDecodeError: print(f"[ErpService] Error: Respuesta ERP no JSON. Resp:\n{response.text[:500]}..."); return []
-            clientes = None;
-            if isinstance(data, dict): clientes = data.get('result') or data.get('clientes')
-            elif isinstance(data, list): clientes = data
-            if isinstance(clientes, list):
-                 clientes_mapeados = []
-                 for c in clientes:
-                     if isinstance(c, dict): clientes_mapeados.append({ **c, 'documento': c.get('numero_documento') or c.get('documento'), 'celular': c.get('mobile'), 'telefono': c.get('phone') })
-                 return clientes_mapeados
-            else: print(f"[ErpService] Advertencia: Respuesta JSON ERP sin lista. Resp: {data}"); return []
-        except requests.exceptions.Timeout: print(f"[ErpService] Error: Timeout ERP en {url}."); return []
-        except requests.exceptions.ConnectionError: print(f"[ErpService] Error: No se pudo conectar a ERP en {url}."); return []
-        except requests.exceptions.RequestException as e: print(f"[ErpService] Error HTTP/Red ERP: {e}"); return []
-        except Exception as e: print(f"[ErpService] Error inesperado ERP: {e}"); return []
+logger = logging.getLogger(__name__)
+
+ZONA_AR = ZoneInfo('America/Argentina/Buenos_Aires')
 
+# Caches por worker; las escrituras las invalidan en todos los workers (bus de core/db.py)
+_cache_dashboard = cache_local('dashboard', ttl=float(os.getenv('CACHE_DASHBOARD_SEG') or 30), max_entradas=200)
+_cache_clientes = cache_local('clientes', ttl=600)
+_cache_vendedores = cache_local('vendedores', ttl=600)
+_cache_zonas = cache_local('zonas', ttl=600)
 
 # --- CRM Service (ACTUALIZADO - Formato Fecha dd-mm HH:MM) ---
 class CrmService:
 
+    DASHBOARD_FILAS_TABLA = 50
+    # Los ids no se confirman en orden: una transacción con id menor puede hacer commit después de una con id
+    # mayor. Los refrescos incrementales revisan esta cantidad de ids por debajo del último visto y excluyen
+    # los ya contados, que viajan en marcas['recientes'].
+    VENTANA_IDS_REVISION = 500
+
+    @staticmethod
+    def _dashboard_vacio():
+        """ Dashboard sin datos; uno nuevo en cada llamada para que nadie modifique uno compartido. """
+        return { 'kpis': {'totalInteracciones': 0, 'tasaContacto': '0%', 'tasaCierreVenta': '0%', 'totalKgVendidos': 'N/A'}, 'conteos': {'total': 0, 'llamadasConcretadas': 0, 'ventasCerradas': 0}, 'marcas': {'ultimoId': 0, 'ultimaFecha': None, 'recientes': []}, 'graficos': {'motivosNoVenta': []}, 'ultimasInteracciones': [] }
+
     @staticmethod
     def get_dashboard(filters: dict):
         """
         Obtiene datos para el dashboard.
         MODIFICADO: Formatea fecha_interaccion como dd-mm HH:MM.
         """
-        conn = None
-        empty_dashboard = { 'kpis': {'totalInteracciones': 0, 'tasaContacto': '0%', 'tasaCierreVenta': '0%', 'totalKgVendidos': 'N/A'}, 'graficos': {'motivosNoVenta': []}, 'ultimasInteracciones': [] }
         try:
-            raw_data = CrmRepository.get_dashboard_data(filters)
-            if not raw_data: return empty_dashboard
-
-            dashboard_columns = ['id','fecha_interaccion','tipo_interaccion','llamada_concretada','respuesta_cliente','fecha_prox_seguimiento','venta_cerrada','motivo_no_venta','ofrecio_otros_precios','cliente_conoce_catalogo','le_llego_bien_pedido','comentarios_venta','cliente_informo_pago','reviso_cta_cte','comentarios_cobranza','fk_vendedor_dni','vendedor_nombre','vendedor_zona','fk_cliente_cuit','cliente_razon_social','cliente_zona']
-            df = pd.DataFrame(raw_data, columns=dashboard_columns)
-
-            expected_cols = {'llamada_concretada': (bool, False),'venta_cerrada': (bool, False),'tipo_interaccion': (str, 'Desconocido'),'motivo_no_venta': (str, None),'vendedor_nombre': (str, 'Desconocido'),'cliente_razon_social': (str, 'Desconocido'),'fecha_interaccion': ('datetime', pd.NaT),'fecha_prox_seguimiento': ('datetime', pd.NaT),'respuesta_cliente': (str, ''),'comentarios_venta': (str, '')}
-            for col, (dtype, default) in expected_cols.items():
-                if col not in df.columns: df[col] = default
-                else:
-                    if dtype == bool: df[col] = df[col].apply(lambda x: bool(x) if pd.notna(x) else False)
-                    elif dtype == str: fill_value = default if default is not None else ''; df[col] = df[col].fillna(fill_value).astype(str)
-                    elif dtype == 'datetime': df[col] = pd.to_datetime(df[col], errors='coerce')
-
-            total_interacciones = len(df); tasa_contacto = "N/A"
-            if not df.empty:
-                if 'llamada_concretada' in df.columns and df['llamada_concretada'].notna().any():
-                    tasa_contacto_val = df['llamada_concretada'].mean() * 100
-                    tasa_contacto = f"{tasa_contacto_val:.0f}%" if pd.notna(tasa_contacto_val) else "0%"
-                else: tasa_contacto = "0%"
-            tasa_cierre = "0%"
-            if not df.empty and 'venta_cerrada' in df.columns and df['venta_cerrada'].notna().any():
-                tasa_cierre_val = df['venta_cerrada'].mean() * 100
-                tasa_cierre = f"{tasa_cierre_val:.0f}%" if pd.notna(tasa_cierre_val) else "0%"
-            kpis = { 'totalInteracciones': total_interacciones, 'tasaContacto': tasa_contacto, 'tasaCierreVenta': tasa_cierre, 'totalKgVendidos': 'N/A' }
-
-            motivos_agg = pd.DataFrame(columns=['label', 'value'])
-            if 'venta_cerrada' in df.columns and 'motivo_no_venta' in df.columns:
-                 motivos_df = df[ (df['venta_cerrada'] == False) & (df['motivo_no_venta'].notna()) & (df['motivo_no_venta'] != '') & (df['motivo_no_venta'] != 'Desconocido') ]
-                 if not motivos_df.empty:
-                     motivos_df['motivo_no_venta_agg'] = motivos_df['motivo_no_venta'].fillna('Sin especificar')
-                     motivos_agg = motivos_df.groupby('motivo_no_venta_agg').size().reset_index(name='value').rename(columns={'motivo_no_venta_agg': 'label'}).sort_values(by='value', ascending=False)
+            # Lectura columnar (cursor server-side, sin DictRow por fila) -> DataFrame sin pasar por registros
+            clave = json.dumps(filters, sort_keys=True, default=str)
+            return _cache_dashboard.obtener(clave, lambda: CrmService.construir_dashboard(CrmRepository.get_dashboard_data_columnar(filters)))
+        except Exception as e: logger.exception("Error crítico al generar datos del dashboard: %s", e); return CrmService._dashboard_vacio()
+
+    @staticmethod
+    @trazado
+    def construir_dashboard(raw_data: dict):
+        """
+        KPIs, motivos y tabla a partir de los datos columnares del repositorio (ordenados por fecha DESC).
+        Todo vectorizado: KPIs y motivos sobre el total con dtypes nativos (bool/category);
+        el formato de display solo sobre las filas que se devuelven en la tabla.
+        """
+        if not raw_data or not raw_data.get('id'): return CrmService._dashboard_vacio()
+        import pandas as pd
+        df = pd.DataFrame(CrmService._columnas_numpy(raw_data), copy=False)
+
+        # NULL -> False vía el dtype nullable 'boolean' (sin apply por fila)
+        llamada_concretada = df['llamada_concretada'].astype('boolean').fillna(False).astype(bool)
+        venta_cerrada = df['venta_cerrada'].astype('boolean').fillna(False).astype(bool)
+        # Conteos crudos junto a los KPIs formateados: con ellos se suman interacciones nuevas sin recalcular todo
+        conteos = { 'total': len(df), 'llamadasConcretadas': int(llamada_concretada.sum()), 'ventasCerradas': int(venta_cerrada.sum()) }
+        kpis = CrmService._kpis(conteos)
+        # Hasta dónde llegan estos datos: el refresco incremental pide solo lo posterior
+        ultima_fecha = pd.to_datetime(df['fecha_interaccion'], errors='coerce').max()
+        ultimo_id = int(df['id'].max())
+        recientes = sorted(int(i) for i in df['id'][df['id'] > ultimo_id - CrmService.VENTANA_IDS_REVISION])
+        marcas = { 'ultimoId': ultimo_id, 'ultimaFecha': ultima_fecha.isoformat() if pd.notna(ultima_fecha) else None, 'recientes': recientes }
+
+        motivos = df['motivo_no_venta'].astype('category')
+        motivos = motivos[~venta_cerrada & motivos.notna() & (motivos != '') & (motivos != 'Desconocido')]
+        motivos_agg = motivos.value_counts()
+        motivos_agg = motivos_agg[motivos_agg > 0] # value_counts de category incluye categorías sin filas
+        motivos_no_venta = [{'label': label, 'value': int(value)} for label, value in motivos_agg.items()]
 
+        # --- Tabla: solo las filas visibles ---
+        top = df.head(CrmService.DASHBOARD_FILAS_TABLA)
+        fecha_interaccion = pd.to_datetime(top['fecha_interaccion'], errors='coerce')
+        comentarios = (top['respuesta_cliente'].fillna('').astype(str) + "\n" + top['comentarios_venta'].fillna('').astype(str)).str.strip()
+        df_final = pd.DataFrame({
+            'id': top['id'],
             # --- MODIFICACIÓN: Formatear fecha_interaccion como dd-mm HH:MM ---
-            df['fecha_interaccion_str'] = df['fecha_interaccion'].dt.strftime('%d-%m %H:%M').where(df['fecha_interaccion'].notna(), 'N/A')
-            # -----------------------------------------------------------------
-            df['comentarios_display'] = df['respuesta_cliente'].astype(str).fillna('') + "\n" + df['comentarios_venta'].astype(str).fillna('')
-            df['comentarios_display'] = df['comentarios_display'].str.strip().replace('\n\n', '\n').replace('\n', '<br>', regex=False)
-            df['venta_cerrada_display'] = df['venta_cerrada'].apply(lambda x: 'Sí' if x else 'No')
+            'fecha_interaccion': fecha_interaccion.dt.strftime('%d-%m %H:%M').where(fecha_interaccion.notna(), 'N/A'),
+            'tipo_interaccion': top['tipo_interaccion'].fillna('Desconocido').astype(str),
+            'vendedor_nombre': top['vendedor_nombre'].fillna('Desconocido').astype(str),
+            'cliente_razon_social': top['cliente_razon_social'].fillna('Desconocido').astype(str),
+            'venta_cerrada': venta_cerrada.head(CrmService.DASHBOARD_FILAS_TABLA).map({True: 'Sí', False: 'No'}),
+            'comentarios_venta': comentarios,
+        }).fillna('')
+        ultimas = df_final.to_dict('records')
 
-            columnas_tabla_final = {'fecha_interaccion_str': 'fecha_interaccion','tipo_interaccion': 'tipo_interaccion','vendedor_nombre': 'vendedor_nombre','cliente_razon_social': 'cliente_razon_social','venta_cerrada_display': 'venta_cerrada','comentarios_display': 'comentarios_venta'}
-            columnas_existentes_orig = [orig for orig in columnas_tabla_final.keys() if orig in df.columns]
-            df_final = df[columnas_existentes_orig].rename(columns=columnas_tabla_final).fillna('')
-            ultimas = df_final.head(50).to_dict('records')
+        return { 'kpis': kpis, 'conteos': conteos, 'marcas': marcas, 'graficos': { 'motivosNoVenta': motivos_no_venta }, 'ultimasInteracciones': ultimas }
+
+    @staticmethod
+    def _columnas_numpy(raw_data: dict) -> dict:
+        """ Columnas array.array del repositorio -> ndarray sobre el mismo buffer ('B' son bool 0/1); las listas pasan igual. """
+        import numpy as np
+        return {c: np.frombuffer(v, dtype=bool if v.typecode == 'B' else v.typecode) if isinstance(v, array) else v for c, v in raw_data.items()}
+
+    @staticmethod
+    def _kpis(conteos: dict):
+        total = conteos['total']; tasa = lambda n: f"{(n / total if total else 0) * 100:.0f}%"
+        return { 'totalInteracciones': total, 'tasaContacto': tasa(conteos['llamadasConcretadas']), 'tasaCierreVenta': tasa(conteos['ventasCerradas']), 'totalKgVendidos': 'N/A' }
+
+    @staticmethod
+    def aplicar_interacciones_nuevas(data: dict, eventos: list):
+        """
+        Suma al dashboard ya armado las interacciones recibidas por core.tiempo_real (payload de
+        _NOTIFICAR_INTERACCION_SQL): fila al principio de la tabla, conteos, KPIs y motivos.
+        Las ya contadas (la recarga completa les ganó) se ignoran: las de data['marcas']['recientes'] y las
+        anteriores a la ventana de revisión; sin marcas, las que están en la tabla.
+        """
+        if not data or 'conteos' not in data: return None
+        data = {**data, 'conteos': dict(data['conteos']), 'graficos': {**data.get('graficos', {})}}
+        ultimas = list(data.get('ultimasInteracciones') or []); marcas = data.get('marcas')
+        if marcas: vistas = set(marcas.get('recientes') or []); piso = (marcas.get('ultimoId') or 0) - CrmService.VENTANA_IDS_REVISION
+        else: vistas = {fila.get('id') for fila in ultimas}; piso = None
+        motivos = [dict(m) for m in data['graficos'].get('motivosNoVenta') or []]; nuevas = []
+        for ev in sorted(eventos or [], key=lambda e: e.get('fecha_interaccion') or ''):
+            if ev.get('id') in vistas or (piso is not None and (ev.get('id') or 0) <= piso): continue
+            vistas.add(ev.get('id')); nuevas.append(ev.get('id')); conteos = data['conteos']; venta = bool(ev.get('venta_cerrada'))
+            conteos['total'] += 1; conteos['llamadasConcretadas'] += bool(ev.get('llamada_concretada')); conteos['ventasCerradas'] += venta
+            motivo = ev.get('motivo_no_venta')
+            if not venta and motivo and motivo != 'Desconocido':
+                existente = next((m for m in motivos if m['label'] == motivo), None)
+                if existente: existente['value'] += 1
+                else: motivos.append({'label': motivo, 'value': 1})
+            try: fecha = dt.fromisoformat(ev['fecha_interaccion']).strftime('%d-%m %H:%M')
+            except (KeyError, TypeError, ValueError): fecha = 'N/A'
+            comentarios = f"{ev.get('respuesta_cliente') or ''}\n{ev.get('comentarios_venta') or ''}".strip()
+            ultimas.insert(0, {'id': ev.get('id'), 'fecha_interaccion': fecha, 'tipo_interaccion': ev.get('tipo_interaccion') or 'Desconocido', 'vendedor_nombre': ev.get('vendedor_nombre') or 'Desconocido', 'cliente_razon_social': ev.get('cliente_razon_social') or 'Desconocido', 'venta_cerrada': 'Sí' if venta else 'No', 'comentarios_venta': comentarios})
+        if not nuevas: return None
+        data['kpis'] = CrmService._kpis(data['conteos'])
+        data['graficos']['motivosNoVenta'] = sorted(motivos, key=lambda m: m['value'], reverse=True) # Mismo orden que value_counts
+        data['ultimasInteracciones'] = ultimas[:CrmService.DASHBOARD_FILAS_TABLA]
+        if marcas: data['marcas'] = CrmService._avanzar_marcas(marcas, nuevas)
+        return data
 
-            return { 'kpis': kpis, 'graficos': { 'motivosNoVenta': motivos_agg.to_dict('records') }, 'ultimasInteracciones': ultimas }
 
-        except Exception as e: print(f"[CrmService] Error crítico al generar datos del dashboard: {e}"); traceback.print_exc(); return empty_dashboard
-        finally: pass
+    TENDENCIAS_MAX_PUNTOS = 120
+
+    @staticmethod
+    def granularidad_tendencias(desde, hasta) -> str:
+        """ La unidad más fina que deja el rango en TENDENCIAS_MAX_PUNTOS períodos o menos. """
+        if not desde or not hasta: return 'month'
+        dias = (hasta - desde).days + 1
+        for granularidad, dias_periodo in (('day', 1), ('week', 7), ('month', 30.4), ('quarter', 91.3)):
+            if dias / dias_periodo <= CrmService.TENDENCIAS_MAX_PUNTOS: return granularidad
+        return 'year'
+
+    @staticmethod
+    @trazado
+    def get_tendencias(filters: dict, dimension: str = 'vendedor'):
+        """
+        Series de interacciones, tasa de contacto y tasa de cierre por período para los gráficos de tendencia.
+        El agrupamiento se hace en SQL; sin rango de fechas elegido se toma el de los datos.
+        """
+        def _calcular():
+            desde = dt.fromisoformat(filters['fechaDesde'][:10]).date() if filters.get('fechaDesde') else None
+            hasta = dt.fromisoformat(filters['fechaHasta'][:10]).date() if filters.get('fechaHasta') else None
+            if not desde or not hasta:
+                minima, maxima = CrmRepository.get_rango_fechas(filters)
+                if minima is None: return {'granularidad': None, 'puntos': []}
+                desde = desde or minima.date(); hasta = hasta or maxima.date()
+            granularidad = CrmService.granularidad_tendencias(desde, hasta)
+            puntos = [{'periodo': f['periodo'].date().isoformat(), 'serie': f['serie'], 'interacciones': f['interacciones'],
+                       'tasaContacto': round(f['contactadas'] * 100 / f['interacciones'], 1) if f['interacciones'] else 0,
+                       'tasaCierre': round(f['cerradas'] * 100 / f['interacciones'], 1) if f['interacciones'] else 0}
+                      for f in CrmRepository.get_tendencias(filters, granularidad, dimension)]
+            return {'granularidad': granularidad, 'puntos': puntos}
+        try: return _cache_dashboard.obtener(json.dumps({'tendencias': dimension, **filters}, sort_keys=True, default=str), _calcular)
+        except Exception as e: logger.exception("Error al calcular tendencias: %s", e); return {'granularidad': None, 'puntos': []}
+
+    @staticmethod
+    @trazado
+    def get_ranking_vendedores(filters: dict):
+        """ Tabla de ranking de vendedores para el período (cacheada por rango de fechas y cliente). """
+        clave = json.dumps({'ranking': True, 'fechaDesde': filters.get('fechaDesde'), 'fechaHasta': filters.get('fechaHasta'), 'clienteCuit': filters.get('clienteCuit'), 'zonaId': filters.get('zonaId')}, sort_keys=True, default=str)
+        def _calcular():
+            return [{**fila, 'tasa_contacto': float(fila['tasa_contacto']), 'tasa_cierre': float(fila['tasa_cierre'])} for fila in CrmRepository.get_ranking_vendedores(filters)]
+        try: return _cache_dashboard.obtener(clave, _calcular)
+        except Exception as e: logger.exception("Error al calcular el ranking de vendedores: %s", e); return []
 
+    BUSQUEDA_MAX_RESULTADOS = 50
 
     @staticmethod
+    @trazado
+    def buscar_interacciones(texto: str, filters: dict) -> dict:
+        """
+        Búsqueda en comentarios para el dashboard de gerencia: {'filas', 'total'}. 'fragmento' es markdown
+        (texto escapado, coincidencias en negrita) para una columna presentation='markdown'.
+        """
+        texto = (texto or '').strip()
+        if len(texto) < 2: return {'filas': [], 'total': 0}
+        try: filas = CrmRepository.buscar_interacciones(texto, filters or {}, CrmService.BUSQUEDA_MAX_RESULTADOS)
+        except Exception as e: logger.exception("Error buscando '%s': %s", texto, e); return {'filas': [], 'total': 0, 'error': True}
+        def _markdown(fragmento):
+            # Se escapa lo que escribió el usuario y después las marcas de ts_headline pasan a negrita
+            escapado = re.sub(r'([\\`*_{}\[\]()#+\-.!|~<>])', r'\\\1', fragmento or '')
+            return escapado.replace(CrmRepository.BUSQUEDA_MARCA_INICIO, '**').replace(CrmRepository.BUSQUEDA_MARCA_FIN, '**')
+        resultado = [{'id': f['id'], 'fecha_interaccion': f['fecha_interaccion'].strftime('%d-%m-%Y %H:%M') if f['fecha_interaccion'] else '', 'vendedor_nombre': f['vendedor_nombre'] or 'Desconocido', 'cliente_razon_social': f['cliente_razon_social'] or 'Desconocido', 'fk_cliente_cuit': f['fk_cliente_cuit'], 'tipo_interaccion': f['tipo_interaccion'] or 'Desconocido', 'venta_cerrada': 'Sí' if f['venta_cerrada'] else 'No', 'fragmento': _markdown(f['fragmento'])} for f in filas]
+        return {'filas': resultado, 'total': filas[0]['coincidencias'] if filas else 0}
+
+    @staticmethod
+    @trazado
+    def get_kpis_por_zona(filters: dict):
+        """ KPIs por zona del cliente para el período (cacheados sin el filtro de zona, que no aplica). """
+        clave = json.dumps({'zonas': True, **filters, 'zonaId': None}, sort_keys=True, default=str)
+        def _calcular():
+            tasa = lambda n, total: round(n * 100 / total, 1) if total else 0
+            return [{'zona_id': f['zona_id'], 'zona': f['zona'], 'interacciones': f['interacciones'], 'tasa_contacto': tasa(f['contactadas'], f['interacciones']), 'tasa_cierre': tasa(f['cerradas'], f['interacciones']), 'clientes': f['clientes'], 'vendedores': f['vendedores']} for f in CrmRepository.get_kpis_por_zona(filters)]
+        try: return _cache_dashboard.obtener(clave, _calcular)
+        except Exception as e: logger.exception("Error al calcular los KPIs por zona: %s", e); return []
+
+    HISTORIAL_FILAS_PAGINA = 50
+
+    @staticmethod
+    @trazado
+    def get_resumen_cliente(cuit: int, vendedor_dni: str = None):
+        """ Encabezado de la vista 360 del cliente: datos, totales, tasas y motivos de no-venta (de vendedor_dni si se indica). """
+        try: r = CrmRepository.get_resumen_cliente(cuit, vendedor_dni)
+        except Exception as e: logger.exception("Error obteniendo resumen del cliente %s: %s", cuit, e); return None
+        if not r: return None
+        fecha = lambda f: f.strftime('%d-%m-%Y') if f else 'N/A'; tasa = lambda n: f"{(n / r['interacciones'] if r['interacciones'] else 0) * 100:.0f}%"
+        return {'cuit': r['cuit'], 'razonSocial': r['razon_social'], 'zona': r['zona'], 'interacciones': r['interacciones'], 'tasaContacto': tasa(r['contactadas']), 'tasaCierre': tasa(r['cerradas']), 'seguimientosPendientes': r['seguimientos_pendientes'], 'primeraInteraccion': fecha(r['primera_interaccion']), 'ultimaInteraccion': fecha(r['ultima_interaccion']), 'motivosNoVenta': r['motivos_no_venta'] or []}
+
+    @staticmethod
+    @trazado
+    def get_historial_cliente(cuit: int, cursor: dict = None, vendedor_dni: str = None):
+        """
+        Página del historial del cliente ya formateada y el cursor de la siguiente (None al llegar al final).
+        El cursor guarda fecha_interaccion completa (con zona) e id de la última fila: es la clave del keyset.
+        """
+        despues_de = (cursor['fecha'], cursor['id']) if cursor else None
+        filas = CrmRepository.get_historial_cliente(cuit, despues_de, CrmService.HISTORIAL_FILAS_PAGINA, vendedor_dni)
+        hay_mas = len(filas) > CrmService.HISTORIAL_FILAS_PAGINA; filas = filas[:CrmService.HISTORIAL_FILAS_PAGINA]
+        formato = lambda f: f.strftime('%d-%m-%Y %H:%M') if f else ''; si_no = lambda v: 'Sí' if v else 'No'
+        pagina = [{'id': f['id'], 'fecha_interaccion': formato(f['fecha_interaccion']), 'vendedor_nombre': f['vendedor_nombre'] or 'Desconocido', 'tipo_interaccion': f['tipo_interaccion'] or 'Desconocido', 'llamada_concretada': si_no(f['llamada_concretada']), 'venta_cerrada': si_no(f['venta_cerrada']), 'motivo_no_venta': f['motivo_no_venta'] or '', 'fecha_prox_seguimiento': formato(f['fecha_prox_seguimiento']), 'comentarios': "\n".join(t for t in (f['respuesta_cliente'], f['comentarios_venta'], f['comentarios_cobranza']) if t)} for f in filas]
+        siguiente = {'fecha': filas[-1]['cursor_fecha'].isoformat(), 'id': filas[-1]['id']} if hay_mas else None
+        return {'filas': pagina, 'cursor': siguiente}
+
+    @staticmethod
+    @trazado
     def get_clientes_dropdown():
-        try: result = CrmRepository.get_clientes_para_dropdown(); return result if isinstance(result, list) else []
-        except Exception as e: print(f"[CrmService] Error obteniendo clientes dropdown: {e}"); return []
+        # El repositorio devuelve [] ante errores: una lista vacía no se cachea
+        try: result = _cache_clientes.obtener('todos', lambda: CrmRepository.get_clientes_para_dropdown() or None); return result if isinstance(result, list) else []
+        except Exception as e: logger.error("Error obteniendo clientes dropdown: %s", e); return []
 
     @staticmethod
-    def registrar_interaccion(input_data_from_callback: dict, vendedor_dni: str):
-        # ... (lógica sin cambios) ...
+    @trazado
+    def get_zonas_dropdown():
+        try: return _cache_zonas.obtener('todas', lambda: CrmRepository.get_zonas_para_dropdown() or None) or []
+        except Exception as e: logger.error("Error obteniendo zonas dropdown: %s", e); return []
+
+    @staticmethod
+    def validar_interaccion(input_data_from_callback: dict) -> dict:
+        """ Valida y normaliza los datos de una interacción (formulario o importación). Lanza ValueError. """
         cuit = input_data_from_callback.get('clienteCuit'); razon_social = input_data_from_callback.get('clienteRazonSocial') or ""
         interaccion_ok = input_data_from_callback.get('llamadaConcretada', False); venta_cerrada = input_data_from_callback.get('ventaCerrada', False)
         motivo_no_venta = input_data_from_callback.get('motivoNoVenta'); respuesta_cliente = input_data_from_callback.get('respuestaCliente') or ""
@@ -120,42 +274,62 @@ class CrmService:
         if not cuit or cuit <= 0: raise ValueError("El CUIT del cliente es inválido.")
         if not razon_social.strip(): raise ValueError("La Razón Social del cliente es obligatoria.")
         if interaccion_ok and not venta_cerrada and not motivo_no_venta and not respuesta_cliente.strip() and not com_venta.strip(): raise ValueError("Si la interacción se concretó pero no se cerró la venta, debe indicar un motivo o agregar un comentario.")
-        input_data_repo = {'clienteCuit': cuit, 'clienteRazonSocial': razon_social,'tipoInteraccion': input_data_from_callback.get('tipoInteraccion'),'llamadaConcretada': bool(interaccion_ok),'respuestaCliente': respuesta_cliente or None,'fechaProxSeguimiento': fecha_prox_dt,'ventaCerrada': bool(venta_cerrada) if interaccion_ok else False,'motivoNoVenta': motivo_no_venta if interaccion_ok and not venta_cerrada else None,'ofrecioOtrosPrecios': bool(input_data_from_callback.get('ofrecioOtrosPrecios', False)) if interaccion_ok and not venta_cerrada else False,'clienteConoceCatalogo': bool(input_data_from_callback.get('clienteConoceCatalogo', False)) if interaccion_ok else False,'leLlegoBienPedido': bool(input_data_from_callback.get('leLlegoBienPedido', False)) if interaccion_ok else False,'comentariosVenta': com_venta or None if interaccion_ok else None,'clienteInformoPago': bool(input_data_from_callback.get('clienteInformoPago', False)) if interaccion_ok else False,'revisoCtaCte': bool(input_data_from_callback.get('revisoCtaCte', False)) if interaccion_ok else False,'comentariosCobranza': input_data_from_callback.get('comentariosCobranza') or None if interaccion_ok else None}
+        input_data_repo = {'clienteCuit': cuit, 'clienteRazonSocial': razon_social,'tipoInteraccion': input_data_from_callback.get('tipoInteraccion'),'llamadaConcretada': bool(interaccion_ok),'respuestaCliente': respuesta_cliente or None,'fechaProxSeguimiento': fecha_prox_dt,'ventaCerrada': bool(venta_cerrada) if interaccion_ok else False,'motivoNoVenta': motivo_no_venta if interaccion_ok and not venta_cerrada else None,'ofrecioOtrosPrecios': bool(input_data_from_callback.get('ofrecioOtrosPrecios', False)) if interaccion_ok and not venta_cerrada else False,'clienteConoceCatalogo': bool(input_data_from_callback.get('clienteConoceCatalogo', False)) if interaccion_ok else False,'leLlegoBienPedido': bool(input_data_from_callback.get('leLlegoBienPedido', False)) if interaccion_ok else False,'comentariosVenta': com_venta or None if interaccion_ok else None,'clienteInformoPago': bool(input_data_from_callback.get('clienteInformoPago', False)) if interaccion_ok else False,'revisoCtaCte': bool(input_data_from_callback.get('revisoCtaCte', False)) if interaccion_ok else False,'comentariosCobranza': input_data_from_callback.get('comentariosCobranza') or None if interaccion_ok else None,'idempotencyKey': input_data_from_callback.get('idempotencyKey') or None}
+        return input_data_repo
+
+    @staticmethod
+    @trazado
+    def registrar_interaccion(input_data_from_callback: dict, vendedor_dni: str):
+        # ... (lógica sin cambios) ...
+        input_data_repo = CrmService.validar_interaccion(input_data_from_callback)
+        cuit = input_data_repo['clienteCuit']; razon_social = input_data_repo['clienteRazonSocial']
+        interaccion_ok = input_data_repo['llamadaConcretada']; respuesta_cliente = input_data_from_callback.get('respuestaCliente') or ""
+        fecha_prox_dt = input_data_repo['fechaProxSeguimiento']
         conn = None; nueva_interaccion = None
         try:
-            conn = get_db_connection(); conn.autocommit = False
-            CrmRepository.find_or_create_cliente(conn, cuit, razon_social)
-            nueva_interaccion = CrmRepository.create_interaccion(conn, input_data_repo, vendedor_dni)
-            conn.commit(); print("Interacción guardada en base de datos.")
-            if nueva_interaccion and fecha_prox_dt: # Quitada condición interaccion_ok
-                print(f"Intentando crear evento de Google Calendar para seguimiento en {fecha_prox_dt}...")
+            # Cliente + interacción en una sola sentencia preparada; el pool ya entrega conexiones transaccionales
+            conn = get_db_connection()
+            nueva_interaccion = CrmRepository.create_interaccion_con_cliente(conn, input_data_repo, vendedor_dni)
+            if nueva_interaccion and nueva_interaccion['insertada']: publicar_invalidacion('dashboard', conn=conn) # En todos los workers
+            if nueva_interaccion and nueva_interaccion['cliente_creado']: publicar_invalidacion('clientes', conn=conn) # Solo si el alta creó el cliente
+            conn.commit(); marcar_escritura() # Read-your-writes: el dashboard del vendedor lee de la primaria por unos segundos
+            if nueva_interaccion and not nueva_interaccion['insertada']:
+                # Reintento/doble click con la misma clave: la fila ya existía y su evento ya se intentó crear.
+                logger.info("Interacción %s ya registrada (clave de idempotencia repetida). Se omite Calendar.", nueva_interaccion['id'])
+                return nueva_interaccion
+            logger.debug("Interacción %s guardada en base de datos.", nueva_interaccion['id'])
+            if nueva_interaccion and fecha_prox_dt and CalendarioService.feed_activo(vendedor_dni):
+                logger.debug("Seguimiento de %s publicado por su feed ICS: no se llama a Google Calendar.", vendedor_dni)
+            elif nueva_interaccion and fecha_prox_dt: # Quitada condición interaccion_ok
+                logger.debug("Creando evento de Google Calendar para seguimiento en %s", fecha_prox_dt)
                 try:
                     creds_json = google_auth.load_google_credentials(vendedor_dni)
                     if creds_json:
                         service = google_auth.build_calendar_service(creds_json)
                         if service:
-                            event_summary = f"Seguimiento Cliente: {razon_social}"; user_nombre = current_user.nombre if current_user and hasattr(current_user, 'nombre') else 'Usuario desconocido'
-                            desc_prefix = "Próximo contacto agendado" if interaccion_ok else "Intentar contactar nuevamente" # Descripción condicional
-                            event_description = f"{desc_prefix} con {razon_social} ({cuit}).\nRegistrado por: {user_nombre}\n---\nÚltima respuesta/obs: {respuesta_cliente}"
-                            start_time = fecha_prox_dt.isoformat(); end_time = (fecha_prox_dt + timedelta(minutes=30)).isoformat()
-                            event_body = {'summary': event_summary,'description': event_description,'start': {'dateTime': start_time, 'timeZone': 'America/Argentina/Buenos_Aires'},'end': {'dateTime': end_time, 'timeZone': 'America/Argentina/Buenos_Aires'},'reminders': {'useDefault': False, 'overrides': [{'method': 'popup', 'minutes': 15}]}}
-                            google_auth.create_calendar_event(service, event_body)
-                        else: print(f"WARN: No se pudo construir el servicio de Google Calendar para {vendedor_dni}.")
-                    else: print(f"INFO: Usuario {vendedor_dni} no tiene credenciales de Google Calendar conectadas.")
-                except Exception as cal_error: print(f"Error al intentar crear evento de Google Calendar para {vendedor_dni}: {cal_error}"); traceback.print_exc()
-            else: print("DEBUG CrmService.registrar_interaccion - Condiciones no cumplidas para crear evento (No hay fecha o fallo guardado DB).")
+                            user_nombre = current_user.nombre if current_user and hasattr(current_user, 'nombre') else 'Usuario desconocido'
+                            fila = {'id': nueva_interaccion['id'], 'cliente_razon_social': razon_social, 'cliente_cuit': cuit, 'llamada_concretada': interaccion_ok,
+                                    'respuesta_cliente': respuesta_cliente, 'fecha_prox_seguimiento': fecha_prox_dt}
+                            evento = google_auth.create_calendar_event(service, CalendarioService.evento_google(fila, user_nombre))
+                            # Con el id guardado, reconciliar_calendario.py no lo vuelve a enviar; si esto falla, el id determinístico da 409 allá
+                            CrmRepository.set_google_event_ids([(nueva_interaccion['id'], nueva_interaccion['fecha_interaccion'], evento.get('id'))])
+                        else: logger.warning("No se pudo construir el servicio de Google Calendar para %s.", vendedor_dni)
+                    else: logger.debug("Usuario %s no tiene credenciales de Google Calendar conectadas.", vendedor_dni)
+                except Exception as cal_error: logger.exception("Error al intentar crear evento de Google Calendar para %s: %s", vendedor_dni, cal_error)
             return nueva_interaccion
         except (Exception, psycopg2.DatabaseError) as error:
-             if conn: conn.rollback(); print(f"[CrmService] Error DB al registrar interacción: {error}"); raise psycopg2.DatabaseError("Error al guardar en la base de datos.") from error
+             if conn: conn.rollback(); logger.error("Error DB al registrar interacción: %s", error); raise psycopg2.DatabaseError("Error al guardar en la base de datos.") from error
         finally:
-             if conn: conn.autocommit = True; release_db_connection(conn)
+             if conn: release_db_connection(conn)
 
     @staticmethod
+    @trazado
     def get_vendedores_dropdown():
-        # ... (sin cambios) ...
         conn = None;
-        try: conn = get_db_connection(); return UserRepository.get_vendedores(conn)
-        except Exception as e: print(f"[CrmService] Error obteniendo vendedores dropdown: {e}"); return []
+        def _consultar():
+            nonlocal conn; conn = get_db_connection(solo_lectura=True); return [dict(v) for v in UserRepository.get_vendedores(conn)] or None
+        try: return _cache_vendedores.obtener('todos', _consultar) or []
+        except Exception as e: logger.error("Error obteniendo vendedores dropdown: %s", e); return []
         finally:
             if conn: release_db_connection(conn)
 
@@ -163,36 +337,89 @@ class CrmService:
     def sincronizar_clientes_erp(clientes_erp: list[dict]):
         # ... (sin cambios) ...
         try: resultado = CrmRepository.sincronizar_clientes(clientes_erp); return resultado
-        except (Exception, psycopg2.DatabaseError) as error: print(f"[CrmService] Error al orquestar sincronización ERP: {error}"); raise error
+        except (Exception, psycopg2.DatabaseError) as error: logger.error("Error al orquestar sincronización ERP: %s", error); raise error
+
+    @staticmethod
+    def _seguimiento(fecha_obj, cliente_razon_social, respuesta_cliente):
+        """ Fila de la tabla de seguimientos; fecha_orden (hora de Argentina) ordena sin depender del formato dd-mm. """
+        fecha_formateada = 'N/A'; fecha_orden = ''
+        if fecha_obj and isinstance(fecha_obj, dt):
+            if fecha_obj.tzinfo: fecha_orden = fecha_obj.astimezone(ZONA_AR).replace(tzinfo=None).isoformat()
+            else: fecha_orden = fecha_obj.isoformat()
+            try:
+                # --- MODIFICACIÓN: Formato dd-mm HH:MM ---
+                fecha_formateada = fecha_obj.strftime('%d-%m %H:%M')
+                # ----------------------------------------
+            except ValueError: pass
+        return {'fecha_prox_seguimiento': fecha_formateada, 'fecha_orden': fecha_orden, 'cliente_razon_social': str(cliente_razon_social or 'N/A'), 'respuesta_cliente': str(respuesta_cliente or '')}
 
     @staticmethod
+    @trazado
     def get_datos_vendedor(vendedor_dni: str):
         """
         Obtiene los datos específicos para el dashboard del vendedor.
         MODIFICADO: Formatea fecha/hora con dd-mm HH:MM.
+        Incluye 'marcas' (último id, última fecha y el día de los seguimientos) para get_delta_vendedor.
         """
         conn = None; empty_vendedor_data = { "kpis": {}, "ultimas_interacciones": [], "proximos_seguimientos": [] }
         try:
-            conn = get_db_connection(); filtros_vendedor = {'vendedorDni': vendedor_dni}
+            conn = get_db_connection(solo_lectura=True); filtros_vendedor = {'vendedorDni': vendedor_dni}
             datos_generales = CrmService.get_dashboard(filtros_vendedor) # Ya formatea fecha_interaccion dd-mm HH:MM
             proximos_seguimientos_raw = CrmRepository.get_proximos_seguimientos(conn, vendedor_dni)
-            proximos_seguimientos = []
-            if proximos_seguimientos_raw:
-                for seg in proximos_seguimientos_raw:
-                    fecha_formateada = 'N/A'; fecha_obj = seg.get('fecha_prox_seguimiento')
-                    if fecha_obj and isinstance(fecha_obj, dt):
-                        try:
-                            # --- MODIFICACIÓN: Formato dd-mm HH:MM ---
-                            fecha_formateada = fecha_obj.strftime('%d-%m %H:%M')
-                            # ----------------------------------------
-                        except ValueError: pass
-                    proximos_seguimientos.append({'fecha_prox_seguimiento': fecha_formateada,'cliente_razon_social': str(seg.get('cliente_razon_social', 'N/A')),'respuesta_cliente': str(seg.get('respuesta_cliente', ''))})
-            datos_completos = {"kpis": datos_generales.get('kpis', {}),"ultimas_interacciones": datos_generales.get('ultimasInteracciones', []),"proximos_seguimientos": proximos_seguimientos}
+            proximos_seguimientos = [CrmService._seguimiento(seg.get('fecha_prox_seguimiento'), seg.get('cliente_razon_social', 'N/A'), seg.get('respuesta_cliente', '')) for seg in proximos_seguimientos_raw or []]
+            marcas = {**datos_generales.get('marcas', {'ultimoId': 0, 'ultimaFecha': None}), 'dia': dt.now(ZONA_AR).date().isoformat()}
+            datos_completos = {"kpis": datos_generales.get('kpis', {}), "conteos": datos_generales.get('conteos'), "ultimas_interacciones": datos_generales.get('ultimasInteracciones', []), "proximos_seguimientos": proximos_seguimientos, "marcas": marcas}
             return datos_completos
-        except Exception as e: print(f"Error obteniendo datos para vendedor {vendedor_dni}: {e}"); traceback.print_exc(); return empty_vendedor_data
+        except Exception as e: logger.exception("Error obteniendo datos para vendedor %s: %s", vendedor_dni, e); return empty_vendedor_data
         finally:
             if conn: release_db_connection(conn)
 
+    @staticmethod
+    @trazado
+    def get_delta_vendedor(vendedor_dni: str, marcas: dict):
+        """
+        Refresco periódico del dashboard del vendedor a partir de las marcas que ya tiene el navegador.
+        None si no hay nada nuevo (un EXISTS por índice); {'completo': datos} si cambió el día (los
+        seguimientos vencidos hay que sacarlos) o no hay marcas; si no, {'interacciones', 'seguimientos', 'marcas'}
+        con solo las filas nuevas. Las interacciones no se editan: nuevas = id mayor al último visto menos
+        VENTANA_IDS_REVISION (commits fuera de orden de id) que no esté entre las ya contadas (marcas['recientes']).
+        """
+        hoy = dt.now(ZONA_AR).date()
+        if not marcas or marcas.get('dia') != hoy.isoformat(): return {'completo': CrmService.get_datos_vendedor(vendedor_dni)}
+        # Un día de margen sobre la última fecha vista: cubre diferencias de zona horaria y altas con fecha apenas anterior
+        desde = (dt.fromisoformat(marcas['ultimaFecha']).date() - timedelta(days=1)).isoformat() if marcas.get('ultimaFecha') else None
+        piso = max((marcas.get('ultimoId') or 0) - CrmService.VENTANA_IDS_REVISION, 0); contadas = marcas.get('recientes') or []
+        if not CrmRepository.hay_interacciones_nuevas(vendedor_dni, piso, desde, contadas): return None
+        columnas = CrmRepository.get_dashboard_data_columnar({'vendedorDni': vendedor_dni, 'fechaDesde': desde, 'idMayorA': piso, 'idsExcluidos': contadas})
+        filas = [dict(zip(columnas, valores)) for valores in zip(*columnas.values())] if columnas else []
+        if not filas: return None
+        # Solo los campos que usa aplicar_interacciones_nuevas (mismo formato que el payload de NOTIFY)
+        campos = ('id', 'tipo_interaccion', 'llamada_concretada', 'venta_cerrada', 'motivo_no_venta', 'respuesta_cliente', 'comentarios_venta', 'vendedor_nombre', 'cliente_razon_social')
+        # Las columnas bool llegan como 0/1 (array 'B'): se normalizan al mismo JSON que el payload de NOTIFY
+        interacciones = [{**{c: f.get(c) for c in campos}, 'llamada_concretada': bool(f.get('llamada_concretada')), 'venta_cerrada': bool(f.get('venta_cerrada')), 'fecha_interaccion': f['fecha_interaccion'].isoformat() if f.get('fecha_interaccion') else None} for f in filas]
+        seguimientos = [CrmService._seguimiento(f['fecha_prox_seguimiento'], f.get('cliente_razon_social'), f.get('respuesta_cliente')) for f in filas if f.get('fecha_prox_seguimiento') and f['fecha_prox_seguimiento'].date() >= hoy]
+        fechas = [f['fecha_interaccion'] for f in interacciones if f['fecha_interaccion']] + ([marcas['ultimaFecha']] if marcas.get('ultimaFecha') else [])
+        marcas = CrmService._avanzar_marcas({**marcas, 'ultimaFecha': max(fechas) if fechas else None}, [f['id'] for f in filas])
+        return {'interacciones': interacciones, 'seguimientos': seguimientos, 'marcas': marcas}
+
+    @staticmethod
+    def _avanzar_marcas(marcas: dict, ids: list) -> dict:
+        """ Marcas después de contar ids: último id y los contados dentro de la ventana de revisión. """
+        ultimo_id = max([marcas.get('ultimoId') or 0] + list(ids))
+        recientes = sorted({i for i in list(marcas.get('recientes') or []) + list(ids) if i > ultimo_id - CrmService.VENTANA_IDS_REVISION})
+        return {**marcas, 'ultimoId': ultimo_id, 'recientes': recientes}
+
+    @staticmethod
+    def aplicar_delta_vendedor(data: dict, delta: dict):
+        """ Suma al store del dashboard del vendedor lo devuelto por get_delta_vendedor. """
+        if not delta: return None
+        if 'completo' in delta: return delta['completo']
+        if not data or not data.get('conteos'): return None # Store de una versión anterior: que recargue entero
+        base = {'kpis': data.get('kpis', {}), 'conteos': data['conteos'], 'graficos': {}, 'ultimasInteracciones': data.get('ultimas_interacciones', [])}
+        nuevo = CrmService.aplicar_interacciones_nuevas(base, delta.get('interacciones', [])) or base
+        seguimientos = sorted((data.get('proximos_seguimientos') or []) + delta.get('seguimientos', []), key=lambda s: s.get('fecha_orden') or '')
+        return {**data, 'kpis': nuevo['kpis'], 'conteos': nuevo['conteos'], 'ultimas_interacciones': nuevo['ultimasInteracciones'], 'proximos_seguimientos': seguimientos, 'marcas': delta['marcas']}
+
 # --- UserRepository (sin cambios) ---
 class UserRepository:
     @staticmethod
@@ -205,6 +432,7 @@ class UserRepository:
                 cur.execute("SELECT 1 FROM users WHERE email = %s OR dni = %s", (email, dni));
                 if cur.fetchone(): raise ValueError('Email o DNI ya existen')
                 cur.execute( """ INSERT INTO users (dni, nombre, email, password_hash, zona, rol) VALUES (%s, %s, %s, %s, %s, %s) """, (dni, nombre, email, hashed_password, zona, rol) );
+                publicar_invalidacion('usuarios', dni, conn=conn); publicar_invalidacion('vendedores', conn=conn); publicar_invalidacion('zonas', conn=conn)
                 conn.commit(); return {"email": email}
         except (Exception, psycopg2.DatabaseError) as error:
             if conn: conn.rollback(); raise error
@@ -218,4 +446,4 @@ class UserRepository:
             with conn.cursor(cursor_factory=DictCursor) as cur:
                 query = "SELECT dni, nombre FROM users WHERE rol = 'vendedor' ORDER BY nombre ASC;"; cur.execute(query);
                 result = cur.fetchall(); return result if result else []
-        except (Exception, psycopg2.DatabaseError) as error: print(f"Error al obtener lista de vendedores: {error}"); raise error
\ No newline at end of file
+        except (Exception, psycopg2.DatabaseError) as error: logger.error("Error al obtener lista de vendedores: %s", error); raise error
\ No newline at end of file
@@ -0,0 +1,74 @@
+# core/tiempo_real.py
+# Push de interacciones nuevas a los dashboards de gerencia abiertos (Server-Sent Events).
+# CrmRepository hace NOTIFY en CANAL dentro de la transacción que inserta la interacción
+# (Postgres lo entrega solo si hay commit). El hilo de LISTEN de cada worker (bus de core/db.py)
+# pasa cada aviso a _repartir, que lo reparte entre los streams abiertos cuyos filtros coinciden.
+# Cada stream abierto ocupa un hilo del worker mientras dura: requiere workers con threads
+# (p.ej. gunicorn -k gthread --threads 8) y un tope de streams por worker menor que --threads, para
+# que siempre queden hilos para los demás requests. Pasado el tope el stream recibe 503 y el dashboard
+# pasa a recargarse cada GERENCIA_RESPALDO_SEG (assets/tiempo_real.js). Configuración por entorno:
+#   TIEMPO_REAL_MAX_CONEXIONES  streams simultáneos por worker (default 4; el resto recibe 503)
+#   TIEMPO_REAL_HEARTBEAT_SEG   comentario SSE de keep-alive (default 15)
+import json
+import logging
+import os
+import queue
+import threading
+from core.db import escuchar, iniciar_escucha
+
+CANAL = 'crm_interacciones'
+MAX_CONEXIONES = int(os.getenv('TIEMPO_REAL_MAX_CONEXIONES') or 4)
+HEARTBEAT_SEG = float(os.getenv('TIEMPO_REAL_HEARTBEAT_SEG') or 15)
+
+logger = logging.getLogger(__name__)
+
+_suscriptores = {} # cola -> filtros del dashboard
+_suscriptores_lock = threading.Lock()
+
+
+def coincide(evento: dict, filtros: dict) -> bool:
+    """ Mismo criterio que _dashboard_query: vendedor, cliente, zona del cliente y rango de fechas (días en hora de Argentina). """
+    if filtros.get('vendedorDni') and evento['vendedor_dni'] != filtros['vendedorDni']: return False
+    if filtros.get('clienteCuit') and str(evento['cliente_cuit']) != str(filtros['clienteCuit']): return False
+    if filtros.get('zonaId') and str(evento.get('cliente_zona_id')) != str(filtros['zonaId']): return False
+    dia = (evento.get('fecha_interaccion') or '')[:10]
+    if filtros.get('fechaDesde') and dia < filtros['fechaDesde'][:10]: return False
+    if filtros.get('fechaHasta') and dia > filtros['fechaHasta'][:10]: return False
+    return True
+
+
+def _repartir(payload: str):
+    try: evento = json.loads(payload)
+    except ValueError: logger.warning("Aviso de %s con payload inválido: %.200s", CANAL, payload); return
+    with _suscriptores_lock: destinos = [cola for cola, filtros in _suscriptores.items() if coincide(evento, filtros)]
+    for cola in destinos:
+        try: cola.put_nowait(evento)
+        except queue.Full: logger.debug("Stream sin consumir: se descarta la interacción %s", evento.get('id'))
+
+
+def suscribir(filtros: dict):
+    """ Cola que recibe las interacciones nuevas que coinciden con filtros; None si el worker está al límite. """
+    with _suscriptores_lock:
+        if len(_suscriptores) >= MAX_CONEXIONES: return None
+        cola = queue.Queue(maxsize=100); _suscriptores[cola] = dict(filtros)
+    iniciar_escucha() # Lazy: cada worker abre su LISTEN con el primer uso
+    return cola
+
+
+def desuscribir(cola):
+    with _suscriptores_lock: _suscriptores.pop(cola, None)
+
+
+def stream_eventos(cola):
+    """ Generador SSE para flask.Response. Al cortarse la conexión, el heartbeat falla y se libera la suscripción. """
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try: evento = cola.get(timeout=HEARTBEAT_SEG)
+            except queue.Empty: yield ": ping\n\n"; continue
+            yield f"event: interaccion\ndata: {json.dumps(evento, ensure_ascii=False, default=str)}\n\n"
+    finally:
+        desuscribir(cola)
+
+
+escuchar(CANAL, _repartir)
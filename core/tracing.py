@@ -0,0 +1,188 @@
+# core/tracing.py
+# Trazas livianas por request: un span raíz por request (en Dash, uno por callback disparado)
+# con spans anidados para User.get, queries del repositorio, transformaciones y llamadas HTTP
+# externas (ERP, Calendar). Solo usa la librería estándar.
+# Configuración por entorno:
+#   TRACE_SAMPLE_RATE    fracción de requests trazados (0 a 1, default 0 = desactivado). Sin muestrear,
+#                        cada span cuesta una lectura de ContextVar.
+#   TRACE_EXPORT         'archivo' (default, JSON por línea en TRACE_FILE) u 'otlp' (OTLP/HTTP JSON)
+#   TRACE_FILE           default traces.jsonl
+#   TRACE_OTLP_ENDPOINT  default http://localhost:4318/v1/traces
+#   TRACE_SERVICE_NAME   default seguimiento-clientes
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE') or 0)
+EXPORT = os.getenv('TRACE_EXPORT', 'archivo')
+TRACE_FILE = os.getenv('TRACE_FILE', 'traces.jsonl')
+OTLP_ENDPOINT = os.getenv('TRACE_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces')
+SERVICE_NAME = os.getenv('TRACE_SERVICE_NAME', 'seguimiento-clientes')
+
+logger = logging.getLogger(__name__)
+_span_actual = ContextVar('span_actual', default=None)
+_cola = queue.Queue(maxsize=1000)
+_exportador = None
+_exportador_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ('nombre', 'trace_id', 'span_id', 'parent_id', 'inicio', 'fin', 'atributos', 'error', '_spans', '_token')
+
+    def __init__(self, nombre, padre=None, atributos=None):
+        self.nombre = nombre
+        self.trace_id = padre.trace_id if padre else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = padre.span_id if padre else None
+        self._spans = padre._spans if padre else [] # Todos los spans de la traza, se exportan juntos al cerrar la raíz
+        self.atributos = dict(atributos or {}); self.error = None; self.inicio = time.time_ns(); self.fin = None; self._token = None
+
+    def set(self, clave, valor): self.atributos[clave] = valor
+
+    def __enter__(self):
+        self._token = _span_actual.set(self); return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None: self.error = f"{exc_type.__name__}: {exc}"
+        terminar(self); return False
+
+    def a_dict(self):
+        return {'trace_id': self.trace_id, 'span_id': self.span_id, 'parent_id': self.parent_id, 'nombre': self.nombre,
+                'inicio_ns': self.inicio, 'duracion_ms': round((self.fin - self.inicio) / 1e6, 3), 'atributos': self.atributos, 'error': self.error}
+
+
+class _SpanNulo:
+    """ Span que no registra nada: lo que se devuelve cuando el request no fue muestreado. """
+    __slots__ = ()
+    def set(self, clave, valor): pass
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+_SPAN_NULO = _SpanNulo()
+
+
+def iniciar_traza(nombre: str, **atributos):
+    """ Span raíz con muestreo de cabecera: la decisión se toma acá y la heredan todos los hijos. """
+    if not SAMPLE_RATE or random.random() >= SAMPLE_RATE: return None
+    raiz = Span(nombre, atributos=atributos); raiz._token = _span_actual.set(raiz)
+    return raiz
+
+
+def terminar(span_):
+    """ Cierra un span (y si es la raíz, encola la traza completa para exportar). """
+    if span_ is None or span_.fin is not None: return
+    span_.fin = time.time_ns()
+    if span_._token is not None:
+        try: _span_actual.reset(span_._token)
+        except ValueError: _span_actual.set(None) # Raíz cerrada en otro contexto (p.ej. teardown de un stream)
+        span_._token = None
+    span_._spans.append(span_)
+    if span_.parent_id is None: _encolar(span_._spans)
+
+
+def span(nombre: str, **atributos):
+    """ Span hijo del span activo; sin traza activa devuelve un span nulo. Uso: with span('erp.post', pagina=1): ... """
+    padre = _span_actual.get()
+    if padre is None: return _SPAN_NULO
+    return Span(nombre, padre, atributos)
+
+
+def trazado(func):
+    """ Decorador: un span con el __qualname__ de la función por cada llamada (bajo @staticmethod). """
+    nombre = func.__qualname__
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        padre = _span_actual.get()
+        if padre is None: return func(*args, **kwargs)
+        with Span(nombre, padre): return func(*args, **kwargs)
+    return wrapper
+
+
+def instrumentar_flask(server):
+    """ Abre un span raíz por request. En /_dash-update-component el nombre es el output del callback. """
+    if not SAMPLE_RATE: return
+    from flask import g, request
+
+    @server.before_request
+    def _iniciar_traza_request():
+        nombre = f"{request.method} {request.path}"
+        if request.path.endswith('/_dash-update-component'):
+            payload = request.get_json(silent=True) or {} # Flask cachea el JSON: Dash no lo vuelve a parsear
+            nombre = f"callback {payload.get('output', '?')}"
+        g._traza = iniciar_traza(nombre, **{'http.method': request.method, 'http.path': request.path})
+
+    @server.after_request
+    def _atributos_respuesta(response):
+        raiz = g.get('_traza')
+        if raiz is not None:
+            raiz.set('http.status', response.status_code)
+            # Tamaño del JSON serializado: junto con los spans hijos separa cálculo de serialización
+            if response.content_length is not None: raiz.set('http.bytes_respuesta', response.content_length)
+        return response
+
+    @server.teardown_request
+    def _terminar_traza_request(exc):
+        raiz = g.pop('_traza', None)
+        if raiz is not None:
+            if exc is not None: raiz.error = f"{type(exc).__name__}: {exc}"
+            terminar(raiz)
+
+
+# --- Exportación (hilo aparte: el request nunca espera por disco ni red) ---
+
+def _encolar(spans):
+    global _exportador
+    if _exportador is None:
+        with _exportador_lock:
+            if _exportador is None:
+                _exportador = threading.Thread(target=_exportar_loop, name='trace-exporter', daemon=True); _exportador.start()
+    try: _cola.put_nowait(spans)
+    except queue.Full: pass # Bajo presión se descartan trazas antes que frenar requests
+
+
+def _exportar_loop():
+    while True:
+        lote = [_cola.get()]
+        while len(lote) < 100:
+            try: lote.append(_cola.get_nowait())
+            except queue.Empty: break
+        try:
+            if EXPORT == 'otlp': _exportar_otlp([s for traza in lote for s in traza])
+            else: _exportar_archivo([s for traza in lote for s in traza])
+        except Exception as e:
+            logger.error("Error exportando %s trazas: %s", len(lote), e)
+
+
+def _exportar_archivo(spans):
+    with open(TRACE_FILE, 'a', encoding='utf-8') as f:
+        for s in spans: f.write(json.dumps(s.a_dict(), ensure_ascii=False, default=str) + '\n')
+
+
+def _valor_otlp(valor):
+    if isinstance(valor, bool): return {'boolValue': valor}
+    if isinstance(valor, int): return {'intValue': str(valor)}
+    if isinstance(valor, float): return {'doubleValue': valor}
+    return {'stringValue': str(valor)}
+
+
+def _exportar_otlp(spans):
+    import urllib.request
+    otlp_spans = [{
+        'traceId': s.trace_id, 'spanId': s.span_id, **({'parentSpanId': s.parent_id} if s.parent_id else {}),
+        'name': s.nombre, 'kind': 2 if s.parent_id is None else 1,
+        'startTimeUnixNano': str(s.inicio), 'endTimeUnixNano': str(s.fin),
+        'attributes': [{'key': k, 'value': _valor_otlp(v)} for k, v in s.atributos.items()],
+        'status': {'code': 2, 'message': s.error} if s.error else {'code': 0},
+    } for s in spans]
+    body = {'resourceSpans': [{
+        'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}}]},
+        'scopeSpans': [{'scope': {'name': 'core.tracing'}, 'spans': otlp_spans}],
+    }]}
+    req = urllib.request.Request(OTLP_ENDPOINT, data=json.dumps(body, default=str).encode('utf-8'), headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=5) as resp: resp.read()
@@ -0,0 +1,46 @@
+# importar_interacciones.py
+# Importa interacciones históricas desde un CSV o Excel (.xlsx).
+#   python importar_interacciones.py llamadas_2023.csv
+#   python importar_interacciones.py llamadas.xlsx --hoja "Enero" --rechazos rechazos.csv
+# Columnas obligatorias: fecha_interaccion, vendedor_dni, cliente_cuit, cliente_razon_social.
+# Opcionales: las mismas del formulario (tipo_interaccion, llamada_concretada, venta_cerrada, ...).
+import sys
+import os
+import time
+import argparse
+from dotenv import load_dotenv
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+if script_dir not in sys.path:
+    sys.path.append(script_dir)
+
+from core.db import init_db_pool
+from core.logs import configurar_logging
+from core.importacion import ImportacionService
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importación masiva de interacciones históricas.")
+    parser.add_argument('archivo', help="Ruta al .csv o .xlsx")
+    parser.add_argument('--rechazos', help="Ruta del reporte de filas rechazadas (default: <archivo>_rechazos.csv)")
+    parser.add_argument('--hoja', help="Hoja de Excel a importar (default: la activa)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    configurar_logging()
+    if not init_db_pool():
+        print("ERROR: No se pudo inicializar el pool de base de datos."); sys.exit(1)
+
+    print(f"--- Importando {args.archivo} ---")
+    inicio = time.perf_counter()
+    resumen = ImportacionService.importar_interacciones(args.archivo, ruta_rechazos=args.rechazos, hoja=args.hoja)
+    print(f"   Filas leídas:      {resumen['leidas']}")
+    print(f"   Importadas:        {resumen['importadas']}")
+    print(f"   Ya existentes:     {resumen['duplicadas']}")
+    print(f"   Rechazadas:        {resumen['rechazadas']} (ver {resumen['reporte_rechazos']})")
+    print(f"   Clientes creados:  {resumen['clientes_creados']}")
+    print(f"   Tiempo:            {time.perf_counter() - inicio:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
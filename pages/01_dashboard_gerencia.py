@@ -1,14 +1,21 @@
 # pages/01_dashboard_gerencia.py
 import dash
-from dash import dcc, html, callback, Input, Output, State, dash_table, ctx, no_update
+import logging
+import os
+from dash import dcc, html, callback, clientside_callback, ClientsideFunction, Input, Output, State, dash_table, ctx, no_update
 import dash_bootstrap_components as dbc
-import plotly.express as px
 from flask_login import current_user
 from core.services import CrmService
-import pandas as pd
+from core.tracing import trazado, span
 import re
+from urllib.parse import urlencode
 from unidecode import unidecode
 
+logger = logging.getLogger(__name__)
+
+# Sin stream (worker al límite de TIEMPO_REAL_MAX_CONEXIONES o conexión caída) el dashboard se recarga con este intervalo
+RESPALDO_SEG = float(os.getenv('GERENCIA_RESPALDO_SEG') or 60)
+
 dash.register_page(
     __name__,
     path='/dashboard-gerencia',
@@ -25,7 +32,7 @@ filtros_layout = dbc.Card(dbc.CardBody([
                 id='filtro-vendedor-gerencia', placeholder='Filtrar por Vendedor...', options=[], clearable=True,
                 className="h-100"
             ),
-            md=4,
+            md=3,
             id='col-filtro-vendedor-gerencia' # ID Mantenido
         ),
         dbc.Col(
@@ -33,7 +40,14 @@ filtros_layout = dbc.Card(dbc.CardBody([
                 id='filtro-cliente-gerencia', placeholder='Filtrar por Cliente...', options=[], clearable=True,
                 className="h-100"
             ),
-             md=4
+             md=3
+        ),
+        dbc.Col(
+            dcc.Dropdown(
+                id='filtro-zona-gerencia', placeholder='Filtrar por Zona...', options=[], clearable=True,
+                className="h-100"
+            ),
+             md=2
         ),
         dbc.Col(
             dcc.DatePickerRange(
@@ -46,7 +60,10 @@ filtros_layout = dbc.Card(dbc.CardBody([
     align="stretch",
     className="g-2"
     ),
-    dbc.Button("Aplicar Filtros Generales", id='btn-aplicar-filtros-gerencia', color="primary", className="mt-3")
+    dbc.Button("Aplicar Filtros Generales", id='btn-aplicar-filtros-gerencia', color="primary", className="mt-3"),
+    # Descargas en stream desde /exportar-interacciones (ruta Flask en app.py), con los filtros seleccionados
+    dbc.Button("Exportar CSV", id='btn-exportar-csv-gerencia', href="/exportar-interacciones?formato=csv", external_link=True, color="secondary", outline=True, className="mt-3 ms-2"),
+    dbc.Button("Exportar Parquet", id='btn-exportar-parquet-gerencia', href="/exportar-interacciones?formato=parquet", external_link=True, color="secondary", outline=True, className="mt-3 ms-2"),
 ]))
 
 # --- Layout de KPIs ---
@@ -61,6 +78,69 @@ graficos_layout = dbc.Row([
     dbc.Col(dcc.Graph(id='grafico-motivos-no-venta-gerencia'), md=12),
 ])
 
+# --- Layout de Tendencias (agrupadas en SQL; la granularidad sale del rango de fechas) ---
+tendencias_layout = dbc.Card(dbc.CardBody([
+    dbc.Row([
+        dbc.Col(html.H4("Tendencias", className="mb-0"), md=3),
+        dbc.Col(dcc.RadioItems(id='tendencias-dimension-gerencia', options=[{'label': ' Por vendedor', 'value': 'vendedor'}, {'label': ' Por tipo', 'value': 'tipo'}],
+                               value='vendedor', inline=True, inputStyle={'margin-left': '10px'}), md=4),
+        dbc.Col(dcc.RadioItems(id='tendencias-metrica-gerencia', options=[{'label': ' Interacciones', 'value': 'interacciones'}, {'label': ' Tasa contacto', 'value': 'tasaContacto'}, {'label': ' Tasa cierre', 'value': 'tasaCierre'}],
+                               value='interacciones', inline=True, inputStyle={'margin-left': '10px'}), md=5),
+    ], align="center"),
+    dcc.Graph(id='grafico-tendencias-gerencia'),
+]))
+
+# --- Layout Ranking de Vendedores (una consulta para todos, en el período filtrado) ---
+ranking_layout = dbc.Row(dbc.Col(dash_table.DataTable(
+    id='tabla-ranking-gerencia',
+    columns=[
+        {"name": "Vendedor", "id": "nombre"},
+        {"name": "Interacciones", "id": "interacciones", "type": "numeric"}, {"name": "#", "id": "puesto_interacciones", "type": "numeric"},
+        {"name": "Tasa Contacto %", "id": "tasa_contacto", "type": "numeric"}, {"name": "#", "id": "puesto_contacto", "type": "numeric"},
+        {"name": "Tasa Cierre %", "id": "tasa_cierre", "type": "numeric"}, {"name": "#", "id": "puesto_cierre", "type": "numeric"},
+        {"name": "Clientes", "id": "clientes", "type": "numeric"},
+        {"name": "Seguim. Vencidos", "id": "seguimientos_vencidos", "type": "numeric"}, {"name": "#", "id": "puesto_seguimientos", "type": "numeric"},
+    ],
+    data=[], page_size=15, sort_action="native", style_as_list_view=True, style_table={'overflowX': 'auto'},
+    style_cell={'textAlign': 'left', 'padding': '5px'},
+    style_cell_conditional=[{'if': {'column_id': c}, 'color': 'gray', 'width': '40px'} for c in ('puesto_interacciones', 'puesto_contacto', 'puesto_cierre', 'puesto_seguimientos')],
+    style_header={'backgroundColor': 'rgb(230, 230, 230)', 'fontWeight': 'bold'},
+), width=12))
+
+# --- Layout KPIs por Zona (zona del cliente; compara todas las zonas en el período filtrado) ---
+zonas_layout = dbc.Row(dbc.Col(dash_table.DataTable(
+    id='tabla-zonas-gerencia',
+    columns=[
+        {"name": "Zona", "id": "zona"}, {"name": "Interacciones", "id": "interacciones", "type": "numeric"},
+        {"name": "Tasa Contacto %", "id": "tasa_contacto", "type": "numeric"}, {"name": "Tasa Cierre %", "id": "tasa_cierre", "type": "numeric"},
+        {"name": "Clientes", "id": "clientes", "type": "numeric"}, {"name": "Vendedores", "id": "vendedores", "type": "numeric"},
+    ],
+    data=[], page_size=10, sort_action="native", style_as_list_view=True, style_table={'overflowX': 'auto'},
+    style_cell={'textAlign': 'left', 'padding': '5px'},
+    style_header={'backgroundColor': 'rgb(230, 230, 230)', 'fontWeight': 'bold'},
+), width=12))
+
+# --- Layout Búsqueda en comentarios (texto completo en Postgres, sobre toda la historia filtrada) ---
+busqueda_layout = dbc.Card(dbc.CardBody([
+    dbc.Row([
+        dbc.Col(dbc.Input(id='busqueda-gerencia', type='search', debounce=True, placeholder='Buscar en comentarios: cheque "pago parcial" -transferencia'), md=8),
+        dbc.Col(html.Small(id='busqueda-gerencia-resumen', className="text-muted"), md=4),
+    ], align="center", className="mb-2"),
+    dash_table.DataTable(
+        id='tabla-busqueda-gerencia',
+        columns=[
+            {"name": "Fecha", "id": "fecha_interaccion"}, {"name": "Vendedor", "id": "vendedor_nombre"},
+            {"name": "Cliente", "id": "cliente_razon_social"}, {"name": "Tipo", "id": "tipo_interaccion"},
+            {"name": "Venta", "id": "venta_cerrada"}, {"name": "Coincidencias", "id": "fragmento", "presentation": "markdown"},
+        ],
+        data=[], page_size=10, style_as_list_view=True, style_table={'overflowX': 'auto'},
+        style_cell={'textAlign': 'left', 'padding': '5px', 'minWidth': '80px', 'maxWidth': '180px', 'overflow': 'hidden', 'textOverflow': 'ellipsis'},
+        style_cell_conditional=[{'if': {'column_id': 'fragmento'}, 'maxWidth': '500px', 'whiteSpace': 'normal'},
+                                {'if': {'column_id': 'fecha_interaccion'}, 'minWidth': '140px'}],
+        style_header={'backgroundColor': 'rgb(230, 230, 230)', 'fontWeight': 'bold'},
+    ),
+]))
+
 # --- Layout Tabla ---
 columnas_tabla_base_gerencia = [
     {"name": "Fecha", "id": "fecha_interaccion"}, # Se formatea con AM/PM en CrmService
@@ -102,9 +182,17 @@ def layout():
     children = [
         dcc.Store(id='dashboard-gerencia-data-store'),
         dcc.Store(id='initial-load-trigger-gerencia'),
-        html.H1("Dashboard Gerencia"),
+        # Push de interacciones nuevas (assets/tiempo_real.js + /stream/interacciones)
+        dcc.Store(id='dashboard-gerencia-filtros-aplicados'),
+        dcc.Store(id='dashboard-gerencia-eventos'),
+        dcc.Interval(id='intervalo-respaldo-gerencia', interval=int(RESPALDO_SEG * 1000), disabled=True), # Lo activa tiempo_real.js
+        dcc.Store(id='dashboard-gerencia-tendencias-store'),
+        html.H1(["Dashboard Gerencia ", html.Small(id='dashboard-gerencia-en-vivo', className="badge bg-success fs-6 align-middle")]),
         filtros_layout,
-        html.Hr(), kpis_layout, html.Hr(), graficos_layout, html.Hr(),
+        html.Hr(), kpis_layout, html.Hr(), graficos_layout, html.Hr(), tendencias_layout, html.Hr(),
+        html.H3("Ranking de Vendedores"), ranking_layout, html.Hr(),
+        html.H3("KPIs por Zona"), zonas_layout, html.Hr(),
+        html.H3("Búsqueda en Comentarios"), busqueda_layout, html.Hr(),
         html.H3("Últimas Interacciones (General)"), tabla_layout
     ]
     return dbc.Container(children, fluid=True)
@@ -121,28 +209,65 @@ def cargar_opciones_vendedores(initial_trigger):
         options = [{'label': v['nombre'], 'value': v['dni']} for v in vendedores]
         return options
     except Exception as e:
-        print(f"Error cargando vendedores: {e}")
+        logger.error("Error cargando vendedores: %s", e)
         return []
 
 @callback( Output('filtro-cliente-gerencia', 'options'), Input('initial-load-trigger-gerencia', 'data') )
 def cargar_opciones_clientes_gerencia(initial_trigger):
     try: return [{'label': f"{c['razon_social']} ({c['cuit']})", 'value': c['cuit']} for c in CrmService.get_clientes_dropdown()]
-    except Exception as e: print(f"Error cargando clientes: {e}"); return []
+    except Exception as e: logger.error("Error cargando clientes: %s", e); return []
+
+@callback( Output('filtro-zona-gerencia', 'options'), Input('initial-load-trigger-gerencia', 'data') )
+def cargar_opciones_zonas_gerencia(initial_trigger):
+    return [{'label': z['nombre'], 'value': z['id']} for z in CrmService.get_zonas_dropdown()]
 
 @callback(
-    Output('dashboard-gerencia-data-store', 'data'),
+    Output('dashboard-gerencia-data-store', 'data'), Output('dashboard-gerencia-filtros-aplicados', 'data'),
     Input('initial-load-trigger-gerencia', 'data'),
-    Input('btn-aplicar-filtros-gerencia', 'n_clicks'),
-    State('filtro-vendedor-gerencia', 'value'), State('filtro-cliente-gerencia', 'value'),
+    Input('btn-aplicar-filtros-gerencia', 'n_clicks'), Input('intervalo-respaldo-gerencia', 'n_intervals'),
+    State('filtro-vendedor-gerencia', 'value'), State('filtro-cliente-gerencia', 'value'), State('filtro-zona-gerencia', 'value'),
     State('filtro-fechas-gerencia', 'start_date'), State('filtro-fechas-gerencia', 'end_date'),
+    State('dashboard-gerencia-filtros-aplicados', 'data'),
 )
-def cargar_datos_dashboard_gerencia(initial_trigger, n_clicks_filter, vendedor_dni, cliente_cuit, fecha_desde, fecha_hasta):
+def cargar_datos_dashboard_gerencia(initial_trigger, n_clicks_filter, n_respaldo, vendedor_dni, cliente_cuit, zona_id, fecha_desde, fecha_hasta, aplicados):
     trigger_id = ctx.triggered_id
+    if trigger_id == 'intervalo-respaldo-gerencia':
+        # Recarga periódica sin stream: los filtros aplicados, sin tocar el store de filtros (reabriría el stream)
+        return (CrmService.get_dashboard(aplicados), no_update) if aplicados is not None else (no_update, no_update)
     if trigger_id is None or trigger_id == 'btn-aplicar-filtros-gerencia':
-        filters = {'vendedorDni': vendedor_dni, 'clienteCuit': cliente_cuit, 'fechaDesde': fecha_desde, 'fechaHasta': fecha_hasta}
+        filters = {'vendedorDni': vendedor_dni, 'clienteCuit': cliente_cuit, 'zonaId': zona_id, 'fechaDesde': fecha_desde, 'fechaHasta': fecha_hasta}
         data = CrmService.get_dashboard(filters) # Devuelve fechas formateadas AM/PM
-        return data
-    return no_update
+        return data, filters
+    return no_update, no_update
+
+# Abre (o reabre con los filtros nuevos) el stream de interacciones; los lotes recibidos llegan a 'dashboard-gerencia-eventos'
+clientside_callback(
+    ClientsideFunction(namespace='tiempo_real', function_name='conectar'),
+    Output('dashboard-gerencia-en-vivo', 'children'),
+    Input('dashboard-gerencia-filtros-aplicados', 'data'),
+)
+
+@callback(
+    Output('dashboard-gerencia-data-store', 'data', allow_duplicate=True),
+    Input('dashboard-gerencia-eventos', 'data'),
+    State('dashboard-gerencia-data-store', 'data'),
+    prevent_initial_call=True
+)
+def sumar_interacciones_nuevas_gerencia(eventos, data):
+    # Solo la fila y los KPIs nuevos: sin volver a correr la consulta completa del dashboard
+    if not eventos or not data: return no_update
+    return CrmService.aplicar_interacciones_nuevas(data, eventos) or no_update
+
+@callback(
+    Output('btn-exportar-csv-gerencia', 'href'), Output('btn-exportar-parquet-gerencia', 'href'),
+    Input('filtro-vendedor-gerencia', 'value'), Input('filtro-cliente-gerencia', 'value'), Input('filtro-zona-gerencia', 'value'),
+    Input('filtro-fechas-gerencia', 'start_date'), Input('filtro-fechas-gerencia', 'end_date'),
+)
+def actualizar_links_exportacion(vendedor_dni, cliente_cuit, zona_id, fecha_desde, fecha_hasta):
+    filtros = {'vendedorDni': vendedor_dni, 'clienteCuit': cliente_cuit, 'zonaId': zona_id, 'fechaDesde': fecha_desde, 'fechaHasta': fecha_hasta}
+    query = {k: v for k, v in filtros.items() if v}
+    return (f"/exportar-interacciones?{urlencode({'formato': 'csv', **query})}",
+            f"/exportar-interacciones?{urlencode({'formato': 'parquet', **query})}")
 
 @callback(
     Output('kpi-total-interacciones-gerencia', 'children'), Output('kpi-tasa-contacto-gerencia', 'children'),
@@ -169,21 +294,83 @@ def actualizar_graficos_gerencia(data):
     graficos = data['graficos']
     motivos_data = graficos.get('motivosNoVenta')
     if motivos_data:
-        fig_motivos = px.pie(motivos_data, names='label', values='value', title="Motivos de No-Venta")
-        fig_motivos.update_traces(textposition='inside', textinfo='percent+label')
-        # Ajustes de layout para leyenda y márgenes
-        fig_motivos.update_layout(
-            legend=dict(orientation="h", yanchor="bottom", y=-0.2, xanchor="center", x=0.5),
-            margin=dict(l=20, r=20, t=50, b=20)
-        )
+        with span('plotly.figura_motivos'):
+            import plotly.express as px # Diferido: plotly.express es lo más pesado de importar de la página
+            fig_motivos = px.pie(motivos_data, names='label', values='value', title="Motivos de No-Venta")
+            fig_motivos.update_traces(textposition='inside', textinfo='percent+label')
+            # Ajustes de layout para leyenda y márgenes
+            fig_motivos.update_layout(
+                legend=dict(orientation="h", yanchor="bottom", y=-0.2, xanchor="center", x=0.5),
+                margin=dict(l=20, r=20, t=50, b=20)
+            )
     else:
         fig_motivos = empty_fig
         fig_motivos['layout']['annotations'][0]['text'] = 'No hay datos de Motivos'
     return fig_motivos
 
 
+@callback(
+    Output('dashboard-gerencia-tendencias-store', 'data'),
+    Input('dashboard-gerencia-filtros-aplicados', 'data'), Input('tendencias-dimension-gerencia', 'value'),
+)
+def cargar_tendencias_gerencia(filters, dimension):
+    if filters is None or not current_user.is_authenticated or current_user.rol != 'gerente': return no_update
+    return CrmService.get_tendencias(filters, dimension or 'vendedor')
+
+@callback(
+    Output('grafico-tendencias-gerencia', 'figure'),
+    Input('dashboard-gerencia-tendencias-store', 'data'), Input('tendencias-metrica-gerencia', 'value'),
+)
+def actualizar_grafico_tendencias_gerencia(tendencias, metrica):
+    # Cambiar de métrica no vuelve a consultar: el store ya trae las tres
+    if not tendencias or not tendencias.get('puntos'):
+        return {'data': [], 'layout': {'xaxis': {'visible': False}, 'yaxis': {'visible': False}, 'annotations': [{'text': 'No hay datos', 'xref': 'paper', 'yref': 'paper', 'showarrow': False, 'font': {'size': 16}}]}}
+    titulos = {'interacciones': "Interacciones", 'tasaContacto': "Tasa de contacto (%)", 'tasaCierre': "Tasa de cierre (%)"}
+    unidades = {'day': 'día', 'week': 'semana', 'month': 'mes', 'quarter': 'trimestre', 'year': 'año'}
+    with span('plotly.figura_tendencias'):
+        import plotly.express as px
+        fig = px.line(tendencias['puntos'], x='periodo', y=metrica, color='serie', markers=True,
+                      title=f"{titulos.get(metrica, metrica)} por {unidades.get(tendencias['granularidad'], 'período')}",
+                      labels={'periodo': '', metrica: titulos.get(metrica, metrica), 'serie': ''})
+        fig.update_layout(legend=dict(orientation="h", yanchor="bottom", y=-0.3, xanchor="center", x=0.5), margin=dict(l=20, r=20, t=50, b=20))
+    return fig
+
+
+@callback(
+    Output('tabla-ranking-gerencia', 'data'),
+    Input('dashboard-gerencia-filtros-aplicados', 'data'),
+)
+def cargar_ranking_gerencia(filters):
+    if filters is None or not current_user.is_authenticated or current_user.rol != 'gerente': return no_update
+    return CrmService.get_ranking_vendedores(filters)
+
+@callback(
+    Output('tabla-zonas-gerencia', 'data'),
+    Input('dashboard-gerencia-filtros-aplicados', 'data'),
+)
+def cargar_kpis_zonas_gerencia(filters):
+    if filters is None or not current_user.is_authenticated or current_user.rol != 'gerente': return no_update
+    return CrmService.get_kpis_por_zona(filters)
+
+
+@callback(
+    Output('tabla-busqueda-gerencia', 'data'), Output('busqueda-gerencia-resumen', 'children'),
+    Input('busqueda-gerencia', 'value'), Input('dashboard-gerencia-filtros-aplicados', 'data'),
+)
+def buscar_comentarios_gerencia(texto, filters):
+    if not current_user.is_authenticated or current_user.rol != 'gerente': return no_update, no_update
+    if not (texto or '').strip(): return [], ""
+    resultado = CrmService.buscar_interacciones(texto, filters)
+    if resultado.get('error'): return [], "No se pudo completar la búsqueda."
+    total, mostradas = resultado['total'], len(resultado['filas'])
+    if not total: return [], "Sin coincidencias."
+    return resultado['filas'], f"{total} coincidencias" + (f" (las {mostradas} más relevantes)" if total > mostradas else "")
+
+
 # --- Función helper de filtrado (ignora acentos, mayúsculas, usa 'contains') ---
+@trazado
 def apply_custom_filter(data_list, filter_query):
+    import pandas as pd # Diferido: no cargar pandas al importar la página
     if not filter_query: return pd.DataFrame(data_list)
     if not data_list: return pd.DataFrame()
     dff = pd.DataFrame(data_list)
@@ -203,7 +390,7 @@ def apply_custom_filter(data_list, filter_query):
             col_normalized = col_as_str.apply(lambda x: unidecode(x).lower())
             value_normalized = unidecode(value_from_input).lower()
             dff = dff[col_normalized.str.contains(value_normalized, na=False)]
-        except Exception as e: print(f"Error filtro: '{expression}' - {e}"); pass
+        except Exception as e: logger.error("Error filtro: '%s' - %s", expression, e); pass
     return dff
 
 # --- Callback Tabla GERENCIA (CORREGIDO: Manejo de current_columns en tooltip) ---
@@ -234,7 +421,7 @@ def actualizar_tabla_gerencia(data, filter_query, current_columns):
                 for row in table_data
             ]
         except Exception as e:
-             print(f"Error generando tooltip_data: {e}")
+             logger.error("Error generando tooltip_data: %s", e)
              tooltip_data = [] # Devolver lista vacía en caso de error
     # --- FIN CORRECCIÓN ---
 
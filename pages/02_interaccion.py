@@ -1,12 +1,15 @@
 # pages/02_interaccion.py
 import dash
+import uuid
 from datetime import datetime as dt, time as datetime_time, date as datetime_date
 from dash import dcc, html, callback, Input, Output, State, no_update, ctx
 import dash_bootstrap_components as dbc
 from flask_login import current_user
 import psycopg2
 from core.services import CrmService
-import traceback
+import logging
+
+logger = logging.getLogger(__name__)
 
 dash.register_page(__name__, path='/nueva-interaccion', name="Nueva Interacción", title="Registrar Interacción")
 
@@ -35,7 +38,7 @@ def layout():
         return dcc.Location(pathname="/login", id="redirect-login-interaccion-auth")
     allowed_roles = ['vendedor', 'gerente']
     if current_user.rol not in allowed_roles:
-        print(f"DEBUG (Interaccion): Rol '{current_user.rol}' no autorizado.")
+        logger.debug("Rol '%s' no autorizado.", current_user.rol)
         return dcc.Location(pathname="/login", id="redirect-login-interaccion-role")
 
     initial_venta_cerrada = False
@@ -49,6 +52,8 @@ def layout():
             dbc.Row([ # Cliente
                 dbc.Col([ dbc.Label("Cliente", html_for='interaccion-cliente-cuit'), dcc.Dropdown(id='interaccion-cliente-cuit', options=[], placeholder="Seleccione...", searchable=True, clearable=True) ], md=6, className="mb-3"),
                 dcc.Store(id='interaccion-cliente-razon-social-store'),
+                # Clave de idempotencia: se renueva solo tras un guardado exitoso, así un doble click o reintento no duplica
+                dcc.Store(id='interaccion-idempotency-key-store', data=str(uuid.uuid4())),
             ]), html.Hr(),
             dbc.Row([ # Interacción
                 dbc.Col([ dbc.Label("Tipo", html_for='interaccion-tipo'), dbc.Select(id='interaccion-tipo', options=[{'label': i, 'value': i} for i in ['Llamada', 'Visita', 'WhatsApp', 'Email']], value='Llamada') ], md=6, className="mb-3"),
@@ -101,10 +106,10 @@ def cargar_clientes_dropdown(pathname):
     if pathname == '/nueva-interaccion':
         try:
             clientes = CrmService.get_clientes_dropdown()
-            if not isinstance(clientes, list): print("[Callback Carga Clientes] Advertencia..."); return []
+            if not isinstance(clientes, list): logger.warning("Carga de clientes: el servicio no devolvió una lista."); return []
             options = [{'label': f"{c.get('razon_social', 'N/A')} ({c.get('cuit', 'N/A')})", 'value': c.get('cuit')} for c in clientes if c.get('cuit')]
             return options
-        except Exception as e: print(f"Error en callback cargando clientes: {e}"); return []
+        except Exception as e: logger.error("Error en callback cargando clientes: %s", e); return []
     return no_update
 
 @callback(Output('interaccion-cliente-razon-social-store', 'data'), Input('interaccion-cliente-cuit', 'value'), State('interaccion-cliente-cuit', 'options'), prevent_initial_call=True)
@@ -155,6 +160,7 @@ def toggle_collapse_no_venta(venta_cerrada_data): return not bool(venta_cerrada_
     Output('interaccion-concretada-store', 'data', allow_duplicate=True), Output('interaccion-venta-cerrada-store', 'data', allow_duplicate=True), Output('interaccion-ofrecio-precios-store', 'data', allow_duplicate=True),
     Output('interaccion-conoce-catalogo-store', 'data', allow_duplicate=True), Output('interaccion-llego-bien-pedido-store', 'data', allow_duplicate=True),
     Output('interaccion-informo-pago-store', 'data', allow_duplicate=True), Output('interaccion-reviso-ctacte-store', 'data', allow_duplicate=True),
+    Output('interaccion-idempotency-key-store', 'data'),
 
     Input('interaccion-btn-guardar', 'n_clicks'),
     # States
@@ -169,18 +175,20 @@ def toggle_collapse_no_venta(venta_cerrada_data): return not bool(venta_cerrada_
     State('interaccion-llego-bien-pedido-store', 'data'), State('interaccion-comentarios-venta', 'value'),
     State('interaccion-informo-pago-store', 'data'), State('interaccion-reviso-ctacte-store', 'data'),
     State('interaccion-comentarios-cobranza', 'value'),
+    State('interaccion-idempotency-key-store', 'data'),
     prevent_initial_call=True
 )
 def guardar_interaccion(
     n_clicks, cliente_cuit, cliente_razon_social, tipo, interaccion_ok, respuesta,
     fecha_prox_str, hora_prox, minuto_prox,
     venta_ok, motivo_no, ofrecio_precios, conoce_cat,
-    llego_bien, com_venta, informo_pago, reviso_cta, com_cobranza
+    llego_bien, com_venta, informo_pago, reviso_cta, com_cobranza, idempotency_key
 ):
     # Definir valores de reset (hora=8, minuto=0)
     reset_textos = ("", "", "", None, None, None, 8, 0) # Sin AM/PM
     reset_stores = (False, False, False, False, True, False, False)
-    all_resets = reset_textos + reset_stores
+    # La clave no se toca en errores (no_update) para que el reintento reuse la misma
+    all_resets = reset_textos + reset_stores + (no_update,)
 
     if n_clicks == 0: return no_update, no_update, False, *all_resets
     if not cliente_cuit or not cliente_razon_social: return "Error: Debe seleccionar un cliente.", "danger", True, *([no_update] * len(all_resets))
@@ -196,12 +204,12 @@ def guardar_interaccion(
             if not (0 <= minuto_int <= 59): raise ValueError("Minutos inválidos (0-59).")
             hora_obj = datetime_time(hora_int, minuto_int)
             fecha_prox_dt = dt.combine(fecha_obj, hora_obj)
-            print(f"DEBUG guardar_interaccion - Combinado 24h OK: {fecha_prox_dt}")
+            logger.debug("guardar_interaccion - Combinado 24h OK: %s", fecha_prox_dt)
         except (ValueError, TypeError) as e:
-            print(f"Error combinando fecha y hora 24h: {e}")
+            logger.error("Error combinando fecha y hora 24h: %s", e)
             return f"Error: {e}", "danger", True, *([no_update] * len(all_resets))
     else:
-        print("DEBUG guardar_interaccion - No se seleccionó fecha de seguimiento.")
+        logger.debug("guardar_interaccion - No se seleccionó fecha de seguimiento.")
     # --- Fin Combinar ---
 
     # --- CORRECCIÓN: Crear diccionario 'input_data' directamente ---
@@ -221,7 +229,8 @@ def guardar_interaccion(
         'comentariosVenta': com_venta or None,
         'clienteInformoPago': bool(informo_pago),
         'revisoCtaCte': bool(reviso_cta),
-        'comentariosCobranza': com_cobranza or None
+        'comentariosCobranza': com_cobranza or None,
+        'idempotencyKey': idempotency_key
     }
     # --- FIN CORRECCIÓN ---
 
@@ -229,10 +238,10 @@ def guardar_interaccion(
 
     vendedor_dni = current_user.dni
     try:
-        print(f"DEBUG guardar_interaccion - Llamando a CrmService.registrar_interaccion con fecha: {input_data.get('fechaProxSeguimiento')}")
+        logger.debug("guardar_interaccion - registrar_interaccion con fecha: %s", input_data.get('fechaProxSeguimiento'))
         CrmService.registrar_interaccion(input_data, vendedor_dni) # Pasamos el diccionario completo
-        return "¡Interacción guardada con éxito!", "success", True, *all_resets
+        return "¡Interacción guardada con éxito!", "success", True, *(reset_textos + reset_stores), str(uuid.uuid4())
     except ValueError as ve: return f"Error de validación: {ve}", "danger", True, *([no_update] * len(all_resets))
     except (Exception, psycopg2.DatabaseError) as e:
-        print(f"Error DB o Servicio al guardar: {e}"); traceback.print_exc()
+        logger.exception("Error DB o Servicio al guardar: %s", e)
         return f"Error al guardar.", "danger", True, *([no_update] * len(all_resets))
\ No newline at end of file
@@ -0,0 +1,104 @@
+# pages/05_importar_interacciones.py
+import dash
+import logging
+import base64
+import os
+import tempfile
+from dash import dcc, html, callback, Input, Output, State, no_update
+import dash_bootstrap_components as dbc
+from flask_login import current_user
+from core.importacion import ImportacionService, COLUMNAS_ARCHIVO, COLUMNAS_OBLIGATORIAS, MAX_BYTES_SUBIDA
+
+logger = logging.getLogger(__name__)
+
+BLOQUE_BASE64 = 4 * 256 * 1024 # Múltiplo de 4: cada bloque se decodifica por separado
+
+dash.register_page(__name__, path='/importar-interacciones', name="Importar Interacciones", title="Importar Interacciones")
+
+
+def layout():
+    if not current_user.is_authenticated:
+        return dcc.Location(pathname="/login", id="redirect-login-importar-auth")
+    if current_user.rol != 'gerente':
+        return dcc.Location(pathname="/login", id="redirect-login-importar-role")
+
+    return dbc.Container([
+        html.H2("Importar Interacciones Históricas"), html.Hr(),
+        html.P(["Archivo CSV o Excel (.xlsx) con encabezado. Columnas obligatorias: ",
+                html.Code(", ".join(COLUMNAS_OBLIGATORIAS)), ". Opcionales: ",
+                html.Code(", ".join(c for c in COLUMNAS_ARCHIVO if c not in COLUMNAS_OBLIGATORIAS)), "."]),
+        html.P(f"Los clientes que no existan se crean automáticamente. Reimportar el mismo archivo no duplica interacciones. Tamaño máximo: {MAX_BYTES_SUBIDA // (1024 * 1024)} MB."),
+        dcc.Upload(
+            id='importar-upload',
+            children=html.Div(["Arrastre el archivo o ", html.A("selecciónelo")]),
+            style={'borderWidth': '1px', 'borderStyle': 'dashed', 'borderRadius': '5px', 'textAlign': 'center', 'padding': '30px'},
+            accept='.csv,.xlsx', multiple=False, max_size=MAX_BYTES_SUBIDA, # El navegador no envía archivos más grandes
+        ),
+        dcc.Loading(html.Div(id='importar-resultado', className="mt-3")),
+        dcc.Store(id='importar-rechazos-store'),
+        dbc.Button("Descargar reporte de rechazos", id='importar-btn-rechazos', color="secondary", className="mt-2", style={'display': 'none'}),
+        dcc.Download(id='importar-download-rechazos'),
+    ], fluid=True)
+
+
+@callback(
+    Output('importar-resultado', 'children'), Output('importar-rechazos-store', 'data'), Output('importar-btn-rechazos', 'style'),
+    Input('importar-upload', 'contents'),
+    State('importar-upload', 'filename'),
+    prevent_initial_call=True
+)
+def importar_archivo(contents, filename):
+    if not current_user.is_authenticated or current_user.rol != 'gerente':
+        return dbc.Alert("No autorizado.", color="danger"), None, {'display': 'none'}
+    if not contents or not filename: return no_update, no_update, no_update
+
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in ('.csv', '.xlsx'):
+        return dbc.Alert("Formato no soportado. Use .csv o .xlsx.", color="danger"), None, {'display': 'none'}
+
+    inicio = contents.find(',') + 1
+    if (len(contents) - inicio) * 3 // 4 > MAX_BYTES_SUBIDA:
+        return dbc.Alert(f"El archivo supera el máximo de {MAX_BYTES_SUBIDA // (1024 * 1024)} MB.", color="danger"), None, {'display': 'none'}
+
+    tmp_dir = tempfile.mkdtemp(prefix="importacion_")
+    ruta = os.path.join(tmp_dir, f"archivo{extension}")
+    ruta_rechazos = os.path.join(tmp_dir, "rechazos.csv")
+    try:
+        with open(ruta, 'wb') as f: # Por bloques: no se arma una segunda copia completa del archivo en memoria
+            for i in range(inicio, len(contents), BLOQUE_BASE64): f.write(base64.b64decode(contents[i:i + BLOQUE_BASE64]))
+        resumen = ImportacionService.importar_interacciones(ruta, ruta_rechazos=ruta_rechazos)
+        with open(ruta_rechazos, encoding='utf-8') as f:
+            rechazos_csv = f.read() if resumen['rechazadas'] else None
+    except ValueError as ve:
+        return dbc.Alert(f"Error en el archivo: {ve}", color="danger"), None, {'display': 'none'}
+    except Exception as e:
+        logger.error("Error importando %s: %s", filename, e)
+        return dbc.Alert("Error al importar. No se guardó ninguna interacción.", color="danger"), None, {'display': 'none'}
+    finally:
+        for p in (ruta, ruta_rechazos):
+            if os.path.exists(p): os.remove(p)
+        os.rmdir(tmp_dir)
+
+    color = "warning" if resumen['rechazadas'] else "success"
+    resultado = dbc.Alert([
+        html.H5(f"Importación de {filename} finalizada"),
+        html.Ul([
+            html.Li(f"Filas leídas: {resumen['leidas']}"),
+            html.Li(f"Importadas: {resumen['importadas']}"),
+            html.Li(f"Ya existentes: {resumen['duplicadas']}"),
+            html.Li(f"Rechazadas: {resumen['rechazadas']}"),
+            html.Li(f"Clientes creados: {resumen['clientes_creados']}"),
+        ])
+    ], color=color)
+    return resultado, rechazos_csv, ({'display': 'inline-block'} if rechazos_csv else {'display': 'none'})
+
+
+@callback(
+    Output('importar-download-rechazos', 'data'),
+    Input('importar-btn-rechazos', 'n_clicks'),
+    State('importar-rechazos-store', 'data'),
+    prevent_initial_call=True
+)
+def descargar_rechazos(n_clicks, rechazos_csv):
+    if not n_clicks or not rechazos_csv: return no_update
+    return dict(content=rechazos_csv, filename="rechazos_importacion.csv")
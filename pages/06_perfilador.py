@@ -0,0 +1,90 @@
+# pages/06_perfilador.py
+# Los ids de esta página empiezan con 'perfilador-': core.perfilador no perfila sus propios callbacks.
+import dash
+import os
+from dash import dcc, html, callback, Input, Output, State, ctx, no_update
+import dash_bootstrap_components as dbc
+from flask_login import current_user
+from core import perfilador
+
+dash.register_page(__name__, path='/perfilador', name="Perfilador", title="Perfilador")
+
+
+def layout():
+    if not current_user.is_authenticated:
+        return dcc.Location(pathname="/login", id="redirect-login-perfilador-auth")
+    if current_user.rol != 'gerente':
+        return dcc.Location(pathname="/login", id="redirect-login-perfilador-role")
+
+    return dbc.Container([
+        html.H2("Perfilador de Requests"), html.Hr(),
+        html.P(["Perfila con cProfile los próximos N requests cuyo path o id de callback contenga el patrón "
+                "(p.ej. ", html.Code("dashboard-gerencia-data-store"), " o ", html.Code("tabla-gerencia"), "). "
+                "La sesión vale solo para el worker que atiende este pedido."]),
+        dbc.Row([
+            dbc.Col(dbc.Input(id='perfilador-patron', placeholder="Patrón (path o id de output)", type="text"), md=6),
+            dbc.Col(dbc.Input(id='perfilador-cantidad', type="number", min=1, max=100, step=1, value=5), md=2),
+            dbc.Col([dbc.Button("Activar", id='perfilador-btn-activar', color="primary", className="me-2"),
+                     dbc.Button("Desactivar", id='perfilador-btn-desactivar', color="secondary")], md=4),
+        ], className="mb-2"),
+        html.Div(id='perfilador-estado', className="mb-3"),
+        html.Hr(),
+        dbc.Row([
+            dbc.Col(dcc.Dropdown(id='perfilador-sesion', placeholder="Sesión guardada"), md=6),
+            dbc.Col(dcc.RadioItems(id='perfilador-orden', options=[{'label': ' Acumulado', 'value': 'cumulative'}, {'label': ' Propio', 'value': 'tottime'}],
+                                   value='cumulative', inline=True, inputStyle={'margin-left': '10px'}), md=3),
+            dbc.Col(dbc.Button("Actualizar lista", id='perfilador-btn-actualizar', color="link"), md=3),
+        ]),
+        html.Div(id='perfilador-detalle', className="mt-3"),
+        html.Pre(id='perfilador-stats', style={'fontSize': '12px', 'whiteSpace': 'pre', 'overflowX': 'auto'}),
+    ], fluid=True)
+
+
+def _texto_estado(sesion):
+    if not sesion: return dbc.Alert(f"Sin sesión activa en el worker {os.getpid()}.", color="light")
+    return dbc.Alert(f"Sesión {sesion['id']} activa en el worker {sesion['pid']}: '{sesion['patron']}', "
+                     f"{len(sesion['requests'])}/{sesion['objetivo']} requests perfilados.", color="info")
+
+
+@callback(
+    Output('perfilador-estado', 'children'),
+    Input('perfilador-btn-activar', 'n_clicks'), Input('perfilador-btn-desactivar', 'n_clicks'),
+    State('perfilador-patron', 'value'), State('perfilador-cantidad', 'value'),
+)
+def cambiar_estado_perfilador(n_activar, n_desactivar, patron, cantidad):
+    if not current_user.is_authenticated or current_user.rol != 'gerente': return dbc.Alert("No autorizado.", color="danger")
+    if ctx.triggered_id == 'perfilador-btn-activar':
+        if not patron or not patron.strip(): return dbc.Alert("Indicá un patrón.", color="warning")
+        return _texto_estado(perfilador.activar(patron.strip(), int(cantidad or 1), current_user.dni))
+    if ctx.triggered_id == 'perfilador-btn-desactivar':
+        perfilador.desactivar()
+    return _texto_estado(perfilador.estado())
+
+
+@callback(
+    Output('perfilador-sesion', 'options'),
+    Input('perfilador-btn-actualizar', 'n_clicks'), Input('perfilador-estado', 'children'),
+)
+def listar_sesiones_perfilador(n_clicks, estado):
+    if not current_user.is_authenticated or current_user.rol != 'gerente': return []
+    return [{'label': f"{s['id']} · '{s['patron']}' · {len(s['requests'])} requests", 'value': s['id']} for s in perfilador.listar_sesiones()]
+
+
+@callback(
+    Output('perfilador-detalle', 'children'), Output('perfilador-stats', 'children'),
+    Input('perfilador-sesion', 'value'), Input('perfilador-orden', 'value'),
+)
+def mostrar_sesion_perfilador(sesion_id, orden):
+    if not current_user.is_authenticated or current_user.rol != 'gerente' or not sesion_id: return None, ''
+    sesion = next((s for s in perfilador.listar_sesiones() if s['id'] == sesion_id), None)
+    if not sesion: return no_update, no_update
+    filas = [html.Tr([html.Td(r['n']), html.Td(r['callback'] or r['path']), html.Td(r['huella_inputs'] or '-'),
+                      html.Td(f"{r['duracion_ms']} ms"), html.Td(html.A(".prof", href=f"/perfilador/descargar/{r['archivo']}"))])
+             for r in sesion['requests']]
+    detalle = html.Div([
+        html.P([f"Patrón '{sesion['patron']}', worker {sesion['pid']}, desde {sesion['inicio']}. ",
+                html.A("Descargar agregado (.prof)", href=f"/perfilador/descargar/{sesion['id']}.prof")]),
+        dbc.Table([html.Thead(html.Tr([html.Th("#"), html.Th("Callback / path"), html.Th("Huella inputs"), html.Th("Duración"), html.Th("")])), html.Tbody(filas)],
+                  bordered=True, size="sm"),
+    ])
+    return detalle, perfilador.resumen_stats(sesion_id, orden or 'cumulative')
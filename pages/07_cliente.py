@@ -0,0 +1,110 @@
+# pages/07_cliente.py
+# Vista 360 de un cliente: totales de toda su historia y el historial completo con scroll infinito.
+# Cada página se pide con el cursor (fecha_interaccion, id) de la última fila (keyset, ver
+# CrmRepository.get_historial_cliente) y se agrega a la tabla con Patch: ni el servidor relee lo
+# ya mostrado ni el navegador reenvía las filas que tiene. assets/scroll_infinito.js pulsa
+# "Cargar más" cuando el botón entra en pantalla. Un vendedor ve solo sus propias interacciones con el
+# cliente (como en el resto de sus vistas); el gerente, todas.
+import dash
+import logging
+from dash import dcc, html, callback, Input, Output, State, dash_table, no_update, Patch
+import dash_bootstrap_components as dbc
+from flask_login import current_user
+from core.services import CrmService
+
+logger = logging.getLogger(__name__)
+
+dash.register_page(__name__, path='/cliente', name="Clientes", title="Cliente")
+
+columnas_historial = [
+    {"name": "Fecha", "id": "fecha_interaccion"},
+    {"name": "Vendedor", "id": "vendedor_nombre"},
+    {"name": "Tipo", "id": "tipo_interaccion"},
+    {"name": "Contactado", "id": "llamada_concretada"},
+    {"name": "Venta", "id": "venta_cerrada"},
+    {"name": "Motivo No-Venta", "id": "motivo_no_venta"},
+    {"name": "Próx. Seguimiento", "id": "fecha_prox_seguimiento"},
+    {"name": "Respuesta / Comentarios", "id": "comentarios"},
+]
+
+
+def layout(cuit=None, **kwargs):
+    if not current_user.is_authenticated:
+        return dcc.Location(pathname="/login", id="redirect-login-cliente-auth")
+    if current_user.rol not in ('vendedor', 'gerente'):
+        return dcc.Location(pathname="/login", id="redirect-login-cliente-role")
+
+    return dbc.Container([
+        html.H2("Historial de Cliente"), html.Hr(),
+        # /cliente?cuit=30700000001 abre directamente ese cliente
+        dcc.Dropdown(id='cliente-selector', placeholder="Buscar cliente...", value=int(cuit) if cuit and str(cuit).isdigit() else None),
+        html.Div(id='cliente-resumen', className="mt-3"),
+        dcc.Store(id='cliente-historial-cursor'),
+        dash_table.DataTable(
+            id='tabla-historial-cliente', columns=columnas_historial, data=[],
+            page_action='none', sort_action='none', style_as_list_view=True, style_table={'overflowX': 'auto'},
+            style_cell={'textAlign': 'left', 'padding': '5px', 'minWidth': '80px', 'maxWidth': '220px', 'overflow': 'hidden', 'textOverflow': 'ellipsis'},
+            style_cell_conditional=[{'if': {'column_id': 'comentarios'}, 'maxWidth': '400px', 'whiteSpace': 'pre-line'},
+                                    {'if': {'column_id': 'fecha_interaccion'}, 'minWidth': '140px'}],
+            style_header={'backgroundColor': 'rgb(230, 230, 230)', 'fontWeight': 'bold'},
+        ),
+        dbc.Button("Cargar más", id='cliente-btn-cargar-mas', color="link", className="scroll-infinito mt-2", style={'display': 'none'}),
+    ], fluid=True)
+
+
+@callback(Output('cliente-selector', 'options'), Input('cliente-selector', 'id'))
+def cargar_opciones_cliente(_):
+    return [{'label': f"{c['razon_social']} ({c['cuit']})", 'value': c['cuit']} for c in CrmService.get_clientes_dropdown()]
+
+
+def _vendedor_dni():
+    """ DNI por el que se filtra el historial: el del usuario si es vendedor, None (todos) si es gerente. """
+    return current_user.dni if current_user.rol == 'vendedor' else None
+
+
+def _tarjeta(titulo, valor):
+    return dbc.Col(dbc.Card(dbc.CardBody([html.H6(titulo, className="card-title"), html.H4(valor, className="card-text")])), md=2)
+
+
+@callback(
+    Output('cliente-resumen', 'children'), Output('tabla-historial-cliente', 'data'),
+    Output('cliente-historial-cursor', 'data'), Output('cliente-btn-cargar-mas', 'style'),
+    Input('cliente-selector', 'value'),
+)
+def abrir_cliente(cuit):
+    oculto = {'display': 'none'}
+    if not cuit or not current_user.is_authenticated: return None, [], None, oculto
+    resumen = CrmService.get_resumen_cliente(cuit, _vendedor_dni())
+    if not resumen: return dbc.Alert("Cliente no encontrado.", color="warning"), [], None, oculto
+    try: pagina = CrmService.get_historial_cliente(cuit, vendedor_dni=_vendedor_dni())
+    except Exception as e:
+        logger.exception("Error cargando historial del cliente %s: %s", cuit, e)
+        return dbc.Alert("No se pudo cargar el historial.", color="danger"), [], None, oculto
+    motivos = ", ".join(f"{m['label']} ({m['value']})" for m in resumen['motivosNoVenta']) or "Sin motivos registrados"
+    encabezado = html.Div([
+        html.H4(f"{resumen['razonSocial']} · CUIT {resumen['cuit']}" + (f" · {resumen['zona']}" if resumen['zona'] else "")),
+        dbc.Row([
+            _tarjeta("Interacciones", resumen['interacciones']), _tarjeta("Tasa Contacto", resumen['tasaContacto']),
+            _tarjeta("Tasa Cierre", resumen['tasaCierre']), _tarjeta("Seguim. Pendientes", resumen['seguimientosPendientes']),
+            _tarjeta("Primera", resumen['primeraInteraccion']), _tarjeta("Última", resumen['ultimaInteraccion']),
+        ], className="g-2"),
+        html.P([html.Strong("Motivos de no-venta: "), motivos], className="mt-2"),
+    ])
+    return encabezado, pagina['filas'], pagina['cursor'], ({'display': 'block'} if pagina['cursor'] else oculto)
+
+
+@callback(
+    Output('tabla-historial-cliente', 'data', allow_duplicate=True),
+    Output('cliente-historial-cursor', 'data', allow_duplicate=True), Output('cliente-btn-cargar-mas', 'style', allow_duplicate=True),
+    Input('cliente-btn-cargar-mas', 'n_clicks'),
+    State('cliente-selector', 'value'), State('cliente-historial-cursor', 'data'),
+    # Deshabilitado mientras se carga: una pulsación más con el mismo cursor agregaría la misma página dos veces
+    running=[(Output('cliente-btn-cargar-mas', 'disabled'), True, False)],
+    prevent_initial_call=True
+)
+def cargar_mas_historial(n_clicks, cuit, cursor):
+    if not cuit or not cursor or not current_user.is_authenticated: return no_update, no_update, no_update
+    try: pagina = CrmService.get_historial_cliente(cuit, cursor, _vendedor_dni())
+    except Exception as e: logger.exception("Error cargando historial del cliente %s: %s", cuit, e); return no_update, no_update, no_update
+    filas = Patch(); filas.extend(pagina['filas']) # Solo las filas nuevas viajan al navegador
+    return filas, pagina['cursor'], ({'display': 'block'} if pagina['cursor'] else {'display': 'none'})
@@ -2,9 +2,9 @@
 import dash
 from dash import dcc, html, callback, Input, Output, State, no_update, ctx
 import dash_bootstrap_components as dbc
-import flask
 from flask_login import login_user, current_user
 from core.auth import User
+from core.db import get_db_pool
 # from app import app # No es necesario
 
 dash.register_page(__name__, path='/login', title="Login")
@@ -84,7 +84,7 @@ def handle_login(n_clicks, email, password):
     if not email or not password:
         error_message = "Debe ingresar Email y Contraseña."
         return no_update, True, error_message, False
-    pool = flask.current_app.config["DB_POOL"]
+    pool = get_db_pool()
     user = User.authenticate(email, password, pool)
     if user:
         login_user(user, remember=True)
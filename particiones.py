@@ -0,0 +1,57 @@
+# particiones.py
+# Mantenimiento del particionado mensual de interacciones_comerciales (ver core/particiones.py).
+#   python particiones.py migrar --meses-futuros 3      (una vez; requiere sql/002_registro_idempotencia.sql)
+#   python particiones.py asegurar                      (cron diario: crea los meses siguientes)
+#   python particiones.py archivar --retencion 24 --directorio archivo/
+#   python particiones.py listar
+import sys
+import os
+import argparse
+from dotenv import load_dotenv
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+if script_dir not in sys.path:
+    sys.path.append(script_dir)
+
+from core.db import init_db_pool
+from core.logs import configurar_logging
+from core.particiones import ParticionesService, MESES_FUTUROS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Particionado mensual de interacciones_comerciales.")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    migrar = sub.add_parser('migrar', help="Convierte la tabla en particionada (la original queda como _legacy)")
+    migrar.add_argument('--meses-futuros', type=int, default=MESES_FUTUROS)
+    asegurar = sub.add_parser('asegurar', help="Crea las particiones de los próximos meses")
+    asegurar.add_argument('--meses-futuros', type=int, default=MESES_FUTUROS)
+    archivar = sub.add_parser('archivar', help="Exporta a .csv.gz y elimina las particiones fuera de la retención")
+    archivar.add_argument('--retencion', type=int, required=True, help="Meses que se conservan en la base (además del actual)")
+    archivar.add_argument('--directorio', default='archivo')
+    archivar.add_argument('--sin-eliminar', action='store_true', help="Solo exporta, no borra las particiones")
+    sub.add_parser('listar', help="Particiones con filas estimadas y tamaño")
+    args = parser.parse_args()
+
+    load_dotenv()
+    configurar_logging()
+    if not init_db_pool():
+        print("ERROR: No se pudo inicializar el pool de base de datos."); sys.exit(1)
+
+    if args.comando == 'migrar':
+        resultado = ParticionesService.migrar(args.meses_futuros)
+        print(f"   {resultado['filas']} filas copiadas a {resultado['particiones']} particiones.")
+        print(f"   La tabla original quedó como {resultado['legacy']}: verificar y eliminarla a mano.")
+    elif args.comando == 'asegurar':
+        creadas = ParticionesService.asegurar_particiones(args.meses_futuros)
+        print(f"   Particiones creadas: {', '.join(creadas) if creadas else 'ninguna'}")
+    elif args.comando == 'archivar':
+        archivadas = ParticionesService.archivar(args.retencion, args.directorio, eliminar=not args.sin_eliminar)
+        for a in archivadas: print(f"   {a['particion']}: {a['filas']} filas -> {a['archivo']} ({a['bytes'] / 1e6:.1f} MB)")
+        if not archivadas: print("   Nada para archivar.")
+    else:
+        for p in ParticionesService.listar():
+            print(f"   {p['particion']:<42} {p['filas_estimadas']:>10} filas  {p['bytes'] / 1e6:>8.1f} MB  {p['rango']}")
+
+
+if __name__ == "__main__":
+    main()
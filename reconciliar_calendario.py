@@ -0,0 +1,42 @@
+# reconciliar_calendario.py
+# Crea en Google Calendar los eventos de los seguimientos futuros que quedaron sin evento
+# (ver CalendarioService.reconciliar en core/calendario.py). Pensado para cron; requiere sql/007_google_event_id.sql.
+#   python reconciliar_calendario.py                       (todos los vendedores con Calendar conectado)
+#   python reconciliar_calendario.py --vendedor 30111222 --lote 50 --pausa 2
+import sys
+import os
+import argparse
+from dotenv import load_dotenv
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+if script_dir not in sys.path:
+    sys.path.append(script_dir)
+
+from core.db import init_db_pool
+from core.logs import configurar_logging
+from core.calendario import CalendarioService, LOTE_CALENDAR, PAUSA_CALENDAR_SEG
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconciliación de seguimientos con Google Calendar (API batch).")
+    parser.add_argument('--vendedor', help="DNI del vendedor (default: todos)")
+    parser.add_argument('--lote', type=int, default=LOTE_CALENDAR, help="Eventos por pedido batch (máximo recomendado 50)")
+    parser.add_argument('--pausa', type=float, default=PAUSA_CALENDAR_SEG, help="Segundos entre pedidos del mismo vendedor")
+    parser.add_argument('--reintentos', type=int, default=5, help="Reintentos seguidos ante límite de cuota antes de dejar al vendedor para la próxima corrida")
+    parser.add_argument('--limite', type=int, default=5000, help="Máximo de seguimientos por corrida")
+    args = parser.parse_args()
+
+    load_dotenv()
+    configurar_logging()
+    if not init_db_pool():
+        print("ERROR: No se pudo inicializar el pool de base de datos."); sys.exit(1)
+
+    r = CalendarioService.reconciliar(args.vendedor, lote=args.lote, pausa=args.pausa, max_reintentos=args.reintentos, limite=args.limite)
+    print(f"   {r['pendientes']} seguimientos pendientes de {r['vendedores']} vendedores, {r['pedidos']} pedidos batch.")
+    print(f"   Creados: {r['creados']}  Ya existían: {r['existentes']}  Rechazados: {r['rechazados']}  Pendientes para la próxima corrida: {r['fallidos']}")
+    if r['rechazados']: print("   Los rechazados quedan marcados en google_event_error y no se reenvían (ver el log).")
+    sys.exit(1 if r['fallidos'] or r['rechazados'] else 0)
+
+
+if __name__ == "__main__":
+    main()
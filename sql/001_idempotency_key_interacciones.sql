@@ -0,0 +1,12 @@
+-- sql/001_idempotency_key_interacciones.sql
+-- Clave de idempotencia por envío del formulario de interacción.
+-- Un doble click o un reintento con la misma clave devuelve la fila existente
+-- en lugar de insertar un duplicado (ver CrmRepository.create_interaccion).
+
+ALTER TABLE interacciones_comerciales
+    ADD COLUMN IF NOT EXISTS idempotency_key uuid;
+
+-- Índice único sin predicado: lo requiere ON CONFLICT (idempotency_key).
+-- Las filas históricas quedan con NULL, que no colisiona entre sí.
+CREATE UNIQUE INDEX IF NOT EXISTS ux_interacciones_idempotency_key
+    ON interacciones_comerciales (idempotency_key);
@@ -0,0 +1,20 @@
+-- sql/002_registro_idempotencia.sql
+-- Registro de claves de idempotencia fuera de interacciones_comerciales.
+-- Una tabla particionada solo admite índices únicos que incluyan la clave de partición
+-- (fecha_interaccion), así que ON CONFLICT (idempotency_key) deja de servir al particionar
+-- (ver particiones.py). CrmRepository consulta e inserta en este registro en la misma
+-- sentencia que la interacción; la PK resuelve dos envíos simultáneos con la misma clave.
+-- Sin FK a interacciones_comerciales: archivar particiones no debe tocar el registro
+-- (un archivo reimportado sigue sin duplicar lo que ya se archivó).
+
+CREATE TABLE IF NOT EXISTS interacciones_idempotencia (
+    idempotency_key   uuid PRIMARY KEY,
+    interaccion_id    bigint NOT NULL,
+    fecha_interaccion timestamptz NOT NULL
+);
+
+INSERT INTO interacciones_idempotencia (idempotency_key, interaccion_id, fecha_interaccion)
+SELECT idempotency_key, id, fecha_interaccion
+FROM interacciones_comerciales
+WHERE idempotency_key IS NOT NULL
+ON CONFLICT (idempotency_key) DO NOTHING;
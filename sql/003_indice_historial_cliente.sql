@@ -0,0 +1,18 @@
+-- sql/003_indice_historial_cliente.sql
+-- Índice del historial por cliente (página /cliente, CrmRepository.get_historial_cliente).
+-- La paginación es por keyset: cada página pide las filas anteriores a (fecha_interaccion, id)
+-- de la última fila mostrada, así que abrir o scrollear un cliente con años de historia cuesta
+-- lo mismo que uno nuevo. INCLUDE lleva las columnas cortas de la grilla para que el filtro y el
+-- orden se resuelvan en el índice; los textos (respuesta, comentarios) se leen del heap solo
+-- para las filas de la página.
+-- Reemplaza a ix_interacciones_cliente_fecha, que es prefijo de este.
+--
+-- Tabla sin particionar: se puede crear sin bloquear escrituras con CREATE INDEX CONCURRENTLY
+-- (fuera de una transacción). Tabla particionada (particiones.py): CONCURRENTLY no se admite
+-- sobre la tabla padre; este CREATE INDEX crea el índice en cada partición.
+
+CREATE INDEX IF NOT EXISTS ix_interacciones_cliente_historial
+    ON interacciones_comerciales (fk_cliente_cuit, fecha_interaccion DESC, id DESC)
+    INCLUDE (fk_vendedor_dni, tipo_interaccion, llamada_concretada, venta_cerrada, motivo_no_venta, fecha_prox_seguimiento);
+
+DROP INDEX IF EXISTS ix_interacciones_cliente_fecha;
@@ -0,0 +1,26 @@
+-- sql/004_busqueda_comentarios.sql
+-- Búsqueda de texto completo en los comentarios de las interacciones (CrmRepository.buscar_interacciones,
+-- buscador del dashboard de gerencia). La configuración crm_es es la de español con unaccent antes
+-- del stemming: "credito", "Crédito" y "créditos" dan el mismo lexema, al indexar y al buscar.
+-- busqueda es una columna generada (se mantiene sola en cada INSERT/UPDATE, también en el COPY de
+-- la importación) con índice GIN. to_tsvector(regconfig, text) es IMMUTABLE, requisito de la
+-- columna generada; unaccent() suelto no lo es, por eso va dentro de la configuración.
+--
+-- ADD COLUMN ... STORED reescribe la tabla con lock exclusivo: aplicar en una ventana sin carga.
+-- En una tabla particionada (particiones.py) la columna y el índice se propagan a cada partición.
+
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'crm_es') THEN
+        CREATE TEXT SEARCH CONFIGURATION crm_es (COPY = spanish);
+        ALTER TEXT SEARCH CONFIGURATION crm_es ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+    END IF;
+END $$;
+
+ALTER TABLE interacciones_comerciales ADD COLUMN IF NOT EXISTS busqueda tsvector
+    GENERATED ALWAYS AS (to_tsvector('crm_es', coalesce(respuesta_cliente, '') || ' ' || coalesce(comentarios_venta, '') || ' ' || coalesce(comentarios_cobranza, ''))) STORED;
+
+CREATE INDEX IF NOT EXISTS ix_interacciones_busqueda
+    ON interacciones_comerciales USING gin (busqueda);
@@ -0,0 +1,50 @@
+-- sql/005_zonas.sql
+-- Zona como dimensión: tabla zona y zona_id (FK, indexada) en users y cliente. Los dashboards filtran
+-- por igualdad de zona_id (CrmRepository._dashboard_filtros) y agrupan por zona sin comparar texto.
+-- La columna zona (texto) se mantiene como dato de entrada: la cargan el ERP (sincronizar_clientes),
+-- el alta de usuarios y el seed. El trigger traduce cada valor a zona_id y crea la zona si es nueva;
+-- "norte", " Norte " y "NORTE" son la misma zona (se guarda la primera forma que llegó).
+-- Una interacción pertenece a la zona de su cliente.
+
+CREATE TABLE IF NOT EXISTS zona (
+    id     smallserial PRIMARY KEY,
+    nombre text NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_zona_nombre ON zona (lower(nombre));
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS zona_id smallint REFERENCES zona (id);
+ALTER TABLE cliente ADD COLUMN IF NOT EXISTS zona_id smallint REFERENCES zona (id);
+CREATE INDEX IF NOT EXISTS ix_users_zona ON users (zona_id);
+CREATE INDEX IF NOT EXISTS ix_cliente_zona ON cliente (zona_id);
+
+CREATE OR REPLACE FUNCTION crm_zona_id(p_nombre text) RETURNS smallint LANGUAGE plpgsql AS $$
+DECLARE
+    v_nombre text := nullif(regexp_replace(btrim(p_nombre), '\s+', ' ', 'g'), '');
+    v_id smallint;
+BEGIN
+    IF v_nombre IS NULL THEN RETURN NULL; END IF;
+    SELECT id INTO v_id FROM zona WHERE lower(nombre) = lower(v_nombre);
+    IF v_id IS NULL THEN
+        -- Dos altas simultáneas de la misma zona nueva: una inserta, la otra la lee
+        INSERT INTO zona (nombre) VALUES (v_nombre) ON CONFLICT ((lower(nombre))) DO NOTHING RETURNING id INTO v_id;
+        IF v_id IS NULL THEN SELECT id INTO v_id FROM zona WHERE lower(nombre) = lower(v_nombre); END IF;
+    END IF;
+    RETURN v_id;
+END $$;
+
+CREATE OR REPLACE FUNCTION crm_asignar_zona() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.zona_id := crm_zona_id(NEW.zona);
+    RETURN NEW;
+END $$;
+
+DROP TRIGGER IF EXISTS tg_users_zona ON users;
+CREATE TRIGGER tg_users_zona BEFORE INSERT OR UPDATE OF zona ON users
+    FOR EACH ROW EXECUTE FUNCTION crm_asignar_zona();
+DROP TRIGGER IF EXISTS tg_cliente_zona ON cliente;
+CREATE TRIGGER tg_cliente_zona BEFORE INSERT OR UPDATE OF zona ON cliente
+    FOR EACH ROW EXECUTE FUNCTION crm_asignar_zona();
+
+-- Carga inicial desde los valores de texto existentes
+UPDATE users SET zona_id = crm_zona_id(zona) WHERE zona IS NOT NULL AND zona_id IS NULL;
+UPDATE cliente SET zona_id = crm_zona_id(zona) WHERE zona IS NOT NULL AND zona_id IS NULL;
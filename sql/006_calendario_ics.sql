@@ -0,0 +1,15 @@
+-- sql/006_calendario_ics.sql
+-- Feed ICS de seguimientos por vendedor (/calendario/<token>.ics, core/calendario.py).
+-- ics_token es el secreto de la URL de suscripción: se genera al activar el feed y se
+-- regenera para revocar la URL anterior.
+-- ix_interacciones_seguimientos cubre las consultas del feed (versión, filas nuevas) y la de
+-- próximos seguimientos: solo indexa las interacciones que agendaron un seguimiento.
+-- Tabla particionada (particiones.py): el índice se crea en cada partición.
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS ics_token text;
+CREATE UNIQUE INDEX IF NOT EXISTS ux_users_ics_token ON users (ics_token);
+
+CREATE INDEX IF NOT EXISTS ix_interacciones_seguimientos
+    ON interacciones_comerciales (fk_vendedor_dni, fecha_prox_seguimiento)
+    INCLUDE (id, fecha_interaccion)
+    WHERE fecha_prox_seguimiento IS NOT NULL;
@@ -0,0 +1,28 @@
+-- sql/007_google_event_id.sql
+-- Id del evento de Google Calendar creado para el seguimiento de cada interacción.
+-- NULL = pendiente: reconciliar_calendario.py busca los seguimientos futuros sin evento de
+-- vendedores con Calendar conectado y los crea en lotes (core/calendario.py). Los eventos se
+-- crean con id propio derivado del id de la interacción: si el evento se creó pero no llegó a
+-- guardarse aquí, el reintento recibe 409 y solo completa la columna.
+-- google_event_error guarda el rechazo definitivo de Calendar (400, 404 o 410): ese
+-- seguimiento sale de los pendientes y no se reenvía en cada corrida.
+-- Sin índice nuevo: la búsqueda de pendientes usa ix_interacciones_seguimientos (sql/006).
+-- ADD COLUMN sin default no reescribe la tabla.
+-- Los seguimientos futuros anteriores a esta migración de vendedores con Calendar conectado ya
+-- tienen evento (creado al guardar, con id aleatorio: el id propio no daría 409 y se duplicaría).
+-- Se marcan con 'previo-007' una sola vez, al crear la columna: volver a correr el script no
+-- marca los pendientes nuevos.
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_name = 'interacciones_comerciales' AND column_name = 'google_event_id') THEN
+        ALTER TABLE interacciones_comerciales ADD COLUMN google_event_id text;
+        UPDATE interacciones_comerciales i SET google_event_id = 'previo-007'
+        FROM users u
+        WHERE i.fk_vendedor_dni = u.dni AND u.google_creds_json IS NOT NULL
+          AND i.fecha_prox_seguimiento >= now();
+    END IF;
+END
+$$;
+ALTER TABLE interacciones_comerciales ADD COLUMN IF NOT EXISTS google_event_error text;
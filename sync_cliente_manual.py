@@ -22,11 +22,12 @@ print(f"DEBUG: Después de sys.path.append. sys.path ahora incluye: {script_dir}
 print("DEBUG: Intentando importar core.db...")
 from core.db import init_db_pool, get_db_connection, release_db_connection
 print("DEBUG: Éxito importando core.db.")
-print("DEBUG: Intentando importar core.services...")
-from core.services import ErpService
-print("DEBUG: Éxito importando core.services.")
+print("DEBUG: Intentando importar core.erp...")
+from core.erp import ErpService # core.erp no depende de pandas/Dash: el script arranca rápido
+print("DEBUG: Éxito importando core.erp.")
 print("DEBUG: Intentando importar core.repository...")
 from core.repository import CrmRepository
+from core.logs import configurar_logging
 print("DEBUG: Éxito importando core.repository.")
 # ---------------------------------------------
 
@@ -35,6 +36,7 @@ def run_sync():
     print("DEBUG: Entrando en la función run_sync()...")
     print("--- Iniciando Sincronización Manual de Clientes ---")
     load_dotenv()
+    configurar_logging() # Errores de core.erp / core.repository por el logger central
     print("DEBUG: load_dotenv() ejecutado.")
 
     try: